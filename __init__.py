@@ -11,41 +11,121 @@ bl_info = {
 }
 
 
+import os
 import bpy
-from . sure_uv_panel import OBJECT_PT_SureUVPanel
+from . sure_uv_panel import (OBJECT_PT_SureUVPanel,
+                             panel_state,
+                             sure_uv_panel_depsgraph_update,
+                             subscribe_shading_updates,
+                             unsubscribe_shading_updates)
 from . sure_uv_operator import (OBJECT_OT_SureUVShowTextures,
                                 OBJECT_OT_SureUVBoxMapping,
                                 OBJECT_OT_SureUVPlanarMapping,
+                                OBJECT_OT_SureUVTweakMapping,
+                                OBJECT_OT_SureUVMaterialProfile,
+                                OBJECT_OT_SureUVChannel,
+                                OBJECT_OT_SureUVTexelDensity,
                                 OBJECT_OT_SureUVCheckerMat,
                                 OBJECT_OT_SureUVPreviewMat,
                                 OBJECT_OT_SureUVLoadImage,
                                 OBJECT_OT_SureUVSelectPolygons,
-                                OBJECT_OT_SureUVResetScale)
-from . sure_uv_settings import SureUVSettings
+                                OBJECT_OT_SureUVExportProfile,
+                                OBJECT_OT_SureUVResetScale,
+                                sure_uv_cache_depsgraph_update)
+from . sure_uv_settings import (SureUVChannel,
+                                SureUVSettings,
+                                SureUVMaterialProfile,
+                                SureUVKeepMapped)
+from . sure_uv_autoremap import (sure_uv_keep_mapped_update,
+                                 sure_uv_keep_mapped_load_post,
+                                 forget_keep_mapped)
+from . sure_uv_cache import projection_cache
+from . sure_uv_imageinfo import image_size_cache
+from . sure_uv_library import cancel_texture_import
+from . sure_uv_utils import forget_checker_images, regenerate_checker_images
+from . sure_uv_texel import texel_report
 
 classes = (
     OBJECT_PT_SureUVPanel,
     OBJECT_OT_SureUVShowTextures,
     OBJECT_OT_SureUVBoxMapping,
     OBJECT_OT_SureUVPlanarMapping,
+    OBJECT_OT_SureUVTweakMapping,
+    OBJECT_OT_SureUVMaterialProfile,
+    OBJECT_OT_SureUVChannel,
+    OBJECT_OT_SureUVTexelDensity,
     OBJECT_OT_SureUVCheckerMat,
     OBJECT_OT_SureUVPreviewMat,
     OBJECT_OT_SureUVLoadImage,
     OBJECT_OT_SureUVSelectPolygons,
+    OBJECT_OT_SureUVExportProfile,
     OBJECT_OT_SureUVResetScale,
+    SureUVChannel,
     SureUVSettings,
+    SureUVMaterialProfile,
+    SureUVKeepMapped,
 )
 
 
+@bpy.app.handlers.persistent
+def sure_uv_load_pre(dummy):
+    projection_cache.clear()
+    cancel_texture_import()
+    forget_checker_images()
+    texel_report.clear()
+    panel_state.invalidate()
+    forget_keep_mapped()
+
+
+@bpy.app.handlers.persistent
+def sure_uv_load_post(dummy):
+    regenerate_checker_images()
+    subscribe_shading_updates()
+
+
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     bpy.types.Scene.sure_uv_settings = bpy.props.PointerProperty(
         type=SureUVSettings
     )
+    bpy.types.Object.sure_uv_profiles = bpy.props.CollectionProperty(
+        type=SureUVMaterialProfile
+    )
+    bpy.types.Object.sure_uv_keep_mapped = bpy.props.PointerProperty(
+        type=SureUVKeepMapped
+    )
+    bpy.app.handlers.load_pre.append(sure_uv_load_pre)
+    bpy.app.handlers.load_post.append(sure_uv_load_post)
+    bpy.app.handlers.load_post.append(sure_uv_keep_mapped_load_post)
+    bpy.app.handlers.depsgraph_update_post.append(
+        sure_uv_panel_depsgraph_update)
+    bpy.app.handlers.depsgraph_update_post.append(
+        sure_uv_keep_mapped_update)
+    bpy.app.handlers.depsgraph_update_post.append(
+        sure_uv_cache_depsgraph_update)
+    subscribe_shading_updates()
+    image_size_cache.filepath = os.path.join(
+        bpy.utils.user_resource('CONFIG', path='sure_uv'), 'image_sizes.json')
 
 
 def unregister():
+    bpy.app.handlers.load_pre.remove(sure_uv_load_pre)
+    bpy.app.handlers.load_post.remove(sure_uv_load_post)
+    bpy.app.handlers.load_post.remove(sure_uv_keep_mapped_load_post)
+    bpy.app.handlers.depsgraph_update_post.remove(
+        sure_uv_panel_depsgraph_update)
+    bpy.app.handlers.depsgraph_update_post.remove(
+        sure_uv_keep_mapped_update)
+    bpy.app.handlers.depsgraph_update_post.remove(
+        sure_uv_cache_depsgraph_update)
+    unsubscribe_shading_updates()
+    forget_keep_mapped()
+    projection_cache.clear()
+    cancel_texture_import()
+    image_size_cache.save()
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
     del bpy.types.Scene.sure_uv_settings
+    del bpy.types.Object.sure_uv_profiles
+    del bpy.types.Object.sure_uv_keep_mapped
@@ -0,0 +1,382 @@
+# Benchmarks for the SureUV mapping hot paths.
+#
+# Without Blender (meshes are served by benchmarks/fake_bpy.py):
+#     python benchmarks/bench_mapping.py --sizes 10k,100k,1M
+# Inside Blender (real Mesh datablocks):
+#     blender --background --factory-startup \
+#         --python benchmarks/bench_mapping.py -- --sizes 10k,100k,1M
+#
+# The mapping cases go through the same add-on helpers as the operators
+# (prepare_box_mapping, set_mapping_uvs, ...) and are timed per phase as
+# the add-on profiler records them (read, prepare, project, write). Peak
+# memory is taken from tracemalloc, and the results are printed or written
+# as JSON so runs can be compared with each other.
+
+import argparse
+import importlib
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_bpy import FakeMesh, install_modules  # noqa: E402
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+SHAPES = ('grid', 'box', 'ngon')
+BENCHES = ('box', 'planar', 'material', 'checker')
+# Images the material bench alternates between, so every run assigns
+MATERIAL_IMAGES = ('sure_uv_bench_checker', 'sure_uv_bench_uv_grid')
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    factor = {'k': 10 ** 3, 'm': 10 ** 6}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * factor)
+
+
+# -- synthetic meshes -------------------------------------------------------
+
+def make_grid(loop_count: int) -> Tuple[np.ndarray, ...]:
+    n = max(1, int(round((loop_count / 4) ** 0.5)))
+    xs, ys = np.meshgrid(np.arange(n + 1, dtype=np.float32),
+                         np.arange(n + 1, dtype=np.float32), indexing='ij')
+    coords = np.stack((xs.ravel(), ys.ravel(),
+                       np.zeros((n + 1) ** 2, dtype=np.float32)), axis=1)
+    i, j = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    first = (i * (n + 1) + j).ravel()
+    loop_verts = np.stack((first, first + n + 1, first + n + 2, first + 1),
+                          axis=1).ravel()
+    loop_total = np.full(n * n, 4)
+    normals = np.tile(np.array([0, 0, 1], dtype=np.float32), (n * n, 1))
+    return coords, loop_verts, loop_total, normals
+
+
+def make_box(loop_count: int) -> Tuple[np.ndarray, ...]:
+    # Six subdivided grids, one per side of a cube
+    n = max(1, int(round((loop_count / 24) ** 0.5)))
+    coords, loop_verts, loop_total, _ = make_grid(4 * n * n)
+    side = coords / n - 0.5
+    sides = []
+    for axis in range(3):
+        for sign in (1.0, -1.0):
+            c = np.roll(side, axis + 1, axis=1)
+            c[:, axis] = 0.5 * sign
+            normal = np.zeros(3, dtype=np.float32)
+            normal[axis] = sign
+            sides.append((c, normal))
+    vert_count = len(coords)
+    all_coords = np.concatenate([c for c, _ in sides])
+    all_loop_verts = np.concatenate(
+        [loop_verts + k * vert_count for k in range(6)])
+    all_normals = np.concatenate(
+        [np.tile(n_, (len(loop_total), 1)) for _, n_ in sides])
+    return all_coords, all_loop_verts, np.tile(loop_total, 6), all_normals
+
+
+def make_ngons(loop_count: int, seed: int=0) -> Tuple[np.ndarray, ...]:
+    # Regular 3..8-gons scattered in space with random orientations
+    rng = np.random.default_rng(seed)
+    sides = np.array([3, 4, 5, 6, 8])
+    face_count = max(1, loop_count // int(sides.mean()))
+    loop_total = rng.choice(sides, face_count)
+    normals = rng.normal(size=(face_count, 3))
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    helper = np.where(np.abs(normals[:, 2:3]) < 0.9, [[0, 0, 1]], [[1, 0, 0]])
+    tangent = np.cross(normals, helper)
+    tangent /= np.linalg.norm(tangent, axis=1)[:, None]
+    bitangent = np.cross(normals, tangent)
+
+    face_of_loop = np.repeat(np.arange(face_count), loop_total)
+    corner = np.arange(len(face_of_loop)) - \
+        np.repeat(np.cumsum(loop_total) - loop_total, loop_total)
+    angle = 2 * np.pi * corner / loop_total[face_of_loop]
+    centers = rng.uniform(-100, 100, (face_count, 3))
+    coords = centers[face_of_loop] + \
+        np.cos(angle)[:, None] * tangent[face_of_loop] + \
+        np.sin(angle)[:, None] * bitangent[face_of_loop]
+    loop_verts = np.arange(len(coords))
+    return (coords.astype(np.float32), loop_verts, loop_total,
+            normals.astype(np.float32))
+
+
+MAKERS = {'grid': make_grid, 'box': make_box, 'ngon': make_ngons}
+
+
+def select_faces(mesh: Any) -> None:
+    # Every second face, the selection-driven paths then have work to do
+    # and the rest of the mesh to skip
+    selected = np.zeros(len(mesh.polygons), dtype=bool)
+    selected[::2] = True
+    mesh.polygons.foreach_set('select', selected)
+
+
+def make_fake_mesh(shape: str, loop_count: int) -> FakeMesh:
+    coords, loop_verts, loop_total, normals = MAKERS[shape](loop_count)
+    loop_start = np.cumsum(loop_total) - loop_total
+    return FakeMesh(coords, loop_verts, loop_start, loop_total, normals)
+
+
+def make_blender_mesh(shape: str, loop_count: int) -> Any:
+    coords, loop_verts, loop_total, _ = MAKERS[shape](loop_count)
+    loop_start = np.cumsum(loop_total) - loop_total
+    mesh = bpy.data.meshes.new(f'sure_uv_bench_{shape}_{loop_count}')
+    mesh.vertices.add(len(coords))
+    mesh.loops.add(len(loop_verts))
+    mesh.polygons.add(len(loop_total))
+    mesh.vertices.foreach_set('co', coords.astype(np.float32).ravel())
+    mesh.loops.foreach_set('vertex_index', loop_verts.astype(np.int32))
+    mesh.polygons.foreach_set('loop_start', loop_start.astype(np.int32))
+    try:
+        mesh.polygons.foreach_set('loop_total', loop_total.astype(np.int32))
+    except (AttributeError, TypeError, RuntimeError):
+        pass  # read-only since Blender 4.0, derived from loop_start
+    mesh.update(calc_edges=True)
+    mesh.uv_layers.new()
+    return mesh
+
+
+# -- timing -----------------------------------------------------------------
+
+@contextmanager
+def phase(phases: Dict[str, float], name: str):
+    start = time.perf_counter()
+    yield
+    phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def addon_phases(phases: Dict[str, float], name: str):
+    # Top level spans of the add-on profiler, like an operator run
+    profiler = load_addon().sure_uv_profiler.profiler
+    with profiler.run(name) as run:
+        yield
+    for key, value in run.phase_totals().items():
+        phases[key] = phases.get(key, 0.0) + value
+
+
+def bench_box(mesh: Any, phases: Dict[str, float]) -> None:
+    # OBJECT mode Box mapping of the whole mesh, as box_mapping runs it
+    addon = load_addon()
+    operator = addon.sure_uv_operator
+    matrices = addon.sure_uv_projection.get_box_project_matrices(
+        2.0, 1.5, (0, 0, 15), (0.1, 0.2, 0.3))
+    with addon_phases(phases, 'Box mapping'):
+        prepared, edit_loops = operator.prepare_box_mapping([mesh], False)
+        operator.set_mapping_uvs(
+            [mesh], operator.apply_box_mapping(prepared, matrices),
+            edit_loops)
+
+
+def bench_planar(mesh: Any, phases: Dict[str, float]) -> None:
+    # OBJECT mode Best Planar mapping: selected faces define the plane,
+    # the whole mesh is projected
+    addon = load_addon()
+    operator = addon.sure_uv_operator
+    matrix = addon.sure_uv_projection.get_planar_matrix(2.0, 1.5, 15,
+                                                        0.1, 0.2)
+    with addon_phases(phases, 'Best Planar mapping'):
+        prepared, edit_loops = operator.prepare_planar_mapping(mesh, False)
+        operator.set_mapping_uvs(
+            [mesh], operator.apply_planar_mapping(prepared, matrix,
+                                                  len(mesh.loops)),
+            edit_loops)
+
+
+_material_runs = itertools.count()
+
+
+def bench_material(mesh: Any, phases: Dict[str, float]) -> None:
+    # Temporary material of the selected faces, as the texture panel
+    # assigns it. The stand-in has no materials, it alternates slot indices.
+    utils = load_addon().sure_uv_utils
+    profiler = load_addon().sure_uv_profiler.profiler
+    run = next(_material_runs) % 2
+    with addon_phases(phases, 'Temporary material'):
+        with profiler.span('material'):
+            if isinstance(mesh, FakeMesh):
+                mat_index = run
+            else:
+                utils.create_checker_image(image_name=MATERIAL_IMAGES[run],
+                                           tex_size=64)
+                _, mat_index = utils.get_image_material(
+                    mesh, 'sure_uv_bench_tmp_mat', MATERIAL_IMAGES[run])
+        with profiler.span('assign'):
+            utils.set_selected_faces_material(mesh, mat_index)
+
+
+def bench_checker(mesh: Any, phases: Dict[str, float]) -> None:
+    addon = load_addon()
+    utils = addon.sure_uv_utils
+    with phase(phases, 'image'):
+        utils.create_checker_image(image_name='sure_uv_bench_checker',
+                                   generated_type='UV_GRID')
+    with phase(phases, 'material'):
+        utils.create_checker_material(mat_name='sure_uv_bench_checker_mat',
+                                      image_name='sure_uv_bench_checker')
+
+
+BENCH_FUNCS = {'box': bench_box, 'planar': bench_planar,
+               'material': bench_material, 'checker': bench_checker}
+
+
+def load_addon() -> Any:
+    # Outside Blender the add-on runs on the fake_bpy stand-in modules
+    name = 'sure_uv_bench_addon'
+    if name in sys.modules:
+        return sys.modules[name]
+    install_modules()
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(REPO_DIR, '__init__.py'),
+        submodule_search_locations=[REPO_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    if bpy is not None and not hasattr(bpy.types.Scene, 'sure_uv_settings'):
+        module.register()
+    return module
+
+
+def configure_addon(chunk_size: int, threads: int) -> None:
+    # The redo cache stays off, every repeat prepares the geometry again
+    settings = load_addon().sure_uv_utils.get_settings()
+    settings.chunk_size = chunk_size
+    settings.threads = threads
+    settings.cache_size = 0
+
+
+def run_case(bench: str, shape: str, loop_count: int, repeat: int,
+             backend: str) -> Dict[str, Any]:
+    if backend == 'blender':
+        mesh = make_blender_mesh(shape, loop_count)
+    else:
+        mesh = make_fake_mesh(shape, loop_count)
+    select_faces(mesh)
+
+    best: Dict[str, float] = {}
+    tracemalloc.start()
+    for _ in range(repeat):
+        phases: Dict[str, float] = {}
+        BENCH_FUNCS[bench](mesh, phases)
+        if not best or sum(phases.values()) < sum(best.values()):
+            best = phases
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    loops = len(mesh.loops)
+    total = sum(best.values())
+    result = {
+        'bench': bench,
+        'shape': shape,
+        'verts': len(mesh.vertices),
+        'loops': loops,
+        'faces': len(mesh.polygons),
+        'phases': best,
+        'total': total,
+        'loops_per_second': loops / total if total > 0 else None,
+        'peak_bytes': peak,
+    }
+    if backend == 'blender':
+        bpy.data.meshes.remove(mesh)
+    return result
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Benchmark the SureUV mapping hot paths.')
+    parser.add_argument('--sizes', default='10k,100k,1M',
+                        help='Comma-separated loop counts, e.g. 10k,1M,10M')
+    parser.add_argument('--shapes', default=','.join(SHAPES),
+                        help=f'Comma-separated subset of {SHAPES}')
+    parser.add_argument('--benches', default='',
+                        help=f'Comma-separated subset of {BENCHES}, '
+                             f'default all (checker only inside Blender)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per case, the fastest one is reported')
+    parser.add_argument('--chunk-size', type=parse_size, default=0,
+                        help='Project in blocks of this many loops, e.g. 256k')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='Projection worker threads, 0 = one per core')
+    parser.add_argument('--standin', action='store_true',
+                        help='Use the bpy stand-in even inside Blender')
+    parser.add_argument('--output', default='',
+                        help='Write JSON results to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    configure_addon(args.chunk_size, args.threads)
+    backend = 'blender' if bpy is not None and not args.standin else 'standin'
+    benches = [b for b in args.benches.split(',') if b]
+    if not benches:
+        benches = [b for b in BENCHES
+                   if backend == 'blender' or b != 'checker']
+    if backend != 'blender' and 'checker' in benches:
+        print('checker: skipped, requires Blender', file=sys.stderr)
+        benches.remove('checker')
+
+    results = []
+    for bench in benches:
+        shapes = ['grid'] if bench == 'checker' else args.shapes.split(',')
+        sizes = args.sizes.split(',')[:1] if bench == 'checker' \
+            else args.sizes.split(',')
+        for shape in shapes:
+            for size in sizes:
+                result = run_case(bench, shape, parse_size(size),
+                                  args.repeat, backend)
+                results.append(result)
+                phases = ' '.join(f'{k}={v * 1000:.1f}ms'
+                                  for k, v in result['phases'].items())
+                print(f'{bench:8} {shape:5} loops={result["loops"]:>9} '
+                      f'{phases} peak={result["peak_bytes"] / 2 ** 20:.1f}MB',
+                      file=sys.stderr)
+
+    report = {
+        'meta': {
+            'backend': backend,
+            'blender': bpy.app.version_string if backend == 'blender'
+            else None,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'chunk_size': args.chunk_size,
+            'threads': load_addon().sure_uv_projection.resolve_threads(
+                args.threads),
+            'cpu_count': os.cpu_count(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    if '--' in sys.argv:
+        argv = sys.argv[sys.argv.index('--') + 1:]
+    else:
+        # Inside Blender the remaining arguments belong to Blender itself
+        argv = [] if bpy is not None else sys.argv[1:]
+    sys.exit(main(argv))
@@ -0,0 +1,139 @@
+# Minimal stand-in for the parts of the bpy mesh API used by SureUV:
+# collections with len(), foreach_get() and foreach_set() over flat
+# sequences. It lets the benchmarks run on machines without Blender.
+# install_modules() adds just enough bpy, bmesh and bpy_extras modules to
+# import the add-on and call its mesh helpers on these meshes.
+
+from types import ModuleType, SimpleNamespace
+from typing import Any, Dict, Optional
+import sys
+import numpy as np
+
+
+class FakeCollection:
+    def __init__(self, length: int, **attrs: np.ndarray):
+        self._length = length
+        self._attrs: Dict[str, np.ndarray] = attrs
+
+    def __len__(self) -> int:
+        return self._length
+
+    def foreach_get(self, attr: str, seq: Any) -> None:
+        src = self._attrs[attr]
+        if src.size != len(seq):
+            raise RuntimeError(f'foreach_get({attr!r}): sequence size '
+                               f'{len(seq)} != {src.size}')
+        np.copyto(seq, src.reshape(-1), casting='unsafe')
+
+    def foreach_set(self, attr: str, seq: Any) -> None:
+        dst = self._attrs[attr]
+        seq = np.asarray(seq)
+        if dst.size != seq.size:
+            raise RuntimeError(f'foreach_set({attr!r}): sequence size '
+                               f'{seq.size} != {dst.size}')
+        np.copyto(dst.reshape(-1), seq.reshape(-1), casting='unsafe')
+
+
+class FakeUVLayer:
+    def __init__(self, name: str, loop_count: int):
+        self.name = name
+        self.data = FakeCollection(
+            loop_count, uv=np.zeros((loop_count, 2), dtype=np.float32))
+
+
+class FakeUVLayers(list):
+    active = None
+
+    def __init__(self, loop_count: int):
+        super().__init__()
+        self._loop_count = loop_count
+
+    def new(self, name: str='UVMap') -> FakeUVLayer:
+        layer = FakeUVLayer(name, self._loop_count)
+        self.append(layer)
+        if self.active is None:
+            self.active = layer
+        return layer
+
+    def get(self, name: str) -> Optional[FakeUVLayer]:
+        return next((layer for layer in self if layer.name == name), None)
+
+
+class FakeMesh:
+    def __init__(self, coords: np.ndarray, loop_verts: np.ndarray,
+                 loop_start: np.ndarray, loop_total: np.ndarray,
+                 normals: np.ndarray, name: str='FakeMesh'):
+        self.name = name
+        self.materials = []
+        vert_count, loop_count, face_count = \
+            len(coords), len(loop_verts), len(loop_start)
+        self.vertices = FakeCollection(vert_count,
+                                       co=coords.astype(np.float32))
+        self.loops = FakeCollection(loop_count,
+                                    vertex_index=loop_verts.astype(np.int32))
+        self.polygons = FakeCollection(
+            face_count,
+            loop_start=loop_start.astype(np.int32),
+            loop_total=loop_total.astype(np.int32),
+            select=np.ones(face_count, dtype=bool),
+            material_index=np.zeros(face_count, dtype=np.int32))
+        self.polygon_normals = FakeCollection(
+            face_count, vector=normals.astype(np.float32))
+        self.uv_layers = FakeUVLayers(loop_count)
+        self.uv_layers.new()
+
+    def as_pointer(self) -> int:
+        return id(self)
+
+    def update(self) -> None:
+        pass
+
+
+class FakeSettings:
+    # The scene settings read by the mapping helpers
+    threads = 1
+    chunk_size = 0
+    cache_size = 0
+
+
+class _PlaceholderTypes(ModuleType):
+    # Any bpy.types name is an empty class, enough to derive operators,
+    # panels and property groups from
+    def __getattr__(self, name: str) -> type:
+        if name.startswith('__'):
+            raise AttributeError(name)
+        cls = type(name, (), {})
+        setattr(self, name, cls)
+        return cls
+
+
+def _property(*args: Any, **kwargs: Any) -> None:
+    return None
+
+
+def install_modules() -> None:
+    # Only outside Blender, the real modules always win
+    if 'bpy' in sys.modules:
+        return
+    bpy = ModuleType('bpy')
+    bpy.types = _PlaceholderTypes('bpy.types')
+    bpy.props = ModuleType('bpy.props')
+    bpy.props.__getattr__ = lambda name: _property
+    bpy.app = ModuleType('bpy.app')
+    bpy.app.version_string = None
+    bpy.app.handlers = ModuleType('bpy.app.handlers')
+    bpy.app.handlers.persistent = lambda func: func
+    bpy.utils = ModuleType('bpy.utils')
+    bpy.context = SimpleNamespace(
+        scene=SimpleNamespace(sure_uv_settings=FakeSettings()))
+    io_utils = ModuleType('bpy_extras.io_utils')
+    io_utils.ImportHelper = type('ImportHelper', (), {})
+    io_utils.ExportHelper = type('ExportHelper', (), {})
+    bpy_extras = ModuleType('bpy_extras')
+    bpy_extras.io_utils = io_utils
+    sys.modules.update({
+        'bpy': bpy, 'bpy.types': bpy.types, 'bpy.props': bpy.props,
+        'bpy.app': bpy.app, 'bpy.app.handlers': bpy.app.handlers,
+        'bpy.utils': bpy.utils, 'bmesh': ModuleType('bmesh'),
+        'bpy_extras': bpy_extras, 'bpy_extras.io_utils': io_utils,
+    })
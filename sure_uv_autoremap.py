@@ -0,0 +1,159 @@
+import logging
+from typing import Any, Optional, Set
+
+import bpy
+
+from .sure_uv_changes import remapped_faces, mesh_states
+from .sure_uv_operator import (get_material_profile_sets,
+                               get_channel_box_matrices,
+                               apply_slot_groups,
+                               get_projection_dtype,
+                               get_keep_mapped_geometry)
+from .sure_uv_profiler import profiler
+from .sure_uv_projection import (get_box_project_matrices,
+                                 transform_box_sets,
+                                 transform_box_matrices,
+                                 prepare_box_projection,
+                                 apply_box_projection)
+from .sure_uv_utils import (get_settings,
+                            get_mesh_material_indices,
+                            get_mesh_uvs,
+                            set_mesh_uvs)
+
+
+_logger = logging.getLogger(__name__)
+
+# Seconds without geometry updates before the changed faces are remapped,
+# a vertex drag is handled once when it stops
+REMAP_DELAY = 0.3
+
+# Names of keep mapped objects with geometry updates since the last remap
+_pending: Set[str] = set()
+
+
+def remap_changed_faces(obj: Any) -> int:
+    # Box maps the kept mapped faces changed since the last call (or the
+    # Box mapping) again, in the target UV map and the stored UV channels.
+    # Faces mapped otherwise keep their UVs. Returns their number, without
+    # a recorded geometry the call only records it.
+    mesh = obj.data
+    params = obj.sure_uv_keep_mapped
+    mesh_arrays, hashes, mapped, transform, new_state = \
+        get_keep_mapped_geometry(obj)
+    state = mesh_states.get(mesh.as_pointer())
+    mesh_states[mesh.as_pointer()] = new_state
+    if state is None or not mesh.uv_layers.active:
+        return 0
+
+    faces = remapped_faces(state, new_state, mesh_arrays, hashes, mapped)
+    face_count = int(faces.sum())
+    if not face_count:
+        return 0
+    mesh_arrays = mesh_arrays._replace(selection=faces)
+
+    matrices = get_box_project_matrices(params.size, params.texaspect,
+                                        params.rot, params.offset)
+    if params.use_profiles:
+        matrices, slot_groups = get_material_profile_sets([obj], [mesh],
+                                                          matrices)
+        if slot_groups is not None:
+            mesh_arrays = apply_slot_groups(
+                mesh_arrays._replace(groups=get_mesh_material_indices(mesh)),
+                slot_groups[0], len(mesh.materials))
+    set_count = len(matrices) // 6
+    layers = [(params.uv_layer, matrices)]
+    layers.extend((channel.uv_layer,
+                   get_channel_box_matrices(channel, set_count))
+                  for channel in params.channels)
+    if transform is not None:
+        mesh_arrays = transform_box_sets([mesh_arrays], [transform],
+                                         set_count)[0]
+
+    profiler.count(faces=face_count)
+    with profiler.span('prepare'):
+        prepared = prepare_box_projection(
+            mesh_arrays, get_projection_dtype(params.double_precision))
+    profiler.count(loops=len(prepared.loop_indices))
+    for index, (layer_name, layer_matrices) in enumerate(layers):
+        if transform is not None:
+            layer_matrices = transform_box_matrices(layer_matrices,
+                                                    [transform])
+        uvs = get_mesh_uvs(mesh, layer_name)
+        with profiler.span('project'):
+            apply_box_projection(prepared, layer_matrices, uvs,
+                                 get_settings().threads)
+        set_mesh_uvs(mesh, uvs, layer_name, update=(index == len(layers) - 1))
+    return face_count
+
+
+def get_keep_mapped_object(name: str) -> Optional[Any]:
+    obj = bpy.data.objects.get(name)
+    if obj is None or obj.type != 'MESH' or \
+            not obj.sure_uv_keep_mapped.enabled:
+        return None
+    return obj
+
+
+def _remap_pending() -> None:
+    names = sorted(_pending)
+    _pending.clear()
+    seen = set()
+    total = 0
+    with profiler.run('Keep mapped'):
+        for name in names:
+            obj = get_keep_mapped_object(name)
+            # Mesh data is stale in EDIT mode, leaving it sends a new update
+            if obj is None or obj.mode == 'EDIT' or \
+                    obj.data.as_pointer() in seen:
+                continue
+            seen.add(obj.data.as_pointer())
+            count = remap_changed_faces(obj)
+            if count:
+                _logger.debug(f'Keep mapped: {name}, {count} faces')
+            total += count
+    if total:
+        # A step of its own, undoing the edit does not leave the remap
+        # behind and undoing the remap keeps the edit
+        try:
+            bpy.ops.ed.undo_push(message='Keep mapped')
+        except RuntimeError as error:
+            _logger.error(f'Keep mapped undo step: {error}')
+
+
+@bpy.app.handlers.persistent
+def sure_uv_keep_mapped_update(scene, depsgraph):
+    for update in depsgraph.updates:
+        if not isinstance(update.id, bpy.types.Object) or \
+                not (update.is_updated_geometry or
+                     update.is_updated_transform):
+            continue
+        obj = update.id.original
+        if obj.type != 'MESH' or not obj.sure_uv_keep_mapped.enabled:
+            continue
+        # Moving the object only matters when its transform is projected
+        if update.is_updated_geometry or \
+                obj.sure_uv_keep_mapped.transform != 'NONE':
+            _pending.add(obj.name)
+    if _pending:
+        # Restart the delay on every update
+        if bpy.app.timers.is_registered(_remap_pending):
+            bpy.app.timers.unregister(_remap_pending)
+        bpy.app.timers.register(_remap_pending, first_interval=REMAP_DELAY)
+
+
+@bpy.app.handlers.persistent
+def sure_uv_keep_mapped_load_post(dummy):
+    # Geometry of the loaded file is the reference for the next edits
+    mesh_states.clear()
+    _pending.clear()
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH' and obj.sure_uv_keep_mapped.enabled and \
+                obj.data.as_pointer() not in mesh_states:
+            remap_changed_faces(obj)
+
+
+def forget_keep_mapped() -> None:
+    mesh_states.clear()
+    _pending.clear()
+    if bpy.app.timers.is_registered(_remap_pending):
+        bpy.app.timers.unregister(_remap_pending)
@@ -0,0 +1,384 @@
+# Headless batch UV mapping of many .blend files.
+#
+# Driver (plain Python, runs a pool of background Blender workers):
+#     python sure_uv_batch.py assets/ --mapping box --size 2 --jobs 8 \
+#         --summary summary.json
+# Each worker runs the same script inside Blender on one file:
+#     blender --background --factory-startup file.blend \
+#         --python sure_uv_batch.py -- --worker --params '{...}' --result r.json
+#
+# The summary lists the status, per-phase timings and errors of every file.
+
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_NAME = 'sure_uv_batch_addon'
+STDERR_TAIL = 2000
+
+
+# ----------------------------------------------------------------------------
+# Worker side, runs inside Blender
+# ----------------------------------------------------------------------------
+
+def load_addon() -> Any:
+    # The add-on does not have to be installed in the worker's Blender
+    if ADDON_NAME in sys.modules:
+        return sys.modules[ADDON_NAME]
+    spec = importlib.util.spec_from_file_location(
+        ADDON_NAME, os.path.join(PACKAGE_DIR, '__init__.py'),
+        submodule_search_locations=[PACKAGE_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[ADDON_NAME] = module
+    spec.loader.exec_module(module)
+    module.register()
+    return module
+
+
+def get_target_objects(params: Dict[str, Any]) -> List[Any]:
+    patterns = params['objects']
+    materials = set(params['materials'])
+    objects = []
+    for obj in bpy.context.scene.objects:
+        if obj.type != 'MESH':
+            continue
+        if not any(fnmatch(obj.name, pattern) for pattern in patterns):
+            continue
+        if materials and not any(slot.material is not None and
+                                 slot.material.name in materials
+                                 for slot in obj.material_slots):
+            continue
+        objects.append(obj)
+    return objects
+
+
+def map_objects(params: Dict[str, Any], objects: List[Any]) -> int:
+    operator = importlib.import_module(f'{ADDON_NAME}.sure_uv_operator')
+    projection = importlib.import_module(f'{ADDON_NAME}.sure_uv_projection')
+    utils = importlib.import_module(f'{ADDON_NAME}.sure_uv_utils')
+
+    settings = utils.get_settings()
+    settings.threads = params['threads']
+    settings.chunk_size = params['chunk_size']
+
+    meshes = utils.get_unique_meshes(objects)
+    size, aspect = params['size'], params['aspect']
+    rot, offset = params['rot'], params['offset']
+    double_precision = params['double_precision']
+    layer_name = params['uv_layer']
+    transforms = operator.get_mesh_transforms(objects, meshes,
+                                              params['transform'])
+    # Explicit face masks, the face selection saved in the files plays no
+    # part. Faces outside them keep their UVs.
+    faces = operator.get_material_face_masks(objects, meshes,
+                                             params['materials'])
+    outs = [utils.get_mesh_uvs(mesh, layer_name) for mesh in meshes]
+
+    if params['mapping'] == 'BOX':
+        matrices = projection.get_box_project_matrices(size, aspect,
+                                                       rot, offset)
+        prepared, _ = operator.prepare_box_mapping(
+            meshes, False, double_precision, transforms=transforms,
+            faces=faces)
+        if transforms is not None:
+            matrices = projection.transform_box_matrices(matrices,
+                                                         transforms)
+        new_uvs = projection.apply_box_projection_batch(
+            prepared, matrices, outs, threads=settings.threads)
+        operator.set_mapping_uvs(meshes, new_uvs, None, layer_name)
+    else:
+        mat = projection.get_planar_matrix(size, aspect, rot[2],
+                                           offset[0], offset[1])
+        for index, mesh in enumerate(meshes):
+            if not faces[index].any():
+                continue
+            prepared, _ = operator.prepare_planar_mapping(
+                mesh, False, double_precision,
+                transform=None if transforms is None else transforms[index],
+                faces=faces[index])
+            new_uvs = projection.apply_planar_projection(
+                prepared, mat, outs[index], settings.threads)
+            operator.set_mapping_uvs([mesh], [new_uvs], None, layer_name)
+    return sum(int(utils.get_mesh_polygon_loops(mesh)[1][mask].sum())
+               for mesh, mask in zip(meshes, faces))
+
+
+def get_output_path(params: Dict[str, Any]) -> str:
+    filepath = bpy.data.filepath
+    if not params['output_dir']:
+        return filepath
+    return os.path.join(params['output_dir'], params['relpath'])
+
+
+def run_worker(params: Dict[str, Any]) -> Dict[str, Any]:
+    timings = {}
+    start = time.perf_counter()
+    load_addon()
+    objects = get_target_objects(params)
+    timings['setup'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loops = map_objects(params, objects) if objects else 0
+    timings['map'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output = get_output_path(params)
+    if objects and not params['dry_run']:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        bpy.ops.wm.save_as_mainfile(filepath=output, copy=True,
+                                    compress=params['compress'])
+    timings['save'] = time.perf_counter() - start
+
+    return {'objects': [obj.name for obj in objects],
+            'loops': loops,
+            'output': output if objects and not params['dry_run'] else None,
+            'blender': bpy.app.version_string,
+            'timings': timings}
+
+
+def worker_main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog='sure_uv_batch worker')
+    parser.add_argument('--worker', action='store_true')
+    parser.add_argument('--params', required=True)
+    parser.add_argument('--result', required=True)
+    args = parser.parse_args(argv)
+
+    result = run_worker(json.loads(args.params))
+    with open(args.result, 'w') as f:
+        json.dump(result, f)
+    return 0
+
+
+# ----------------------------------------------------------------------------
+# Driver side, plain Python
+# ----------------------------------------------------------------------------
+
+def collect_files(inputs: List[str], manifest: str) -> List[Dict[str, str]]:
+    # Returns {'path', 'relpath'} so --output-dir mirrors the input layout
+    entries = []
+    if manifest:
+        with open(manifest) as f:
+            text = f.read()
+        if manifest.endswith('.json'):
+            paths = json.loads(text)
+        else:
+            paths = [line.strip() for line in text.splitlines()
+                     if line.strip() and not line.startswith('#')]
+        base = os.path.dirname(os.path.abspath(manifest))
+        for path in paths:
+            path = os.path.join(base, path)
+            relpath = os.path.relpath(path, base)
+            if relpath.startswith(os.pardir):
+                relpath = os.path.basename(path)
+            entries.append({'path': os.path.abspath(path),
+                            'relpath': relpath})
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                for name in sorted(names):
+                    if name.endswith('.blend'):
+                        path = os.path.join(root, name)
+                        entries.append({'path': os.path.abspath(path),
+                                        'relpath': os.path.relpath(path,
+                                                                   item)})
+        else:
+            entries.append({'path': os.path.abspath(item),
+                            'relpath': os.path.basename(item)})
+
+    unique = {}
+    for entry in entries:
+        unique.setdefault(entry['path'], entry)
+    return list(unique.values())
+
+
+def get_worker_params(args: argparse.Namespace,
+                      entry: Dict[str, str]) -> Dict[str, Any]:
+    return {'mapping': args.mapping.upper(),
+            'size': args.size,
+            'aspect': args.aspect,
+            'rot': args.rot,
+            'offset': args.offset,
+            'objects': args.objects.split(','),
+            'materials': [m for m in args.materials.split(',') if m],
+            'double_precision': args.double_precision,
+            'transform': args.transform.upper(),
+            'uv_layer': args.uv_layer,
+            'threads': args.threads,
+            'chunk_size': args.chunk_size,
+            'output_dir': os.path.abspath(args.output_dir)
+            if args.output_dir else '',
+            'relpath': entry['relpath'],
+            'compress': args.compress,
+            'dry_run': args.dry_run}
+
+
+def run_file(args: argparse.Namespace,
+             entry: Dict[str, str]) -> Dict[str, Any]:
+    report = {'file': entry['path'], 'status': 'failed', 'error': None}
+    fd, result_path = tempfile.mkstemp(prefix='sure_uv_batch_',
+                                       suffix='.json')
+    os.close(fd)
+    command = [args.blender, '--background', '--factory-startup',
+               entry['path'], '--python-exit-code', '1',
+               '--python', os.path.abspath(__file__), '--',
+               '--worker', '--params', json.dumps(get_worker_params(args,
+                                                                    entry)),
+               '--result', result_path]
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(command, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE, text=True,
+                              timeout=args.timeout or None)
+        report['returncode'] = proc.returncode
+        with open(result_path) as f:
+            text = f.read()
+        if proc.returncode != 0 or not text:
+            report['error'] = proc.stderr[-STDERR_TAIL:] or \
+                f'Blender exited with code {proc.returncode}'
+        else:
+            report.update(json.loads(text))
+            report['status'] = 'ok' if report['objects'] else 'skipped'
+    except subprocess.TimeoutExpired:
+        report['status'] = 'timeout'
+        report['error'] = f'No result after {args.timeout} s'
+    except (OSError, ValueError) as err:
+        report['error'] = str(err)
+    finally:
+        report['wall'] = time.perf_counter() - start
+        os.remove(result_path)
+    return report
+
+
+def parse_vector(text: str) -> List[float]:
+    values = [float(v) for v in text.split(',')]
+    if len(values) != 3:
+        raise argparse.ArgumentTypeError('expected three values: x,y,z')
+    return values
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Box / Best Planar UV map many .blend files with a pool '
+                    'of background Blender processes.')
+    parser.add_argument('inputs', nargs='*',
+                        help='.blend files or directories to scan')
+    parser.add_argument('--manifest', default='',
+                        help='Text file with one .blend path per line, or '
+                             'a .json list of paths')
+    parser.add_argument('--blender',
+                        default=os.environ.get('BLENDER', 'blender'),
+                        help='Blender executable (default: $BLENDER or '
+                             'blender)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Parallel Blender processes')
+    parser.add_argument('--timeout', type=float, default=0,
+                        help='Seconds per file, 0 = no limit')
+    parser.add_argument('--mapping', choices=('box', 'planar'),
+                        default='box')
+    parser.add_argument('--size', type=float, default=1.0,
+                        help='Texture real size (image width = Size)')
+    parser.add_argument('--aspect', type=float, default=1.0,
+                        help='Texture aspect')
+    parser.add_argument('--rot', type=parse_vector, default=[0.0] * 3,
+                        help='XYZ rotation in degrees, Best Planar uses Z')
+    parser.add_argument('--offset', type=parse_vector, default=[0.0] * 3,
+                        help='XYZ offset, Best Planar uses X and Y')
+    parser.add_argument('--objects', default='*',
+                        help='Comma-separated object name patterns')
+    parser.add_argument('--materials', default='',
+                        help='Comma-separated material names, only the '
+                             'faces using them are mapped')
+    parser.add_argument('--double-precision', action='store_true')
+    parser.add_argument('--transform', choices=('none', 'scale', 'full'),
+                        default='none',
+                        help='Include the object scale or the whole world '
+                             'transform, no need to apply the scale')
+    parser.add_argument('--uv-layer', default='',
+                        help='UV map to write, created when missing. '
+                             'Default: the active UV map')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='Projection threads inside each worker')
+    parser.add_argument('--chunk-size', type=int, default=0,
+                        help='Project in blocks of this many loops')
+    parser.add_argument('--output-dir', default='',
+                        help='Save results here instead of in place')
+    parser.add_argument('--compress', action='store_true',
+                        help='Save compressed .blend files')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Map but do not save')
+    parser.add_argument('--summary', default='',
+                        help='Write the JSON summary to this file')
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.manifest:
+        parser.error('no input files, pass paths or --manifest')
+    return args
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    entries = collect_files(args.inputs, args.manifest)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        reports = list(pool.map(lambda entry: run_file(args, entry),
+                                entries))
+    wall = time.perf_counter() - start
+
+    for report in reports:
+        print(f'{report["status"]:8} {report["wall"]:7.2f}s '
+              f'{report["file"]}', file=sys.stderr)
+
+    summary = {
+        'meta': {
+            'blender': args.blender,
+            'jobs': args.jobs,
+            'mapping': args.mapping,
+            'python': platform.python_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'totals': {
+            'files': len(reports),
+            'ok': sum(r['status'] == 'ok' for r in reports),
+            'skipped': sum(r['status'] == 'skipped' for r in reports),
+            'failed': sum(r['status'] in ('failed', 'timeout')
+                          for r in reports),
+            'wall': wall,
+        },
+        'files': reports,
+    }
+    text = json.dumps(summary, indent=2)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if summary['totals']['failed'] else 0
+
+
+def get_script_args() -> Optional[List[str]]:
+    if '--' not in sys.argv:
+        return None
+    return sys.argv[sys.argv.index('--') + 1:]
+
+
+if __name__ == '__main__':
+    script_args = get_script_args()
+    if bpy is not None and script_args and '--worker' in script_args:
+        sys.exit(worker_main(script_args))
+    sys.exit(main(sys.argv[1:]))
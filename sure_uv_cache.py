@@ -0,0 +1,78 @@
+# Geometry cache used to re-execute mapping operators from the redo panel.
+#
+# Entries are keyed on mesh identity and guarded by a fingerprint of the
+# geometry/selection they were built from, so a parameter-only change can
+# skip the read/classify/bucket work. Entries larger than max_bytes are not
+# kept at all. Like sure_uv_projection, this module does not import bpy.
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+import numpy as np
+
+
+CACHE_SIZE_MB = 256
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+class ProjectionCache:
+    def __init__(self, max_entries: int=8,
+                 max_bytes: int=CACHE_SIZE_MB << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def _pop(self, key: Hashable) -> None:
+        _, _, nbytes = self._entries.pop(key)
+        self._total_bytes -= nbytes
+
+    def get(self, key: Hashable, fingerprint: bytes) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != fingerprint:
+            # Geometry or selection changed, the entry can never match again
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, fingerprint: bytes, value: Any) -> None:
+        if key in self._entries:
+            self._pop(key)
+        nbytes = _nbytes(value)
+        self._entries[key] = (fingerprint, value, nbytes)
+        self._total_bytes += nbytes
+        while self._entries and (
+                len(self._entries) > self.max_entries or
+                self._total_bytes > self.max_bytes):
+            self._pop(next(iter(self._entries)))
+
+    def get_or_prepare(self, key: Hashable, fingerprint: bytes,
+                       prepare: Callable[[], Any]) -> Any:
+        value = self.get(key, fingerprint)
+        if value is None:
+            value = prepare()
+            self.put(key, fingerprint, value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._total_bytes = 0
+
+
+projection_cache = ProjectionCache()
@@ -0,0 +1,135 @@
+# Geometry change detection for the keep mapped auto-remap.
+#
+# Instead of a copy of the vertex positions only one 64 bit hash per chunk
+# of vertices is kept. After an edit the chunks whose hash differs mark
+# their vertices as moved, and every face using one of them is projected
+# again. Face normals are hashed the same way per chunk of faces, and one
+# digest of the face / loop topology catches edits that keep the vertex
+# and loop counts (rotated edges, dissolve and fill). When the topology
+# changes, faces are matched by a hash of their corner positions instead:
+# only the hashes of the kept mapped faces are stored. Like
+# sure_uv_projection, this module does not import bpy.
+
+from typing import Dict, NamedTuple, Optional
+import hashlib
+import numpy as np
+
+from .sure_uv_projection import MeshArrays, polygon_loop_indices
+
+
+# Vertices per hash, a moved vertex re-projects the faces of its chunk
+CHANGE_CHUNK_VERTICES = 256
+
+_HASH_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F,
+                              0x165667B19E3779F9, 0x27D4EB2F165667C5],
+                             dtype=np.uint64)
+
+
+def vertex_chunk_hashes(coords: np.ndarray,
+                        chunk_size: int = CHANGE_CHUNK_VERTICES) -> np.ndarray:
+    # Hash of the float32 bit patterns of every chunk_size vertices
+    if not len(coords):
+        return np.empty(0, dtype=np.uint64)
+    bits = np.ascontiguousarray(coords, dtype=np.float32).view(np.uint32)
+    with np.errstate(over='ignore'):
+        hashes = (bits.astype(np.uint64) * _HASH_MULTIPLIERS[:3]).sum(axis=1)
+        # Mix in the vertex index so swapped vertices change the hash
+        hashes += np.arange(len(hashes), dtype=np.uint64) * \
+            _HASH_MULTIPLIERS[3]
+        hashes ^= hashes >> np.uint64(29)
+        hashes *= _HASH_MULTIPLIERS[0]
+        return np.add.reduceat(hashes, np.arange(0, len(hashes), chunk_size))
+
+
+def face_hashes(mesh: MeshArrays) -> np.ndarray:
+    # (F,) hash of the corner positions of every face, independent of the
+    # vertex and face order so faces are found again after topology edits
+    if not len(mesh.loop_start):
+        return np.empty(0, dtype=np.uint64)
+    bits = np.ascontiguousarray(mesh.coords, dtype=np.float32).view(np.uint32)
+    loop_indices = polygon_loop_indices(mesh.loop_start, mesh.loop_total)
+    firsts = np.cumsum(mesh.loop_total, dtype=np.int64) - mesh.loop_total
+    with np.errstate(over='ignore'):
+        hashes = (bits.astype(np.uint64) * _HASH_MULTIPLIERS[:3]).sum(axis=1)
+        hashes ^= hashes >> np.uint64(29)
+        hashes *= _HASH_MULTIPLIERS[0]
+        return np.add.reduceat(hashes[mesh.loop_verts[loop_indices]], firsts)
+
+
+def topology_hash(loop_verts: np.ndarray, loop_start: np.ndarray,
+                  loop_total: np.ndarray) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for arr in (loop_verts, loop_start, loop_total):
+        arr = np.ascontiguousarray(arr, dtype=np.int32)
+        digest.update(f'{arr.shape}'.encode())
+        digest.update(arr.data)
+    return digest.digest()
+
+
+def changed_normal_faces(old_hashes: np.ndarray, new_hashes: np.ndarray,
+                         face_count: int,
+                         chunk_size: int = CHANGE_CHUNK_VERTICES
+                         ) -> np.ndarray:
+    # (F,) bool, faces in a chunk whose normal hash differs. Both hash
+    # arrays come from meshes with the same face count.
+    return np.repeat(old_hashes != new_hashes, chunk_size)[:face_count]
+
+
+def changed_faces(old_hashes: np.ndarray, new_hashes: np.ndarray,
+                  loop_verts: np.ndarray, loop_start: np.ndarray,
+                  loop_total: np.ndarray,
+                  chunk_size: int = CHANGE_CHUNK_VERTICES) -> np.ndarray:
+    # (F,) bool, faces with a vertex in a changed chunk. Both hash arrays
+    # come from meshes with the same vertex count.
+    changed = old_hashes != new_hashes
+    if not changed.any() or not len(loop_start):
+        return np.zeros(len(loop_start), dtype=bool)
+    loop_indices = polygon_loop_indices(loop_start, loop_total)
+    loop_changed = changed[loop_verts[loop_indices] // chunk_size]
+    firsts = np.cumsum(loop_total, dtype=np.int64) - loop_total
+    return np.logical_or.reduceat(loop_changed, firsts)
+
+
+class MeshState(NamedTuple):
+    vertex_count: int
+    loop_count: int
+    topology: bytes
+    hashes: np.ndarray          # per vertex chunk
+    normal_hashes: np.ndarray   # per face chunk
+    mapped_hashes: np.ndarray   # sorted face_hashes of the kept mapped faces
+    transform: Optional[bytes]
+
+
+def mesh_state(mesh: MeshArrays, faces: np.ndarray, mapped: np.ndarray,
+               transform: Optional[np.ndarray]) -> MeshState:
+    # faces: face_hashes(mesh), mapped: (F,) bool kept mapped faces
+    return MeshState(len(mesh.coords), len(mesh.loop_verts),
+                     topology_hash(mesh.loop_verts, mesh.loop_start,
+                                   mesh.loop_total),
+                     vertex_chunk_hashes(mesh.coords),
+                     vertex_chunk_hashes(mesh.normals),
+                     np.unique(faces[mapped]),
+                     None if transform is None else transform.tobytes())
+
+
+def remapped_faces(old: MeshState, new: MeshState, mesh: MeshArrays,
+                   faces: np.ndarray, mapped: np.ndarray) -> np.ndarray:
+    # (F,) bool, kept mapped faces to project again: the moved ones with
+    # the same topology, the new or reshaped ones after a topology edit and
+    # all of them when the projected object transform changed
+    if old.transform != new.transform:
+        return mapped.copy()
+    if old.vertex_count == new.vertex_count and \
+            old.loop_count == new.loop_count and \
+            old.topology == new.topology:
+        changed = changed_faces(old.hashes, new.hashes, mesh.loop_verts,
+                                mesh.loop_start, mesh.loop_total)
+        changed |= changed_normal_faces(old.normal_hashes, new.normal_hashes,
+                                        len(changed))
+        return changed & mapped
+    return mapped & ~np.isin(faces, old.mapped_hashes)
+
+
+# Mesh pointer -> geometry of the last keep mapped mapping, recorded by the
+# Box operator and after every remap
+mesh_states: Dict[int, MeshState] = {}
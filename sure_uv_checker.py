@@ -0,0 +1,83 @@
+# Checker / texel-density grid patterns generated with NumPy.
+#
+# The result is a flat RGBA float32 array in Blender's pixel order (rows
+# bottom to top) ready for Image.pixels.foreach_set. Every cell row is
+# built once as a single pixel row and copied down with slice assignment,
+# so the cost is one memory fill of the image. Like sure_uv_projection,
+# this module does not import bpy.
+
+from typing import Optional, Tuple
+import numpy as np
+
+
+CHECKER_RESOLUTIONS = (512, 1024, 2048, 4096, 8192)
+CHECKER_TEMPLATES = ('UV_GRID', 'COLOR_GRID')
+# Bump when the patterns change so cached images are regenerated
+CHECKER_VERSION = 1
+
+LINE_COLOR = (0.05, 0.05, 0.05, 1.0)
+UV_GRID_LEVELS = (0.25, 0.55)
+
+
+def _hsv_to_rgb(h: np.ndarray, s: float, v: np.ndarray) -> np.ndarray:
+    i = np.floor(h * 6.0).astype(np.int64) % 6
+    f = h * 6.0 - np.floor(h * 6.0)
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    r = np.choose(i, (v, q, p, p, t, v))
+    g = np.choose(i, (t, v, v, q, p, p))
+    b = np.choose(i, (p, p, t, v, v, q))
+    return np.stack((r, g, b), axis=1)
+
+
+def _cell_colors(template: str, row: int, cells: int) -> np.ndarray:
+    # (cells, 4) colors of the cells of one cell row
+    parity = (np.arange(cells) + row) & 1
+    colors = np.ones((cells, 4), dtype=np.float32)
+    if template == 'UV_GRID':
+        colors[:, :3] = np.take(UV_GRID_LEVELS, parity)[:, None]
+    else:
+        hue = ((np.arange(cells) + row * 3) % cells) / cells
+        value = np.where(parity, 0.65, 0.95)
+        colors[:, :3] = _hsv_to_rgb(hue, 0.6, value)
+    return colors
+
+
+def _cell_bounds(size: int, cells: int) -> Tuple[np.ndarray, np.ndarray]:
+    index = (np.arange(size) * cells) // size
+    starts = np.searchsorted(index, np.arange(cells + 1))
+    return index, starts
+
+
+def checker_pixels(size: int, template: str='UV_GRID',
+                   cells: int=8) -> np.ndarray:
+    if template not in CHECKER_TEMPLATES:
+        raise ValueError(f'Unknown checker template: {template}')
+    pixels = np.empty((size, size, 4), dtype=np.float32)
+    index, starts = _cell_bounds(size, cells)
+
+    # Dark borders on the first pixels of every cell, wider on big images
+    line = np.zeros(size, dtype=bool)
+    for k in range(max(1, size // 512)):
+        line[np.minimum(starts[:-1] + k, size - 1)] = True
+
+    for j in range(cells):
+        row = _cell_colors(template, j, cells)[index]
+        row[line] = LINE_COLOR
+        pixels[starts[j]:starts[j + 1]] = row
+    pixels[line] = LINE_COLOR
+    return pixels.reshape(-1)
+
+
+def checker_key(template: str, size: int) -> str:
+    return f'{template}:{size}:{CHECKER_VERSION}'
+
+
+def parse_checker_key(key: str) -> Optional[Tuple[str, int]]:
+    # (template, size) of a key from any version, None if malformed
+    parts = str(key).split(':')
+    if len(parts) != 3 or parts[0] not in CHECKER_TEMPLATES or \
+            not parts[1].isdigit() or int(parts[1]) <= 0:
+        return None
+    return parts[0], int(parts[1])
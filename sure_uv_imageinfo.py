@@ -0,0 +1,268 @@
+# Image dimensions read from file headers only.
+#
+# Asking Blender for Image.size on an image that is not loaded yet decodes
+# the whole file, which for 8K EXR/TIFF textures on network storage takes
+# seconds. The aspect only needs width and height, which every supported
+# format stores in the first few bytes. Results are kept in a JSON cache
+# keyed on path, file size and mtime so they survive between sessions.
+# Like sure_uv_projection, this module does not import bpy.
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+import json
+import os
+import struct
+import threading
+
+
+HEADER_BYTES = 1 << 16
+
+# Formats whose header is parsed here, a file that fails to parse is invalid
+HEADER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.exr',
+                     '.tga', '.tpic')
+# Loaded by Blender but imported without a pre-filled aspect
+OTHER_EXTENSIONS = ('.bmp', '.hdr', '.webp', '.jp2', '.j2c', '.dds',
+                    '.cin', '.dpx', '.sgi', '.rgb', '.psd')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+EXR_MAGIC = b'\x76\x2f\x31\x01'
+# SOFn markers carry the frame size, C4/C8/CC are DHT/JPG/DAC
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+TIFF_WIDTH_TAG = 256
+TIFF_HEIGHT_TAG = 257
+TIFF_TYPES = {3: ('H', 2), 4: ('I', 4), 16: ('Q', 8)}
+
+
+def _png_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    header = f.read(24)
+    if len(header) < 24 or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+
+def _jpeg_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        while len(marker) == 2 and marker[1] == 0xFF:
+            marker = marker[1:] + f.read(1)  # fill bytes
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if 0xD0 <= marker[1] <= 0xD9 or marker[1] == 0x01:
+            continue  # standalone markers have no length
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length = struct.unpack('>H', length)[0]
+        if marker[1] in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _tiff_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    header = f.read(16)
+    order = {b'II': '<', b'MM': '>'}.get(header[:2])
+    if order is None or len(header) < 8:
+        return None
+    version = struct.unpack(order + 'H', header[2:4])[0]
+    if version == 42:
+        offset = struct.unpack(order + 'I', header[4:8])[0]
+        count_fmt, entry_size, value_size = 'H', 12, 4
+    elif version == 43 and len(header) == 16:  # BigTIFF
+        offset = struct.unpack(order + 'Q', header[8:16])[0]
+        count_fmt, entry_size, value_size = 'Q', 20, 8
+    else:
+        return None
+
+    f.seek(offset)
+    count_bytes = struct.calcsize(count_fmt)
+    count = f.read(count_bytes)
+    if len(count) < count_bytes:
+        return None
+    count = struct.unpack(order + count_fmt, count)[0]
+    entries = f.read(count * entry_size)
+    size = {}
+    for i in range(len(entries) // entry_size):
+        entry = entries[i * entry_size:(i + 1) * entry_size]
+        tag, kind = struct.unpack(order + 'HH', entry[:4])
+        if tag not in (TIFF_WIDTH_TAG, TIFF_HEIGHT_TAG) or \
+                kind not in TIFF_TYPES:
+            continue
+        fmt, nbytes = TIFF_TYPES[kind]
+        value = entry[entry_size - value_size:][:nbytes]
+        size[tag] = struct.unpack(order + fmt, value)[0]
+    if len(size) < 2:
+        return None
+    return size[TIFF_WIDTH_TAG], size[TIFF_HEIGHT_TAG]
+
+
+def _exr_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    # Attributes: name\0 type\0 int32 size, value. The header of the first
+    # part ends with an empty name.
+    header = f.read(HEADER_BYTES)
+    pos = 8
+    while pos < len(header):
+        end = header.find(b'\0', pos)
+        if end <= pos:
+            return None
+        name = header[pos:end]
+        type_end = header.find(b'\0', end + 1)
+        if type_end < 0 or type_end + 5 > len(header):
+            return None
+        size = struct.unpack('<i', header[type_end + 1:type_end + 5])[0]
+        value = header[type_end + 5:type_end + 5 + size]
+        if name == b'dataWindow' and len(value) == 16:
+            xmin, ymin, xmax, ymax = struct.unpack('<iiii', value)
+            return xmax - xmin + 1, ymax - ymin + 1
+        pos = type_end + 5 + size
+    return None
+
+
+def _tga_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    # No magic number, only trusted for .tga files
+    header = f.read(18)
+    if len(header) < 18 or header[2] not in (1, 2, 3, 9, 10, 11):
+        return None
+    return struct.unpack('<HH', header[12:16])
+
+
+def read_image_size(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        with open(path, 'rb') as f:
+            magic = f.read(8)
+            f.seek(0)
+            if magic == PNG_SIGNATURE:
+                size = _png_size(f)
+            elif magic[:2] == b'\xff\xd8':
+                size = _jpeg_size(f)
+            elif magic[:4] in (b'II*\0', b'MM\0*', b'II+\0', b'MM\0+'):
+                size = _tiff_size(f)
+            elif magic[:4] == EXR_MAGIC:
+                size = _exr_size(f)
+            elif path.lower().endswith(('.tga', '.tpic')):
+                size = _tga_size(f)
+            else:
+                size = None
+    except (OSError, struct.error):
+        return None
+    if size is None or size[0] <= 0 or size[1] <= 0:
+        return None
+    return int(size[0]), int(size[1])
+
+
+class ImageSizeCache:
+    def __init__(self, filepath: str='', max_entries: int=20000):
+        self.filepath = filepath
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        self._loaded = True
+        if not self.filepath or not os.path.isfile(self.filepath):
+            return
+        try:
+            with open(self.filepath) as f:
+                self._entries.update(json.load(f))
+        except (OSError, ValueError):
+            self._entries.clear()
+
+    def get_size(self, path: str) -> Optional[Tuple[int, int]]:
+        path = os.path.normpath(os.path.abspath(path))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry = self._entries.get(path)
+            if entry is not None and entry[:2] == stamp:
+                self._entries.move_to_end(path)
+                return entry[2], entry[3]
+
+        size = read_image_size(path)
+        if size is None:
+            return None
+        with self._lock:
+            self._entries[path] = stamp + list(size)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        return size
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty or not self.filepath:
+                return
+            text = json.dumps(self._entries)
+            self._dirty = False
+        tmp_path = f'{self.filepath}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.filepath) or '.', exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, self.filepath)
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+
+def is_image_file(path: str) -> bool:
+    return path.lower().endswith(HEADER_EXTENSIONS + OTHER_EXTENSIONS)
+
+
+def list_image_files(directory: str, recursive: bool=False) -> List[str]:
+    paths = []
+    for root, dirs, names in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in sorted(names)
+                     if is_image_file(name))
+        if not recursive:
+            break
+        dirs.sort()
+    return paths
+
+
+def scan_image_files(paths: Sequence[str], cache: ImageSizeCache,
+                     threads: int=8,
+                     cancelled: Optional[threading.Event]=None
+                     ) -> Iterator[Tuple[str, Optional[Tuple[int, int]],
+                                         bool]]:
+    # Yields (path, size, valid) in input order. The headers are read on
+    # worker threads, mostly waiting on (network) storage. Once cancelled
+    # is set the workers skip the paths still queued and nothing more is
+    # yielded.
+    def is_cancelled():
+        return cancelled is not None and cancelled.is_set()
+
+    def scan(path):
+        if is_cancelled():
+            return None
+        if not os.path.isfile(path):
+            return path, None, False
+        if not path.lower().endswith(HEADER_EXTENSIONS):
+            return path, None, is_image_file(path)
+        size = cache.get_size(path)
+        return path, size, size is not None
+
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        for item in pool.map(scan, paths):
+            if is_cancelled():
+                return
+            yield item
+
+
+image_size_cache = ImageSizeCache()
@@ -0,0 +1,116 @@
+import logging
+import queue
+import threading
+from typing import Any, List, Optional
+
+import bpy
+
+from .sure_uv_imageinfo import image_size_cache, scan_image_files
+from .sure_uv_utils import get_settings, get_areas_by_type
+
+
+_logger = logging.getLogger(__name__)
+
+
+class TextureImportJob:
+    # Headers are scanned on worker threads, image datablocks are created on
+    # the main thread from a timer, a few per tick, so the UI stays
+    # responsive while a large library is imported.
+    batch_size = 32
+    interval = 0.02
+
+    def __init__(self, paths: List[str], scan_threads: int=8):
+        self.paths = paths
+        self.scan_threads = scan_threads
+        self.images: List[str] = []
+        self.skipped: List[str] = []
+        self.done = False
+        self._queue = queue.SimpleQueue()
+        self._cancelled = threading.Event()
+
+    @property
+    def total(self) -> int:
+        return len(self.paths)
+
+    @property
+    def processed(self) -> int:
+        return len(self.images) + len(self.skipped)
+
+    def start(self) -> None:
+        threading.Thread(target=self._scan, daemon=True).start()
+        bpy.app.timers.register(self._step, first_interval=0.0)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def _scan(self) -> None:
+        try:
+            for item in scan_image_files(self.paths, image_size_cache,
+                                         self.scan_threads, self._cancelled):
+                self._queue.put(item)
+        finally:
+            self._queue.put(None)
+
+    def _step(self) -> Optional[float]:
+        if self._cancelled.is_set():
+            self.done = True
+            return None
+        for _ in range(self.batch_size):
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._finish()
+                return None
+            self._add_image(*item)
+        self._redraw()
+        return self.interval
+
+    def _add_image(self, path: str, size: Any, valid: bool) -> None:
+        if not valid:
+            self.skipped.append(path)
+            return
+        try:
+            # Creates the datablock only, pixels are decoded on first use
+            img = bpy.data.images.load(path, check_existing=True)
+        except RuntimeError as err:
+            _logger.error(f'{path}: {err}')
+            self.skipped.append(path)
+            return
+        self.images.append(img.name)
+
+    def _finish(self) -> None:
+        self.done = True
+        image_size_cache.save()
+        settings = get_settings()
+        if settings.teximage is None and self.images:
+            # The aspect comes from the header cache filled by the scan
+            settings.teximage = bpy.data.images.get(self.images[0])
+        _logger.debug(f'Imported {len(self.images)} textures, '
+                      f'skipped {len(self.skipped)}')
+        self._redraw()
+
+    def _redraw(self) -> None:
+        for area in get_areas_by_type('VIEW_3D'):
+            area.tag_redraw()
+
+
+_job: Optional[TextureImportJob] = None
+
+
+def get_texture_import_job() -> Optional[TextureImportJob]:
+    return _job if _job is not None and not _job.done else None
+
+
+def start_texture_import(paths: List[str]) -> TextureImportJob:
+    global _job
+    cancel_texture_import()
+    _job = TextureImportJob(paths)
+    _job.start()
+    return _job
+
+
+def cancel_texture_import() -> None:
+    if _job is not None:
+        _job.cancel()
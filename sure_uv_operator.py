@@ -1,44 +1,545 @@
 import logging
-from typing import List, Tuple, Any
+import math
+import os
+from typing import List, NamedTuple, Tuple, Any, Optional
 import numpy as np
-from math import sin, cos, pi
 
 import bpy
-from bpy.types import Operator, Image
+from bpy.types import Operator, Image, OperatorFileListElement
 from bpy.props import (
     BoolProperty,
     BoolVectorProperty,
+    CollectionProperty,
+    EnumProperty,
     FloatProperty,
     FloatVectorProperty,
+    IntProperty,
     StringProperty,
     PointerProperty
 )
-from bpy_extras.io_utils import ImportHelper
-from mathutils import Vector
-
+from bpy_extras.io_utils import ImportHelper, ExportHelper
+
+from .sure_uv_projection import (get_box_project_matrices,
+                                 get_planar_matrix,
+                                 polygon_loop_indices,
+                                 best_planar_rotation,
+                                 mesh_fingerprint,
+                                 prepare_box_projection_batch,
+                                 apply_box_projection_batch,
+                                 prepare_planar_projection,
+                                 prepare_island_planar_projection,
+                                 apply_planar_projection,
+                                 transform_normals,
+                                 transform_rotations,
+                                 transform_box_sets,
+                                 transform_box_matrices)
+from .sure_uv_cache import projection_cache
+from .sure_uv_changes import MeshState, face_hashes, mesh_state, mesh_states
+from .sure_uv_imageinfo import is_image_file, list_image_files
+from .sure_uv_library import get_texture_import_job, start_texture_import
+from .sure_uv_panel import panel_state
+from .sure_uv_profiler import profiler, profiled
+from .sure_uv_select import (face_plane_distances,
+                             coplanar_faces,
+                             same_material_faces,
+                             face_adjacency,
+                             connected_faces,
+                             planar_islands)
+from .sure_uv_texel import (polygon_areas,
+                            texel_density,
+                            texel_stats,
+                            heat_colors,
+                            split_by_group,
+                            texel_report)
 from .sure_uv_utils import (get_settings,
+                            get_mesh_arrays,
+                            get_mesh_material_indices,
+                            get_mesh_verts,
+                            get_mesh_selected_polygons,
+                            get_mesh_loop_verts,
+                            get_mesh_polygon_loops,
+                            get_mesh_polygon_flags,
+                            get_mesh_loop_edges,
+                            set_mesh_face_selection,
+                            set_face_attribute,
+                            get_face_flags,
+                            set_face_flags,
+                            set_corner_colors,
+                            get_image_size,
+                            update_edit_meshes,
+                            get_edit_mesh_selection,
+                            use_bulk_edit_access,
+                            get_selected_mesh_arrays,
+                            get_mesh_loop_uvs,
+                            set_mesh_loop_uvs,
+                            restore_edit_mode,
+                            get_edit_mesh_loop_edges,
+                            get_edit_mesh_uvs,
+                            set_edit_mesh_uvs,
+                            remove_uv_layers,
+                            get_mesh_uvs,
+                            set_mesh_uvs,
+                            get_unique_meshes,
+                            ensure_uv_layer,
                             get_image_by_name,
-                            get_box_project_matrices,
+                            get_image_aspect,
                             create_checker_material,
+                            get_image_material,
+                            set_selected_faces_material,
+                            set_object_mode,
                             create_checker_image,
                             get_areas_by_type)
 
 
 _logger = logging.getLogger(__name__)
-_log = lambda: None
-_log.output = _logger.debug
-_log.error = _logger.error
+
+DOUBLE_PRECISION_DESCRIPTION = 'Project in float64 instead of float32. ' \
+                               'Only needed for geometry very far from ' \
+                               'the world origin'
+PER_ISLAND_DESCRIPTION = 'Give every planar island of connected faces ' \
+                         'its own Best Planar plane'
+ISLAND_ANGLE = math.radians(15.0)
+TRANSFORM_ITEMS = (('NONE', 'Local', 'Project the mesh coordinates as they '
+                                     'are'),
+                   ('SCALE', 'Scale', 'Include the object world scale, '
+                                      'no need to apply the scale'),
+                   ('FULL', 'World', 'Project in world space, the texture '
+                                     'stays put when objects move'))
+UV_LAYER_DESCRIPTION = 'UV map to write, created when missing. ' \
+                       'Empty = active UV map'
+USE_CHANNELS_DESCRIPTION = 'Also write the enabled UV channels of the ' \
+                           'panel, projected from the same geometry read'
+# INT face attribute marking the faces written by a keep mapped Box
+# mapping, only these are remapped after edits
+KEEP_MAPPED_ATTRIBUTE = 'sure_uv_keep_mapped'
 
 
 def update_texture_image(self, context: Any) -> None:
     image_name = self.texture_image
     img = get_image_by_name(image_name)
-    if not img or not img.size:
+    if not img:
         return
-    w, h = img.size[:]
-    if w == 0 or h == 0:
+    aspect = get_image_aspect(img)
+    if aspect is None:
         return
-    self.texaspect = w / h
+    self.texaspect = aspect
+
+
+def get_box_mapping_objects(context: Any, all_selected: bool) -> List[Any]:
+    obj = context.object
+    if not all_selected:
+        return [obj]
+    elif obj.mode == 'EDIT':
+        return list(context.objects_in_mode_unique_data)
+    return list(context.selected_objects)
+
+
+def get_object_transform(obj: Any, mode: str) -> Optional[np.ndarray]:
+    if mode == 'NONE':
+        return None
+    if mode == 'SCALE':
+        return np.diag(tuple(obj.matrix_world.to_scale()) + (1.0,))
+    return np.array(obj.matrix_world, dtype=np.float64)
+
+
+def get_mesh_transforms(objects: List[Any], meshes: List[Any],
+                        mode: str) -> Optional[List[np.ndarray]]:
+    # UVs belong to the mesh, a mesh shared by several objects is mapped
+    # with the transform of the first of them
+    if mode == 'NONE':
+        return None
+    owners = {}
+    for obj in objects:
+        if obj is not None and obj.type == 'MESH':
+            owners.setdefault(obj.data.as_pointer(), obj)
+    return [get_object_transform(owners[mesh.as_pointer()], mode)
+            for mesh in meshes]
+
+
+def get_material_profile_sets(objects: List[Any], meshes: List[Any],
+                              matrices: List[np.ndarray]) -> Tuple:
+    # Matrix set 0 holds the operator parameters and every enabled material
+    # profile adds one set of 6 matrices. Returns the flat matrix list and a
+    # material slot -> matrix set lookup per mesh, None without profiles.
+    profiles = {}
+    for obj in objects:
+        if obj is not None and obj.type == 'MESH':
+            profiles.setdefault(obj.data.as_pointer(), obj.sure_uv_profiles)
+
+    matrices = list(matrices)
+    slot_groups = []
+    for mesh in meshes:
+        enabled = [profile for profile in profiles.get(mesh.as_pointer(), ())
+                   if profile.enabled]
+        if not enabled:
+            slot_groups.append(None)
+            continue
+        lookup = np.zeros(max(len(mesh.materials), 1,
+                              *(profile.slot + 1 for profile in enabled)),
+                          dtype=np.int32)
+        for profile in enabled:
+            lookup[profile.slot] = len(matrices) // 6
+            matrices.extend(get_box_project_matrices(
+                profile.size, profile.texaspect, profile.rot, profile.offset))
+        slot_groups.append(lookup)
+
+    if all(lookup is None for lookup in slot_groups):
+        return matrices, None
+    return matrices, slot_groups
+
+
+def get_material_face_masks(objects: List[Any], meshes: List[Any],
+                            names: List[str]) -> List[np.ndarray]:
+    # Faces using one of the named materials, per mesh, every face without
+    # names. The slots come from the first object of each mesh.
+    if not names:
+        return [np.ones(len(mesh.polygons), dtype=bool) for mesh in meshes]
+    owners = {}
+    for obj in objects:
+        if obj is not None and obj.type == 'MESH':
+            owners.setdefault(obj.data.as_pointer(), obj)
+    masks = []
+    for mesh in meshes:
+        lookup = np.array([slot.material is not None and
+                           slot.material.name in names
+                           for slot in owners[mesh.as_pointer()]
+                           .material_slots] or [False], dtype=bool)
+        masks.append(lookup[np.clip(get_mesh_material_indices(mesh),
+                                    0, len(lookup) - 1)])
+    return masks
+
+
+def apply_slot_groups(mesh_arrays: Any, lookup: Optional[np.ndarray],
+                      slot_count: int) -> Any:
+    if lookup is None:
+        return mesh_arrays._replace(groups=None)
+    # Blender draws out of range material indices with the last slot of the
+    # mesh, the lookup can be longer when a profile names a missing slot
+    material_indices = np.clip(mesh_arrays.groups, 0,
+                               max(slot_count, 1) - 1)
+    return mesh_arrays._replace(groups=lookup[material_indices])
+
+
+class KeepMappedGeometry(NamedTuple):
+    mesh_arrays: Any
+    faces: np.ndarray               # face_hashes of the mesh
+    mapped: np.ndarray              # (F,) bool kept mapped faces
+    transform: Optional[np.ndarray]
+    state: MeshState
+
+
+def get_keep_mapped_geometry(obj: Any) -> KeepMappedGeometry:
+    # OBJECT mode mesh data, flush an edit mesh first
+    mesh = obj.data
+    mesh_arrays = get_mesh_arrays(mesh)
+    faces = face_hashes(mesh_arrays)
+    mapped = get_face_flags(mesh, KEEP_MAPPED_ATTRIBUTE)
+    if mapped is None:
+        mapped = np.zeros(len(mesh_arrays.loop_start), dtype=bool)
+    transform = get_object_transform(obj, obj.sure_uv_keep_mapped.transform)
+    return KeepMappedGeometry(mesh_arrays, faces, mapped, transform,
+                              mesh_state(mesh_arrays, faces, mapped,
+                                         transform))
+
+
+def get_projection_dtype(double_precision: bool) -> Any:
+    return np.float64 if double_precision else np.float32
+
+
+def get_prepared_projection(cache_key: Tuple, mesh_arrays: List[Any],
+                            prepare: Any) -> Any:
+    # In chunked mode nothing mesh-sized is prepared, so there is nothing
+    # worth caching either.
+    profiler.count(faces=sum(len(arrays.loop_start)
+                             for arrays in mesh_arrays),
+                   loops=sum(len(arrays.loop_verts)
+                             for arrays in mesh_arrays))
+    settings = get_settings()
+    projection_cache.max_bytes = settings.cache_size << 20
+    with profiler.span('prepare'):
+        if settings.chunk_size > 0:
+            return prepare(settings.chunk_size)
+        if settings.cache_size == 0:
+            return prepare(0)
+        return projection_cache.get_or_prepare(
+            cache_key, mesh_fingerprint(mesh_arrays), lambda: prepare(0))
+
+
+def get_edit_selections(meshes: List[Any], materials: bool=False) -> Tuple:
+    # Selected faces of EDIT mode meshes in compact order and their loops:
+    # BMLoops of the live edit mesh for small selections, mesh loop indices
+    # for large ones. BMesh UVs can only be written one loop at a time from
+    # Python and the mesh data is overwritten when EDIT mode ends, so large
+    # selections are written with foreach_set after one switch to OBJECT
+    # mode. The caller switches back with restore_edit_mode once the UVs
+    # are written.
+    if use_bulk_edit_access(meshes):
+        set_object_mode('OBJECT')
+        for mesh in meshes:
+            ensure_uv_layer(mesh)
+        selections = [get_selected_mesh_arrays(mesh, materials)
+                      for mesh in meshes]
+    else:
+        update_edit_meshes(meshes)
+        selections = [get_edit_mesh_selection(mesh, materials)
+                      for mesh in meshes]
+    return ([arrays for arrays, _ in selections],
+            [loops for _, loops in selections])
+
+
+def is_bulk_edit_loops(loops: Any) -> bool:
+    return isinstance(loops, np.ndarray)
+
+
+def prepare_box_mapping(meshes: List[Any], in_editmode: bool,
+                        double_precision: bool=False,
+                        slot_groups: Optional[List[Any]]=None,
+                        transforms: Optional[List[np.ndarray]]=None,
+                        set_count: int=1,
+                        faces: Optional[List[np.ndarray]]=None) -> Tuple:
+    # Redo-panel steps only change the matrices, so the gathered loop
+    # positions and axis buckets are reused while the geometry matches.
+    # With transforms mesh i uses the matrix sets from i * set_count on,
+    # see transform_box_matrices. faces limits OBJECT mode mappings to a
+    # face mask per mesh.
+    dtype = get_projection_dtype(double_precision)
+    use_groups = slot_groups is not None
+    cache_key = ('BOX', in_editmode, double_precision, use_groups,
+                 tuple(mesh.as_pointer() for mesh in meshes),
+                 None if transforms is None else
+                 tuple(transform.tobytes() for transform in transforms))
+
+    if in_editmode:
+        mesh_arrays, edit_loops = get_edit_selections(meshes, use_groups)
+    else:
+        for mesh in meshes:
+            ensure_uv_layer(mesh)
+        mesh_arrays = [get_mesh_arrays(mesh) for mesh in meshes]
+        if faces is not None:
+            mesh_arrays = [arrays._replace(selection=mask)
+                           for arrays, mask in zip(mesh_arrays, faces)]
+        if use_groups:
+            mesh_arrays = [
+                arrays._replace(groups=get_mesh_material_indices(mesh))
+                for arrays, mesh in zip(mesh_arrays, meshes)]
+        edit_loops = None
+
+    if use_groups:
+        # Faces pick their matrix set by material slot
+        mesh_arrays = [apply_slot_groups(arrays, lookup, len(mesh.materials))
+                       for arrays, lookup, mesh in zip(mesh_arrays,
+                                                       slot_groups, meshes)]
+    if transforms is not None:
+        mesh_arrays = transform_box_sets(mesh_arrays, transforms, set_count)
+
+    # All meshes go through a single kernel call
+    prepared = get_prepared_projection(
+        cache_key, mesh_arrays,
+        lambda chunk_size: prepare_box_projection_batch(
+            mesh_arrays, dtype, chunk_size=chunk_size))
+    return prepared, edit_loops
+
+
+def get_planar_rotation(normals: np.ndarray, selection: Optional[np.ndarray],
+                        transform: Optional[np.ndarray]) -> np.ndarray:
+    # With a transform the plane comes from the transformed normals and the
+    # transform is folded into the (3, 4) result
+    if transform is None:
+        return best_planar_rotation(normals, selection)
+    rotation = best_planar_rotation(transform_normals(normals, transform),
+                                    selection)
+    return transform_rotations(rotation, transform)
+
+
+def prepare_island_planar_mapping(mesh: Any, in_editmode: bool,
+                                  dtype: Any, cache_key: Tuple,
+                                  island_angle: float,
+                                  transform: Optional[np.ndarray]) -> Tuple:
+    # Faces are joined into islands across shared edges while their normals
+    # stay within island_angle, every island gets its own Best Planar plane.
+    # The islands come from the selected faces in EDIT mode and from the
+    # whole mesh in OBJECT mode.
+    if in_editmode:
+        (mesh_arrays,), edit_loops = get_edit_selections([mesh])
+        loops = edit_loops[0]
+        loop_edges = get_mesh_loop_edges(mesh)[loops] \
+            if is_bulk_edit_loops(loops) else \
+            get_edit_mesh_loop_edges(mesh, loops)
+    else:
+        ensure_uv_layer(mesh)
+        mesh_arrays = get_mesh_arrays(mesh)
+        loop_edges = get_mesh_loop_edges(mesh)
+        edit_loops = None
+
+    def prepare(chunk_size):
+        # Islands need the whole face set at once, so there is no chunked
+        # variant
+        normals = mesh_arrays.normals
+        if transform is not None:
+            normals = transform_normals(normals, transform)
+        with profiler.span('islands'):
+            pairs = face_adjacency(loop_edges, mesh_arrays.loop_start,
+                                   mesh_arrays.loop_total)
+            islands, island_count = planar_islands(normals, pairs,
+                                                   island_angle)
+        return prepare_island_planar_projection(mesh_arrays, islands,
+                                                island_count, dtype,
+                                                transform=transform)
+
+    prepared = get_prepared_projection(cache_key, [mesh_arrays], prepare)
+    return prepared, edit_loops
+
+
+def prepare_planar_mapping(mesh: Any, in_editmode: bool,
+                           double_precision: bool=False,
+                           per_island: bool=False,
+                           island_angle: float=ISLAND_ANGLE,
+                           transform: Optional[np.ndarray]=None,
+                           faces: Optional[np.ndarray]=None) -> Tuple:
+    dtype = get_projection_dtype(double_precision)
+    cache_key = ('PLANAR', in_editmode, double_precision, mesh.as_pointer(),
+                 None if transform is None else transform.tobytes(),
+                 faces is not None)
+
+    if per_island:
+        return prepare_island_planar_mapping(
+            mesh, in_editmode, dtype, cache_key + (island_angle,),
+            island_angle, transform)
+
+    if in_editmode:
+        (mesh_arrays,), edit_loops = get_edit_selections([mesh])
+        prepared = get_prepared_projection(
+            cache_key, [mesh_arrays],
+            lambda chunk_size: prepare_planar_projection(
+                mesh_arrays, get_planar_rotation(mesh_arrays.normals, None,
+                                                 transform),
+                dtype, chunk_size=chunk_size))
+        return prepared, edit_loops
+
+    ensure_uv_layer(mesh)
+
+    # Only selected polygons define the plane, but in OBJECT mode the
+    # whole mesh is projected onto it. An explicit faces mask (batch
+    # mapping, independent of the saved selection) defines the plane and
+    # is the only part projected.
+    if faces is None:
+        mesh_arrays = get_mesh_arrays(mesh, selected_only=True)
+    else:
+        mesh_arrays = get_mesh_arrays(mesh)._replace(selection=faces)
+
+    def prepare(chunk_size):
+        rotation = get_planar_rotation(mesh_arrays.normals,
+                                       mesh_arrays.selection, transform)
+        return prepare_planar_projection(
+            mesh_arrays._replace(selection=faces), rotation, dtype,
+            chunk_size=chunk_size)
+
+    prepared = get_prepared_projection(cache_key, [mesh_arrays], prepare)
+    return prepared, None
+
+
+def apply_planar_mapping(prepared: Any, mat: np.ndarray,
+                         loop_count: int) -> List[np.ndarray]:
+    new_uvs = np.zeros((loop_count, 2), dtype=np.float32)
+    with profiler.span('project'):
+        return [apply_planar_projection(prepared, mat, new_uvs,
+                                        get_settings().threads)]
+
+
+def apply_box_mapping(prepared: Any, matrices: np.ndarray
+                      ) -> List[np.ndarray]:
+    with profiler.span('project'):
+        return apply_box_projection_batch(prepared, matrices,
+                                          threads=get_settings().threads)
+
+
+def get_mapping_uvs(meshes: List[Any], edit_loops: Optional[List[List[Any]]],
+                    layer_name: str='') -> List[np.ndarray]:
+    if edit_loops is None:
+        return [get_mesh_uvs(mesh, layer_name) for mesh in meshes]
+    return [get_mesh_loop_uvs(mesh, loops, layer_name)
+            if is_bulk_edit_loops(loops) else
+            get_edit_mesh_uvs(mesh, loops, layer_name)
+            for mesh, loops in zip(meshes, edit_loops)]
+
+
+def set_mapping_uv_layers(meshes: List[Any],
+                          layers: List[Tuple[str, List[np.ndarray]]],
+                          edit_loops: Optional[List[List[Any]]]) -> None:
+    # layers: (UV map name, new uvs per mesh). Every UV map of a mesh is
+    # written before its one mesh update.
+    last = len(layers) - 1
+    for i, mesh in enumerate(meshes):
+        for index, (layer_name, new_uvs) in enumerate(layers):
+            if edit_loops is None:
+                set_mesh_uvs(mesh, new_uvs[i], layer_name,
+                             update=(index == last))
+            elif is_bulk_edit_loops(edit_loops[i]):
+                set_mesh_loop_uvs(mesh, edit_loops[i], new_uvs[i],
+                                  layer_name, update=(index == last))
+            else:
+                set_edit_mesh_uvs(mesh, edit_loops[i], new_uvs[i],
+                                  layer_name, update=(index == last))
+
+
+def set_mapping_uvs(meshes: List[Any], new_uvs: List[np.ndarray],
+                    edit_loops: Optional[List[List[Any]]],
+                    layer_name: str='',
+                    mesh_uvs: Optional[List[np.ndarray]]=None) -> None:
+    # mesh_uvs: whole UV layers of bulk EDIT mode meshes, updated in place
+    # so repeated writes (Tweak) skip reading the layer again
+    if mesh_uvs is None:
+        set_mapping_uv_layers(meshes, [(layer_name, new_uvs)], edit_loops)
+        return
+    for mesh, loops, uvs, layer_uvs in zip(meshes, edit_loops, new_uvs,
+                                           mesh_uvs):
+        set_mesh_loop_uvs(mesh, loops, uvs, layer_name, mesh_uvs=layer_uvs)
+
+
+def get_uv_channels() -> List[Any]:
+    return [channel for channel in get_settings().uv_channels
+            if channel.enabled]
+
+
+def get_channel_box_matrices(channel: Any, set_count: int
+                             ) -> List[np.ndarray]:
+    # Faces keep the matrix set of their material profile, the channel
+    # maps every set with its own parameters
+    return get_box_project_matrices(channel.size, channel.texaspect,
+                                    channel.rot, channel.offset) * set_count
+
+
+def get_channel_planar_matrix(channel: Any) -> np.ndarray:
+    return get_planar_matrix(channel.size, channel.texaspect, channel.rot[2],
+                             channel.offset[0], channel.offset[1])
+
+
+def get_box_channels(set_count: int) -> List[Tuple[str, List[np.ndarray]]]:
+    return [(channel.uv_layer, get_channel_box_matrices(channel, set_count))
+            for channel in get_uv_channels()]
+
+
+def get_planar_channels() -> List[Tuple[str, np.ndarray]]:
+    return [(channel.uv_layer, get_channel_planar_matrix(channel))
+            for channel in get_uv_channels()]
+
+
+def apply_box_layers(prepared: Any,
+                     channels: List[Tuple[str, List[np.ndarray]]],
+                     transforms: Optional[List[np.ndarray]]) -> List[Tuple]:
+    # One geometry read and classification for every UV map
+    layers = []
+    for layer_name, matrices in channels:
+        if transforms is not None:
+            matrices = transform_box_matrices(matrices, transforms)
+        layers.append((layer_name, apply_box_mapping(prepared, matrices)))
+    return layers
+
+
+def apply_planar_layers(prepared: Any, channels: List[Tuple[str, np.ndarray]],
+                        loop_count: int) -> List[Tuple]:
+    return [(layer_name, apply_planar_mapping(prepared, mat, loop_count))
+            for layer_name, mat in channels]
 
 
 class OBJECT_OT_SureUVBoxMapping(Operator):
@@ -62,6 +563,24 @@ class OBJECT_OT_SureUVBoxMapping(Operator):
     guess_texaspect: BoolProperty(name='Guess Aspect')
     reset_xyz_rot: BoolProperty(name='Reset XYZ Rotation')
     reset_xyz_offset: BoolProperty(name='Reset XYZ Offset')
+    all_selected: BoolProperty(name='All selected objects',
+                               description='Map every selected mesh object, '
+                                           'linked duplicates are computed once')
+    double_precision: BoolProperty(name='Double precision',
+                                   description=DOUBLE_PRECISION_DESCRIPTION)
+    use_profiles: BoolProperty(name='Material profiles', default=True,
+                               description='Faces of material slots with a '
+                                           'profile use the profile '
+                                           'Size, Aspect, Rotation and Offset')
+    transform: EnumProperty(name='Object transform', items=TRANSFORM_ITEMS,
+                            default='NONE')
+    keep_mapped: BoolProperty(name='Keep mapped',
+                              description='Box map the mapped faces again '
+                                          'with these parameters when later '
+                                          'geometry edits change them')
+    uv_layer: StringProperty(name='UV map', description=UV_LAYER_DESCRIPTION)
+    use_channels: BoolProperty(name='UV channels', default=True,
+                               description=USE_CHANNELS_DESCRIPTION)
 
     def draw(self, context):
         layout = self.layout
@@ -99,86 +618,94 @@ class OBJECT_OT_SureUVBoxMapping(Operator):
         row.prop(self, 'reset_texaspect', icon='FILE_IMAGE', expand=True)
         row.prop(self, 'guess_texaspect', icon='FILE_IMAGE', expand=True)
 
-    def box_mapping(self):
-        scene = bpy.context.scene
-        obj = bpy.context.object
+        layout.prop(self, 'all_selected')
+        layout.prop(self, 'use_profiles')
+        layout.prop(self, 'transform')
+        layout.prop(self, 'keep_mapped')
+        layout.prop(self, 'uv_layer')
+        layout.prop(self, 'use_channels')
+        layout.prop(self, 'double_precision')
+
+    def store_keep_mapped(self, objects: List[Any], in_editmode: bool
+                          ) -> None:
+        # Objects already kept mapped follow the latest parameters and add
+        # the faces just mapped to their kept mapped faces
+        for obj in objects:
+            params = obj.sure_uv_keep_mapped
+            if not (self.keep_mapped or params.enabled):
+                continue
+            self.store_mapped_faces(obj, in_editmode, params.enabled)
+            params.enabled = True
+            params.size = self.size
+            params.texaspect = self.texaspect
+            params.rot = self.rot
+            params.offset = self.offset
+            params.use_profiles = self.use_profiles
+            params.transform = self.transform
+            params.double_precision = self.double_precision
+            params.uv_layer = self.uv_layer
+            params.channels.clear()
+            if not self.use_channels:
+                continue
+            for channel in get_uv_channels():
+                stored = params.channels.add()
+                for name in ('uv_layer', 'size', 'texaspect', 'rot',
+                             'offset'):
+                    setattr(stored, name, getattr(channel, name))
+        # The geometry as mapped now is the reference of the next remap,
+        # edits made before leaving EDIT mode are remapped too
+        for obj in objects:
+            if obj.sure_uv_keep_mapped.enabled:
+                mesh_states[obj.data.as_pointer()] = \
+                    get_keep_mapped_geometry(obj).state
+
+    @staticmethod
+    def store_mapped_faces(obj: Any, in_editmode: bool, union: bool) -> None:
         mesh = obj.data
-        in_editmode = (obj.mode == 'EDIT')
-
+        if obj.mode == 'EDIT':
+            obj.update_from_editmode()
         if in_editmode:
-            bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+            faces = get_mesh_selected_polygons(mesh)
+        else:
+            faces = np.ones(len(mesh.polygons), dtype=bool)
+        set_face_flags(obj, KEEP_MAPPED_ATTRIBUTE, faces, union)
 
-        if len(mesh.uv_layers) == 0:
-            bpy.ops.mesh.uv_texture_add()
+    def box_mapping(self):
+        context = bpy.context
+        in_editmode = (context.object.mode == 'EDIT')
+        objects = get_box_mapping_objects(context, self.all_selected)
+        meshes = get_unique_meshes(objects)
 
         matrices = get_box_project_matrices(self.size, self.texaspect,
                                             self.rot, self.offset)
-
-        loop_vertex_indices = np.empty((len(mesh.loops),), dtype=np.int32)
-        mesh.loops.foreach_get('vertex_index', loop_vertex_indices)
-
-        mesh_verts = np.empty((len(mesh.vertices), 3), dtype=np.float32)
-        mesh.vertices.foreach_get('co', mesh_verts.ravel())
-
-        loop_verts = np.pad(mesh_verts[loop_vertex_indices], (0, 1),
-                            'constant', constant_values=1)
-
-        if in_editmode:
-            selected_polygons = np.empty((len(mesh.polygons),), dtype=np.bool)
-            mesh.polygons.foreach_get('select', selected_polygons)
-            choice_indices = np.full((len(mesh.loops),), -1, dtype=np.int32)
-        else:
-            choice_indices = np.empty((len(mesh.loops),), dtype=np.int32)
-
-        polygons = mesh.polygons if not in_editmode else \
-            np.take(mesh.polygons, selected_polygons.nonzero()[0])
-
-        for p in polygons:
-            n = p.normal
-            if abs(n[0]) > abs(n[1]) and abs(n[0]) > abs(n[2]):
-                if n[0] >= 0:
-                    choice = 0
-                else:
-                    choice = 1
-            elif abs(n[1]) > abs(n[0]) and abs(n[1]) > abs(n[2]):
-                if n[1] >= 0:
-                    choice = 2
-                else:
-                    choice = 3
-            else:
-                if n[2] >= 0:
-                    choice = 4
-                else:
-                    choice = 5
-            choice_indices[p.loop_indices] = choice
-
-        dir_indices = [(choice_indices == x).nonzero() for x in range(6)]
-
-        uvmap = mesh.uv_layers.active.data
-        new_uvs = np.empty((len(mesh.loops), 2), dtype=np.float32)
-
-        if in_editmode:
-            uvmap.foreach_get('uv', new_uvs.ravel())
-
-        for i in range(6):
-            new_uvs[dir_indices[i]] = loop_verts[dir_indices[i]] @ matrices[i].transpose()
-
-        uvmap.foreach_set('uv', new_uvs.ravel())
-
-        mesh.update()
-
-        if in_editmode:
-            bpy.ops.object.mode_set(mode='EDIT', toggle=False)
+        slot_groups = None
+        if self.use_profiles:
+            matrices, slot_groups = get_material_profile_sets(
+                objects, meshes, matrices)
+
+        set_count = len(matrices) // 6
+        transforms = get_mesh_transforms(objects, meshes, self.transform)
+        prepared, edit_loops = prepare_box_mapping(
+            meshes, in_editmode, self.double_precision, slot_groups,
+            transforms, set_count)
+        channels = [(self.uv_layer, matrices)]
+        if self.use_channels:
+            channels.extend(get_box_channels(set_count))
+        set_mapping_uv_layers(meshes,
+                              apply_box_layers(prepared, channels, transforms),
+                              edit_loops)
+        self.store_keep_mapped(objects, in_editmode)
 
     def invoke(self, context, event):
-        _log.output('-- invoke Box mapping --')
+        _logger.debug('-- invoke Box mapping --')
         self.execute(context)
-        _log.output('-- finish invoke --')
+        _logger.debug('-- finish invoke --')
         return {'FINISHED'}
 
+    @profiled
     def execute(self, context):
-        _log.output('-- execute Box mapping --')
-        _log.output(f'texture_image: {self.texture_image}')
+        _logger.debug('-- execute Box mapping --')
+        _logger.debug(f'texture_image: {self.texture_image}')
         if self.size_x2:
             self.size_x2 = False
             self.size = self.size * 2.0
@@ -200,8 +727,13 @@ class OBJECT_OT_SureUVBoxMapping(Operator):
         if self.guess_texaspect:
             self.guess_texaspect = False
             update_texture_image(self, None)
-        self.box_mapping()
-        _log.output('-- finish execute --')
+        try:
+            with restore_edit_mode(context.object):
+                self.box_mapping()
+        except RuntimeError as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+        _logger.debug('-- finish execute --')
         return {'FINISHED'}
 
 
@@ -236,6 +768,21 @@ class OBJECT_OT_SureUVPlanarMapping(Operator):
                              description='Rotate texture on -45 degree (counter-clockwise)')
     reset_zrot: BoolProperty(name='Reset rotation',
                              description='Reset rotation angles to zero')
+    per_island: BoolProperty(name='Per island',
+                             description=PER_ISLAND_DESCRIPTION)
+    island_angle: FloatProperty(name='Island angle', subtype='ANGLE',
+                                default=ISLAND_ANGLE, min=0.0,
+                                max=math.pi,
+                                description='Maximum angle between the '
+                                            'normals of neighbor faces of '
+                                            'an island')
+    transform: EnumProperty(name='Object transform', items=TRANSFORM_ITEMS,
+                            default='NONE')
+    uv_layer: StringProperty(name='UV map', description=UV_LAYER_DESCRIPTION)
+    use_channels: BoolProperty(name='UV channels', default=True,
+                               description=USE_CHANNELS_DESCRIPTION)
+    double_precision: BoolProperty(name='Double precision',
+                                   description=DOUBLE_PRECISION_DESCRIPTION)
 
     def draw(self, context):
         layout = self.layout
@@ -278,73 +825,47 @@ class OBJECT_OT_SureUVPlanarMapping(Operator):
         row.prop(self, 'reset_texaspect', icon='FILE_IMAGE', expand=True)
         row.prop(self, 'guess_texaspect', icon='FILE_IMAGE', expand=True)
 
+        layout.prop(self, 'per_island')
+        row = layout.row()
+        row.active = self.per_island
+        row.prop(self, 'island_angle')
+        layout.prop(self, 'transform')
+        layout.prop(self, 'uv_layer')
+        layout.prop(self, 'use_channels')
+        layout.prop(self, 'double_precision')
+
     def best_planar_mapping(self):
         obj = bpy.context.object
         mesh = obj.data
 
         in_editmode = (obj.mode == 'EDIT')
 
-        if in_editmode:
-            bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
-
-        if not len(mesh.uv_layers) > 0:
-            bpy.ops.mesh.uv_texture_add()
-
-        selected_polygons = np.empty((len(mesh.polygons),), dtype=np.bool)
-        mesh.polygons.foreach_get('select', selected_polygons)
-
-        polygon_indices = selected_polygons.nonzero()[0]
-
-        polygon_normals = np.empty((len(mesh.polygon_normals), 3), dtype=np.float32)
-        mesh.polygon_normals.foreach_get('vector', polygon_normals.ravel())
-
-        selected_normals = polygon_normals[selected_polygons]
-        if len(polygon_indices) > 0:
-            average_vec = Vector(np.average(selected_normals, axis=0))
-        else:
-            average_vec = Vector((0,0,1))
-
-        zv = Vector((0,0,1))
-        quat = average_vec.rotation_difference(zv).to_matrix()
-
-        aspect = self.texaspect
-        sc = 1.0 / self.size if self.size != 0 else 1.0
-        sx, sy, sz = sc, sc, sc
-        rz = self.zrot / 180 * pi
-
-        cosrz = cos(rz)
-        sinrz = sin(rz)
-
-        mat = np.array([[sx * cosrz, -sy * sinrz, 0, self.xoffset],
-                        [sx * aspect * sinrz, sy * aspect * cosrz, 0, self.yoffset]])
-
-        uvmap = mesh.uv_layers.active.data
-        new_uvs = np.empty((len(mesh.loops), 2), dtype=np.float32)
-        uvmap.foreach_get('uv', new_uvs.ravel())
-
-        polygons = mesh.polygons if not in_editmode else \
-            np.take(mesh.polygons, polygon_indices)
-        for pol in polygons:
-            for loop in pol.loop_indices:
-                v_idx = mesh.loops[loop].vertex_index
-                co = quat @ mesh.vertices[v_idx].co
-                vec = [*co, 1.0]
-                new_uvs[loop] = vec @ mat.transpose()
-
-        uvmap.foreach_set('uv', new_uvs.ravel())
-
-        if in_editmode:
-            bpy.ops.object.mode_set(mode='EDIT', toggle=False)
+        mat = get_planar_matrix(self.size, self.texaspect, self.zrot,
+                                self.xoffset, self.yoffset)
+
+        prepared, edit_loops = prepare_planar_mapping(
+            mesh, in_editmode, self.double_precision, self.per_island,
+            self.island_angle, get_object_transform(obj, self.transform))
+        loop_count = len(mesh.loops) if edit_loops is None else \
+            len(edit_loops[0])
+        channels = [(self.uv_layer, mat)]
+        if self.use_channels:
+            channels.extend(get_planar_channels())
+        set_mapping_uv_layers([mesh],
+                              apply_planar_layers(prepared, channels,
+                                                  loop_count),
+                              edit_loops)
 
     def invoke(self, context, event):
-        _log.output('-- invoke Planar mapping --')
+        _logger.debug('-- invoke Planar mapping --')
         self.execute(context)
-        _log.output('-- finish invoke --')
+        _logger.debug('-- finish invoke --')
         return {'FINISHED'}
 
+    @profiled
     def execute(self, context):
-        _log.output('-- execute Planar mapping --')
-        _log.output(f'texture_image: {self.texture_image}')
+        _logger.debug('-- execute Planar mapping --')
+        _logger.debug(f'texture_image: {self.texture_image}')
         if self.size_x2:
             self.size_x2 = False
             self.size = self.size * 2.0
@@ -380,10 +901,453 @@ class OBJECT_OT_SureUVPlanarMapping(Operator):
         if self.reset_yoffset:
             self.reset_yoffset = False
             self.yoffset = 0.0
-        self.best_planar_mapping()
-        _log.output('-- finish execute --')
+        try:
+            with restore_edit_mode(context.object):
+                self.best_planar_mapping()
+        except RuntimeError as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+        _logger.debug('-- finish execute --')
+        return {'FINISHED'}
+
+class OBJECT_OT_SureUVTweakMapping(Operator):
+    bl_idname = 'object.sure_uv_tweak_mapping'
+    bl_label = 'Tweak mapping'
+    bl_description = 'Interactively adjust texture Size, Rotation and Offset ' \
+                     'with the mouse. S: size, R: rotation, G: offset, ' \
+                     'X/Y/Z: axis, Shift: precise, LMB/Enter: confirm, ' \
+                     'RMB/Esc: cancel'
+    bl_options = {'REGISTER', 'UNDO', 'BLOCKING'}
+
+    mapping: EnumProperty(name='Mapping',
+                          items=(('BOX', 'Box', 'Box mapping'),
+                                 ('PLANAR', 'Best Planar',
+                                  'Best Planar mapping')),
+                          default='BOX')
+    texture_image: StringProperty(name='Image', update=update_texture_image)
+    size: FloatProperty(name='Size', default=1.0, precision=4,
+                        description='Texture real size (image width = Size)')
+    texaspect: FloatProperty(name='Texture aspect', default=1.0, precision=4,
+                             description='Texture aspect')
+    rot: FloatVectorProperty(name='XYZ Rotation',
+                             description='Angles of rotation, Best Planar '
+                                         'uses Z only')
+    offset: FloatVectorProperty(name='XYZ offset', precision=4,
+                                description='Texture offset, Best Planar '
+                                            'uses X and Y only')
+    all_selected: BoolProperty(name='All selected objects',
+                               description='Box map every selected mesh '
+                                           'object')
+    use_profiles: BoolProperty(name='Material profiles', default=True,
+                               description='Faces of material slots with a '
+                                           'profile use the profile '
+                                           'parameters, only the others '
+                                           'follow the tweak')
+    per_island: BoolProperty(name='Per island',
+                             description=PER_ISLAND_DESCRIPTION)
+    island_angle: FloatProperty(name='Island angle', subtype='ANGLE',
+                                default=ISLAND_ANGLE, min=0.0,
+                                max=math.pi)
+    transform: EnumProperty(name='Object transform', items=TRANSFORM_ITEMS,
+                            default='NONE')
+    uv_layer: StringProperty(name='UV map', description=UV_LAYER_DESCRIPTION)
+    use_channels: BoolProperty(name='UV channels', default=True,
+                               description=USE_CHANNELS_DESCRIPTION)
+    double_precision: BoolProperty(name='Double precision',
+                                   description=DOUBLE_PRECISION_DESCRIPTION)
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, 'mapping')
+        layout.prop_search(self, 'texture_image', bpy.data, 'images')
+        layout.prop(self, 'size')
+        layout.prop(self, 'texaspect')
+        layout.prop(self, 'rot')
+        layout.prop(self, 'offset')
+        if self.mapping == 'BOX':
+            layout.prop(self, 'all_selected')
+            layout.prop(self, 'use_profiles')
+        else:
+            layout.prop(self, 'per_island')
+            if self.per_island:
+                layout.prop(self, 'island_angle')
+        layout.prop(self, 'transform')
+        layout.prop(self, 'uv_layer')
+        layout.prop(self, 'use_channels')
+        layout.prop(self, 'double_precision')
+
+    def prepare(self, context):
+        in_editmode = (context.object.mode == 'EDIT')
+        self._in_editmode = in_editmode
+        if self.mapping == 'BOX':
+            objects = get_box_mapping_objects(context, self.all_selected)
+            self._meshes = get_unique_meshes(objects)
+        else:
+            self._meshes = [context.object.data]
+        # UV maps added from here on are removed again on cancel
+        self._uv_layer_names = [{layer.name for layer in mesh.uv_layers}
+                                for mesh in self._meshes]
+        if self.mapping == 'BOX':
+            # Profile matrix sets do not follow the tweak, only set 0 does
+            slot_groups = None
+            self._profile_matrices = []
+            if self.use_profiles:
+                matrices, slot_groups = get_material_profile_sets(
+                    objects, self._meshes,
+                    get_box_project_matrices(self.size, self.texaspect,
+                                             self.rot, self.offset))
+                self._profile_matrices = matrices[6:]
+            self._set_count = 1 + len(self._profile_matrices) // 6
+            self._transforms = get_mesh_transforms(objects, self._meshes,
+                                                   self.transform)
+            self._prepared, self._edit_loops = prepare_box_mapping(
+                self._meshes, in_editmode, self.double_precision,
+                slot_groups, self._transforms, self._set_count)
+        else:
+            self._prepared, self._edit_loops = prepare_planar_mapping(
+                self._meshes[0], in_editmode, self.double_precision,
+                self.per_island, self.island_angle,
+                get_object_transform(context.object, self.transform))
+        if self._edit_loops is None:
+            self._loop_count = len(self._meshes[0].loops)
+        else:
+            self._loop_count = len(self._edit_loops[0])
+        # Bulk EDIT mode writes scatter into a copy of the whole UV layer
+        # read once here, instead of reading it on every mouse move
+        self._mesh_uvs = None
+        if self._edit_loops is not None and \
+                is_bulk_edit_loops(self._edit_loops[0]):
+            self._mesh_uvs = [get_mesh_uvs(mesh, self.uv_layer)
+                              for mesh in self._meshes]
+
+    def apply(self):
+        if self.mapping == 'BOX':
+            matrices = get_box_project_matrices(self.size, self.texaspect,
+                                                self.rot, self.offset)
+            channels = [(self.uv_layer, matrices + self._profile_matrices)]
+            (_, new_uvs), = apply_box_layers(self._prepared, channels,
+                                             self._transforms)
+        else:
+            mat = get_planar_matrix(self.size, self.texaspect, self.rot[2],
+                                    self.offset[0], self.offset[1])
+            new_uvs = apply_planar_mapping(self._prepared, mat,
+                                           self._loop_count)
+        set_mapping_uvs(self._meshes, new_uvs, self._edit_loops,
+                        self.uv_layer, self._mesh_uvs)
+
+    def apply_channels(self):
+        # The channels do not depend on the tweaked parameters, they are
+        # written once when the tweak is confirmed
+        if not self.use_channels:
+            return
+        if self.mapping == 'BOX':
+            layers = apply_box_layers(self._prepared,
+                                      get_box_channels(self._set_count),
+                                      self._transforms)
+        else:
+            layers = apply_planar_layers(self._prepared,
+                                         get_planar_channels(),
+                                         self._loop_count)
+        if layers:
+            set_mapping_uv_layers(self._meshes, layers, self._edit_loops)
+
+    def update_header(self, context):
+        axis = 'XYZ'[self._axis]
+        if self._tweak == 'SIZE':
+            text = f'Size: {self.size:.4f}'
+        elif self._tweak == 'ROTATION':
+            text = f'Rotation {axis}: {self.rot[self._axis]:.2f}'
+        else:
+            text = 'Offset: ' + ' '.join(f'{v:.4f}' for v in self.offset)
+        context.area.header_text_set(
+            f'{text}    S: size  R: rotation  G: offset  X/Y/Z: axis '
+            f'({axis})  LMB/Enter: confirm  RMB/Esc: cancel')
+
+    def tweak(self, delta_x, delta_y, precise):
+        factor = 0.1 if precise else 1.0
+        if self._tweak == 'SIZE':
+            self.size = max(self.size * (1.0 + delta_x * 0.005 * factor),
+                            1e-6)
+        elif self._tweak == 'ROTATION':
+            axis = 2 if self.mapping == 'PLANAR' else self._axis
+            self.rot[axis] += delta_x * 0.5 * factor
+        elif self.mapping == 'PLANAR':
+            self.offset[0] += delta_x * 0.005 * factor
+            self.offset[1] += delta_y * 0.005 * factor
+        else:
+            self.offset[self._axis] += delta_x * 0.005 * self.size * factor
+
+    def finish(self, context):
+        context.area.header_text_set(None)
+        # Large EDIT mode selections are tweaked in OBJECT mode
+        if self._in_editmode and context.object.mode != 'EDIT':
+            set_object_mode('EDIT')
+
+    def cancel(self, context):
+        # Esc/RMB, or Blender ending the modal session
+        try:
+            set_mapping_uvs(self._meshes, self._original_uvs,
+                            self._edit_loops, self.uv_layer, self._mesh_uvs)
+            for mesh, names in zip(self._meshes, self._uv_layer_names):
+                added = {layer.name for layer in mesh.uv_layers} - names
+                if added:
+                    remove_uv_layers(mesh, added)
+        finally:
+            self.finish(context)
+
+    def invoke(self, context, event):
+        obj = context.object
+        if obj is None or obj.type != 'MESH':
+            return {'CANCELLED'}
+        _logger.debug('-- invoke Tweak mapping --')
+        try:
+            with profiler.run(self.bl_label):
+                self.prepare(context)
+                self._original_uvs = get_mapping_uvs(self._meshes,
+                                                     self._edit_loops,
+                                                     self.uv_layer)
+                self.apply()
+        except RuntimeError as error:
+            # prepare may have left EDIT mode already
+            self.finish(context)
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+        self._tweak = 'SIZE'
+        self._axis = 2
+        self._mouse = (event.mouse_x, event.mouse_y)
+        self.update_header(context)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'MOUSEMOVE':
+            delta_x = event.mouse_x - self._mouse[0]
+            delta_y = event.mouse_y - self._mouse[1]
+            self._mouse = (event.mouse_x, event.mouse_y)
+            self.tweak(delta_x, delta_y, event.shift)
+            self.apply()
+        elif event.value != 'PRESS':
+            return {'RUNNING_MODAL'}
+        elif event.type in {'S', 'R', 'G'}:
+            self._tweak = {'S': 'SIZE', 'R': 'ROTATION',
+                           'G': 'OFFSET'}[event.type]
+        elif event.type in {'X', 'Y', 'Z'}:
+            self._axis = 'XYZ'.index(event.type)
+        elif event.type in {'LEFTMOUSE', 'RET', 'NUMPAD_ENTER'}:
+            with profiler.run(self.bl_label):
+                self.apply_channels()
+            self.finish(context)
+            _logger.debug('-- finish Tweak mapping --')
+            return {'FINISHED'}
+        elif event.type in {'RIGHTMOUSE', 'ESC'}:
+            self.cancel(context)
+            return {'CANCELLED'}
+        else:
+            return {'RUNNING_MODAL'}
+        self.update_header(context)
+        return {'RUNNING_MODAL'}
+
+    @profiled
+    def execute(self, context):
+        # Used by the redo panel once the modal session has finished
+        obj = context.object
+        if obj is None or obj.type != 'MESH':
+            return {'CANCELLED'}
+        with restore_edit_mode(obj):
+            self.prepare(context)
+            self.apply()
+            self.apply_channels()
+        return {'FINISHED'}
+
+
+class OBJECT_OT_SureUVMaterialProfile(Operator):
+    bl_idname = 'object.sure_uv_material_profile'
+    bl_label = 'Material profile'
+    bl_description = 'Add or remove a Box mapping profile for a material slot'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    action: StringProperty(default='ADD')
+    slot: IntProperty(name='Material slot', default=-1,
+                      description='Material slot, -1 = active slot')
+
+    def draw(self, context):
+        pass
+
+    def invoke(self, context, event):
+        return self.execute(context)
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        if obj is None or obj.type != 'MESH':
+            return {'CANCELLED'}
+        slot = obj.active_material_index if self.slot < 0 else self.slot
+        profiles = obj.sure_uv_profiles
+        index = next((i for i, profile in enumerate(profiles)
+                      if profile.slot == slot), -1)
+
+        if self.action == 'ADD':
+            if index >= 0:
+                self.report({'INFO'}, f'Slot {slot} already has a profile')
+                return {'CANCELLED'}
+            profile = profiles.add()
+            profile.slot = slot
+            settings = get_settings()
+            profile.texaspect = settings.texaspect \
+                if settings.texaspect != 0.0 else 1.0
+        elif self.action == 'REMOVE':
+            if index < 0:
+                return {'CANCELLED'}
+            profiles.remove(index)
+        return {'FINISHED'}
+
+
+class OBJECT_OT_SureUVChannel(Operator):
+    bl_idname = 'object.sure_uv_channel'
+    bl_label = 'UV channel'
+    bl_description = 'Add or remove an extra UV map written by Box and ' \
+                     'Best Planar mapping'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    action: StringProperty(default='ADD')
+    index: IntProperty(name='Channel', default=-1,
+                       description='Channel to remove, -1 = last one')
+
+    def draw(self, context):
+        pass
+
+    def invoke(self, context, event):
+        return self.execute(context)
+
+    @profiled
+    def execute(self, context):
+        channels = get_settings().uv_channels
+        if self.action == 'ADD':
+            names = {channel.uv_layer for channel in channels}
+            number = len(channels) + 1
+            while f'UVMap.{number:03d}' in names:
+                number += 1
+            channel = channels.add()
+            channel.uv_layer = f'UVMap.{number:03d}'
+        elif self.action == 'REMOVE':
+            index = len(channels) - 1 if self.index < 0 else self.index
+            if not 0 <= index < len(channels):
+                return {'CANCELLED'}
+            channels.remove(index)
+        return {'FINISHED'}
+
+
+TEXEL_DENSITY_ATTRIBUTE = 'sure_uv_texel_density'
+TEXEL_DEVIATION_ATTRIBUTE = 'sure_uv_texel_deviation'
+TEXEL_HEAT_ATTRIBUTE = 'sure_uv_texel_heat'
+
+
+def write_texel_attributes(mesh: Any, density: np.ndarray,
+                           deviation: np.ndarray, loop_start: np.ndarray,
+                           loop_total: np.ndarray) -> None:
+    # deviation is density / target per face
+    set_face_attribute(mesh, TEXEL_DENSITY_ATTRIBUTE, density)
+    set_face_attribute(mesh, TEXEL_DEVIATION_ATTRIBUTE, deviation)
+    colors = np.empty((len(mesh.loops), 4), dtype=np.float32)
+    colors[polygon_loop_indices(loop_start, loop_total)] = \
+        np.repeat(heat_colors(deviation), loop_total, axis=0)
+    set_corner_colors(mesh, TEXEL_HEAT_ATTRIBUTE, colors)
+
+
+class OBJECT_OT_SureUVTexelDensity(Operator):
+    bl_idname = 'object.sure_uv_texel_density'
+    bl_label = 'Texel density'
+    bl_description = 'Measure the texel density of every face and its ' \
+                     'deviation from the target, shown as a heat map: ' \
+                     'blue = too low, green = on target, red = too high'
+    bl_options = {'REGISTER', 'UNDO'}
+
+    texture_size: IntProperty(name='Texture width', default=0, min=0,
+                              description='Texture width in pixels, 0 = '
+                                          'width of the selected Texture')
+    size: FloatProperty(name='Size', default=1.0, min=1e-6, precision=4,
+                        description='Texture real size (image width = Size)')
+    tolerance: FloatProperty(name='Tolerance', default=0.1, min=0.0,
+                             max=1.0, subtype='FACTOR',
+                             description='Relative density error counted '
+                                         'as on target')
+    all_selected: BoolProperty(name='All selected objects', default=True)
+    write_attributes: BoolProperty(name='Heat map', default=True,
+                                   description='Write density and '
+                                               'deviation (density / target) '
+                                               'face attributes and a heat '
+                                               'map color attribute')
+
+    def get_texture_width(self) -> int:
+        if self.texture_size > 0:
+            return self.texture_size
+        img = get_settings().teximage
+        width = get_image_size(img)[0] if img is not None else 0
+        return width if width > 0 else 1024
+
+    def analyze(self, context):
+        settings = get_settings()
+        width = self.get_texture_width()
+        aspect = settings.texaspect if settings.texaspect != 0.0 else 1.0
+        target = width / self.size
+
+        texel_report.clear()
+        texel_report.target = target
+        texel_report.tolerance = self.tolerance
+        materials = {}
+        seen = set()
+        for obj in get_box_mapping_objects(context, self.all_selected):
+            if obj is None or obj.type != 'MESH' or \
+                    obj.data.as_pointer() in seen:
+                continue
+            mesh = obj.data
+            seen.add(mesh.as_pointer())
+            if not mesh.uv_layers.active or not len(mesh.polygons):
+                continue
+
+            with profiler.span('read'):
+                loop_start, loop_total = get_mesh_polygon_loops(mesh)
+                points = get_mesh_verts(mesh)[get_mesh_loop_verts(mesh)]
+                uvs = get_mesh_uvs(mesh)
+                material_indices = get_mesh_material_indices(mesh)
+            profiler.count(faces=len(loop_start), loops=len(uvs))
+            with profiler.span('areas'):
+                area = polygon_areas(points, loop_start, loop_total)
+                uv_area = polygon_areas(uvs, loop_start, loop_total)
+                density = texel_density(area, uv_area, width, aspect)
+            texel_report.objects.append(
+                (obj.name, texel_stats(area, uv_area, density, target,
+                                       self.tolerance)))
+
+            slot_count = max(len(mesh.materials), 1)
+            for index, arrays in split_by_group(
+                    np.minimum(material_indices, slot_count - 1),
+                    area, uv_area, density).items():
+                mat = mesh.materials[index] if mesh.materials else None
+                name = mat.name if mat is not None else '(no material)'
+                materials.setdefault(name, []).append(arrays)
+
+            if self.write_attributes:
+                with profiler.span('write'):
+                    write_texel_attributes(mesh, density, density / target,
+                                           loop_start, loop_total)
+        texel_report.set_materials(materials)
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        if obj is None or obj.type != 'MESH':
+            return {'CANCELLED'}
+        # Mesh data is only current (and writable) outside of EDIT mode
+        with restore_edit_mode(obj):
+            if obj.mode == 'EDIT':
+                set_object_mode('OBJECT')
+            self.analyze(context)
+        if not texel_report:
+            self.report({'WARNING'}, 'No mesh with a UV map to analyze')
         return {'FINISHED'}
 
+
 class OBJECT_OT_SureUVShowTextures(Operator):
     bl_idname = 'object.sure_uv_show_textures'
     bl_label = 'Show textures'
@@ -399,17 +1363,20 @@ class OBJECT_OT_SureUVShowTextures(Operator):
         areas = get_areas_by_type('VIEW_3D')
         for area in areas:
             area.spaces.active.shading.type = self.mode
+        # Python writes don't notify the msgbus subscription
+        panel_state.forget_shading()
 
     def invoke(self, context, event):
         self.act(context)
         return {'FINISHED'}
 
+    @profiled
     def execute(self, context):
-        _log.output('-- execute --')
-        _log.output(f'action: {self.action}')
+        _logger.debug('-- execute --')
+        _logger.debug(f'action: {self.action}')
         scene = bpy.context.scene
         settings = scene.sure_uv_settings
-        _log.output(settings.teximage)
+        _logger.debug(settings.teximage)
         self.act(context)
         return {'FINISHED'}
 
@@ -429,6 +1396,7 @@ class OBJECT_OT_SureUVCheckerMat(Operator):
         self.execute(context)
         return {'FINISHED'}
 
+    @profiled
     def execute(self, context):
         obj = bpy.context.object
         if obj.type != 'MESH':
@@ -443,12 +1411,16 @@ class OBJECT_OT_SureUVCheckerMat(Operator):
             checker_mat_name = 'sure_uv_checker_mat2'
             checker_type = 'COLOR_GRID'
 
-        checker_image = create_checker_image(image_name=checker_image_name,
-                                             generated_type=checker_type)
-        mat = create_checker_material(mat_name=checker_mat_name,
-                                      image_name=checker_image_name)
-        obj.data.materials.clear()
-        obj.data.materials.append(mat)
+        with profiler.span('image'):
+            checker_image = create_checker_image(
+                image_name=checker_image_name, generated_type=checker_type,
+                tex_size=int(get_settings().checker_resolution))
+        with profiler.span('material'):
+            mat = create_checker_material(mat_name=checker_mat_name,
+                                          image_name=checker_image_name)
+        if list(obj.data.materials) != [mat]:
+            obj.data.materials.clear()
+            obj.data.materials.append(mat)
         return {'FINISHED'}
 
 
@@ -469,6 +1441,7 @@ class OBJECT_OT_SureUVPreviewMat(Operator):
         self.execute(context)
         return {'FINISHED'}
 
+    @profiled
     def execute(self, context):
         obj = bpy.context.object
         if self.action == 'preview_mat':
@@ -479,32 +1452,43 @@ class OBJECT_OT_SureUVPreviewMat(Operator):
             obj.data.materials.append(mat)
         elif self.action == 'temp_mat':
             temp_mat_name = 'sure_uv_tmp_mat'
-            mat = create_checker_material(mat_name=temp_mat_name,
-                                          image_name=self.image_name,
-                                          unique_name=False)
-            obj.data.materials.append(mat)
-            mat_id = len(obj.data.materials) - 1
             in_editmode = (obj.mode == 'EDIT')
 
             if in_editmode:
-                bpy.ops.object.mode_set(mode='OBJECT', toggle=False)
+                set_object_mode('OBJECT')
 
-            for p in obj.data.polygons:
-                if p.select:
-                    p.material_index = mat_id
+            # Repeated clicks with the same image reuse its material and slot
+            with profiler.span('material'):
+                _, mat_id = get_image_material(obj.data, temp_mat_name,
+                                               self.image_name)
+            with profiler.span('assign'):
+                set_selected_faces_material(obj.data, mat_id)
 
             if in_editmode:
-                bpy.ops.object.mode_set(mode='EDIT', toggle=False)
+                set_object_mode('EDIT')
         return {'FINISHED'}
 
 
 class OBJECT_OT_SureUVLoadImage(Operator, ImportHelper):
     bl_idname = 'object.sure_uv_load_image'
     bl_label = 'Load Image'
-    bl_description = 'Load a texture image into the scene. ' \
-                     'It can be used for fast texturing'
+    bl_description = 'Load texture images into the scene. ' \
+                     'Several files or a whole folder are imported ' \
+                     'in the background'
     bl_options = {'REGISTER', 'UNDO'}
 
+    files: CollectionProperty(type=OperatorFileListElement,
+                              options={'HIDDEN', 'SKIP_SAVE'})
+    directory: StringProperty(subtype='DIR_PATH',
+                              options={'HIDDEN', 'SKIP_SAVE'})
+    import_folder: BoolProperty(name='Whole folder',
+                                description='Import every image in the '
+                                            'folder, not only the selected '
+                                            'files')
+    recursive: BoolProperty(name='Include subfolders',
+                            description='With Whole folder, also import '
+                                        'the images of all subfolders')
+
     filter_folder: BoolProperty(
         name='Filter folders',
         default=True,
@@ -517,41 +1501,144 @@ class OBJECT_OT_SureUVLoadImage(Operator, ImportHelper):
     )
 
     def draw(self, context):
-        pass
+        layout = self.layout
+        layout.prop(self, 'import_folder')
+        row = layout.row()
+        row.enabled = self.import_folder
+        row.prop(self, 'recursive')
 
     def invoke(self, context, event):
         return super().invoke(context, event)
 
+    def get_paths(self) -> List[str]:
+        directory = self.directory or os.path.dirname(self.filepath)
+        if self.import_folder:
+            return list_image_files(directory, self.recursive)
+        paths = [os.path.join(directory, f.name) for f in self.files
+                 if f.name]
+        if not paths and self.filepath:
+            paths = [self.filepath]
+        return [path for path in paths if is_image_file(path)]
+
+    @profiled
     def execute(self, context):
-        img = bpy.data.images.load(self.filepath)
-        settings = get_settings()
-        settings.teximage = img
+        paths = self.get_paths()
+        if not paths:
+            self.report({'WARNING'}, 'No image files selected')
+            return {'CANCELLED'}
+        if len(paths) == 1 and not self.import_folder:
+            img = bpy.data.images.load(paths[0])
+            settings = get_settings()
+            settings.teximage = img
+            return {'FINISHED'}
+        if get_texture_import_job() is not None:
+            self.report({'WARNING'}, 'Previous texture import is still '
+                                     'running, it has been restarted')
+        start_texture_import(paths)
+        self.report({'INFO'}, f'Importing {len(paths)} images '
+                              f'in the background')
         return {'FINISHED'}
 
 
 class OBJECT_OT_SureUVSelectPolygons(Operator):
     bl_idname = 'object.sure_uv_select_polygons'
     bl_label = 'Sure UV Select polygons'
-    bl_description = 'Sure UV Select polygons operator'
+    bl_description = 'Extend the selection to polygons with the same ' \
+                     'material or lying in the same plane as the ' \
+                     'selected ones'
     bl_options = {'REGISTER', 'UNDO'}
 
     action: StringProperty(default='MATERIAL')
+    connected: BoolProperty(name='Connected only', options={'SKIP_SAVE'},
+                            description='Only polygons connected to the '
+                                        'selection through matching '
+                                        'polygons')
+    angle: FloatProperty(name='Angle', default=math.radians(1.0), min=0.0,
+                         max=math.pi, subtype='ANGLE',
+                         description='Coplanar: max angle between normals')
+    distance: FloatProperty(name='Distance', default=0.001, min=0.0,
+                            precision=5, subtype='DISTANCE',
+                            description='Coplanar: max distance between '
+                                        'planes')
 
     def draw(self, context):
-        pass
+        layout = self.layout
+        layout.prop(self, 'connected')
+        if self.action == 'COPLANAR':
+            layout.prop(self, 'angle')
+            layout.prop(self, 'distance')
 
     def invoke(self, context, event):
-        self.execute(context)
+        return self.execute(context)
+
+    def select(self, mesh: Any) -> None:
+        mesh_arrays = get_mesh_arrays(mesh, selected_only=True)
+        with profiler.span('read'):
+            visible = ~get_mesh_polygon_flags(mesh, 'hide')
+            loop_edges = get_mesh_loop_edges(mesh)
+        seeds = mesh_arrays.selection & visible
+        if not seeds.any():
+            return
+        profiler.count(faces=len(mesh_arrays.loop_start),
+                       loops=len(mesh_arrays.loop_verts))
+
+        with profiler.span('match'):
+            if self.action == 'COPLANAR':
+                distances = face_plane_distances(
+                    mesh_arrays.normals, mesh_arrays.coords,
+                    mesh_arrays.loop_verts, mesh_arrays.loop_start)
+                matches = coplanar_faces(mesh_arrays.normals, distances,
+                                         seeds, self.angle, self.distance)
+            else:
+                matches = same_material_faces(
+                    get_mesh_material_indices(mesh), seeds)
+            matches &= visible
+
+            if self.connected:
+                matches = connected_faces(
+                    matches, seeds, face_adjacency(loop_edges,
+                                                   mesh_arrays.loop_start,
+                                                   mesh_arrays.loop_total))
+        with profiler.span('write'):
+            set_mesh_face_selection(mesh, matches | mesh_arrays.selection,
+                                    mesh_arrays.loop_verts, loop_edges,
+                                    mesh_arrays.loop_start,
+                                    mesh_arrays.loop_total)
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        if obj is None or obj.type != 'MESH' or obj.mode != 'EDIT':
+            return {'CANCELLED'}
+        meshes = get_unique_meshes(context.objects_in_mode_unique_data)
+        # The selection is written back to the mesh data in one
+        # foreach_set, which needs OBJECT mode
+        set_object_mode('OBJECT')
+        try:
+            for mesh in meshes:
+                self.select(mesh)
+        finally:
+            set_object_mode('EDIT')
         return {'FINISHED'}
 
+
+class OBJECT_OT_SureUVExportProfile(Operator, ExportHelper):
+    bl_idname = 'object.sure_uv_export_profile'
+    bl_label = 'Export profile'
+    bl_description = 'Save the timings of the recent SureUV operator runs ' \
+                     'as a Chrome trace (chrome://tracing, Perfetto)'
+    bl_options = {'REGISTER'}
+
+    filename_ext = '.json'
+    filter_glob: StringProperty(default='*.json', options={'HIDDEN'})
+
     def execute(self, context):
         try:
-            if self.action == 'MATERIAL':
-                bpy.ops.mesh.select_similar(type='MATERIAL')
-            elif self.action == 'COPLANAR':
-                bpy.ops.mesh.select_similar(type='COPLANAR')
-        except Exception as err:
-            self.report({'ERROR'}, str(err))
+            count = profiler.export(self.filepath)
+        except OSError as err:
+            self.report({'ERROR'}, f'Cannot write {self.filepath}: {err}')
+            return {'CANCELLED'}
+        self.report({'INFO'}, f'Exported {count} runs to {self.filepath}')
         return {'FINISHED'}
 
 
@@ -568,9 +1655,27 @@ class OBJECT_OT_SureUVResetScale(Operator):
         self.execute(context)
         return {'FINISHED'}
 
+    @profiled
     def execute(self, context):
         obj = context.active_object
         if not obj or obj.type != 'MESH':
             return {'CANCELLED'}
         obj.scale = (1, 1, 1)
         return {'FINISHED'}
+
+
+# Operators whose redo panel steps reuse the projection cache
+REDO_OPERATORS = (OBJECT_OT_SureUVBoxMapping,
+                  OBJECT_OT_SureUVPlanarMapping,
+                  OBJECT_OT_SureUVTweakMapping)
+
+
+@bpy.app.handlers.persistent
+def sure_uv_cache_depsgraph_update(scene, depsgraph):
+    # The redo chain ends when another operator is registered, the cached
+    # geometry can not be reused after that
+    if not len(projection_cache):
+        return
+    operators = bpy.context.window_manager.operators
+    if not operators or not isinstance(operators[-1], REDO_OPERATORS):
+        projection_cache.clear()
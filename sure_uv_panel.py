@@ -1,6 +1,102 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
 import bpy
 from bpy.types import Panel
 from .sure_uv_utils import get_area_shading_mode
+from .sure_uv_library import get_texture_import_job
+from .sure_uv_texel import texel_report
+from .sure_uv_profiler import profiler
+
+
+_logger = logging.getLogger(__name__)
+
+TEXEL_REPORT_ROWS = 12
+PROFILE_ROWS = 8
+# Per frame budget of the panel draw, slower draws are counted and logged
+DRAW_BUDGET_MS = 2.0
+DRAW_HISTORY = 120
+
+
+class PanelState:
+    # What the panel shows about the active object, rebuilt only when the
+    # depsgraph reports changed objects or materials, or the active object,
+    # its mode or the mesh select mode differ from the last rebuild. The
+    # viewport shading per area is kept until a shading type changes.
+    def __init__(self):
+        self.draw_times = deque(maxlen=DRAW_HISTORY)
+        self.over_budget = 0
+        self.shading_modes: Dict[int, str] = {}
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        self.key = None
+        self.scale: Tuple[float, float, float] = (1.0, 1.0, 1.0)
+        self.slot_names: List[str] = []
+        self.edit_faces = False
+
+    def get(self, context: Any) -> 'PanelState':
+        obj = context.active_object
+        tool_settings = context.tool_settings
+        key = (obj.as_pointer(), context.mode,
+               tool_settings.mesh_select_mode[2])
+        if key != self.key:
+            self.key = key
+            self.scale = tuple(obj.scale)
+            self.slot_names = [slot.material.name if slot.material else ''
+                               for slot in obj.material_slots]
+            self.edit_faces = key[1] == 'EDIT_MESH' and key[2]
+        return self
+
+    def shading_mode(self, context: Any) -> str:
+        key = context.area.as_pointer()
+        mode = self.shading_modes.get(key)
+        if mode is None:
+            mode = self.shading_modes[key] = get_area_shading_mode(context)
+        return mode
+
+    def forget_shading(self) -> None:
+        self.shading_modes.clear()
+
+    def add_draw_time(self, ms: float) -> None:
+        self.draw_times.append(ms)
+        if ms > DRAW_BUDGET_MS:
+            self.over_budget += 1
+            _logger.debug(f'Panel draw {ms:.2f} ms, '
+                          f'budget {DRAW_BUDGET_MS:.1f} ms')
+
+    def draw_time_stats(self) -> Tuple[float, float]:
+        if not self.draw_times:
+            return 0.0, 0.0
+        return (sum(self.draw_times) / len(self.draw_times),
+                max(self.draw_times))
+
+
+panel_state = PanelState()
+
+
+@bpy.app.handlers.persistent
+def sure_uv_panel_depsgraph_update(scene, depsgraph):
+    if depsgraph.id_type_updated('OBJECT') or \
+            depsgraph.id_type_updated('MATERIAL') or \
+            depsgraph.id_type_updated('MESH'):
+        panel_state.invalidate()
+
+
+def subscribe_shading_updates() -> None:
+    # Viewport shading changes never reach the depsgraph handler. File
+    # loads drop the subscription, load_post subscribes again.
+    bpy.msgbus.clear_by_owner(panel_state)
+    bpy.msgbus.subscribe_rna(key=(bpy.types.View3DShading, 'type'),
+                             owner=panel_state, args=(),
+                             notify=panel_state.forget_shading)
+
+
+def unsubscribe_shading_updates() -> None:
+    bpy.msgbus.clear_by_owner(panel_state)
+    panel_state.forget_shading()
 
 
 class OBJECT_PT_SureUVPanel(Panel):
@@ -14,8 +110,8 @@ class OBJECT_PT_SureUVPanel(Panel):
         obj = context.active_object
         return (obj and obj.type == 'MESH')
 
-    def _draw_show_texture_mode(self, layout, context):
-        mode = get_area_shading_mode(context)
+    def _draw_show_texture_mode(self, layout, context, state):
+        mode = state.shading_mode(context)
         if mode not in {'MATERIAL', 'RENDERED'}:
             col = layout.column()
             col.alert = True
@@ -42,9 +138,10 @@ class OBJECT_PT_SureUVPanel(Panel):
         col.label(text='4. Use the Best Planar mapping')
         col.label(text='on selected faces in EDIT mode')
 
-    def _draw_checkers(self, layout):
+    def _draw_checkers(self, layout, settings):
         col = layout.column(align=True)
         col.label(text='Checker materials:')
+        col.prop(settings, 'checker_resolution', text='')
         col.operator('object.sure_uv_checker_mat',
                      text='Checker mat #1 (gray)',
                      icon='MATERIAL').template = 'UV_GRID'
@@ -62,10 +159,13 @@ class OBJECT_PT_SureUVPanel(Panel):
         op = col.operator('object.sure_uv_select_polygons',
                           text='Coplanar polygons')
         op.action = 'COPLANAR'
+        op = col.operator('object.sure_uv_select_polygons',
+                          text='Connected coplanar region')
+        op.action = 'COPLANAR'
+        op.connected = True
 
-    def _draw_scale_warning(self, layout, context):
-        obj = context.object
-        sx, sy, sz = obj.scale
+    def _draw_scale_warning(self, layout, state):
+        sx, sy, sz = state.scale
         if sx != 1 or sy != 1 or sz != 1:
             box = layout.box()
             col = box.column(align=True)
@@ -78,6 +178,8 @@ class OBJECT_PT_SureUVPanel(Panel):
             col.label(text='Object has a non-standard scale.')
             col.label(text='It can lead to wrong texture ')
             col.label(text='size and placement.')
+            col.label(text='Apply/Reset it, or map with')
+            col.label(text='Object transform: Scale.')
 
             col = box.column(align=True)
             op = col.operator('object.transform_apply',
@@ -96,27 +198,174 @@ class OBJECT_PT_SureUVPanel(Panel):
         col.label(text='UV Mapping:')
         col.operator('object.sure_uv_box_mapping',
                      text='UV Box Map').texture_image = image_name
+        op = col.operator('object.sure_uv_box_mapping',
+                          text='UV Box Map (all selected)')
+        op.texture_image = image_name
+        op.all_selected = True
+        op = col.operator('object.sure_uv_box_mapping',
+                          text='UV Box Map (keep mapped)')
+        op.texture_image = image_name
+        op.keep_mapped = True
 
         col.operator('object.sure_uv_planar_mapping',
                      text='Best Planar Map').texture_image = image_name
+        op = col.operator('object.sure_uv_planar_mapping',
+                          text='Best Planar Map (per island)')
+        op.texture_image = image_name
+        op.per_island = True
 
+        row = col.row(align=True)
+        op = row.operator('object.sure_uv_tweak_mapping',
+                          text='Tweak Box', icon='ARROW_LEFTRIGHT')
+        op.texture_image = image_name
+        op.mapping = 'BOX'
+        op = row.operator('object.sure_uv_tweak_mapping',
+                          text='Tweak Planar', icon='ARROW_LEFTRIGHT')
+        op.texture_image = image_name
+        op.mapping = 'PLANAR'
+
+    def _draw_keep_mapped(self, layout, context):
+        params = context.object.sure_uv_keep_mapped
+        if not params.enabled:
+            return
+        box = layout.box()
+        box.prop(params, 'enabled', icon='LINKED')
+        col = box.column(align=True)
+        col.scale_y = 0.75
+        col.label(text=f'Size: {params.size:.4g}, '
+                       f'Aspect: {params.texaspect:.4g}')
+        if params.uv_layer:
+            col.label(text=f'UV map: {params.uv_layer}')
+
+    def _draw_uv_channels(self, layout, settings):
+        col = layout.column(align=True)
+        col.label(text='UV channels (Box / Best Planar):')
+        for index, channel in enumerate(settings.uv_channels):
+            box = col.box()
+            row = box.row(align=True)
+            row.prop(channel, 'enabled', text='')
+            row.prop(channel, 'uv_layer', text='')
+            op = row.operator('object.sure_uv_channel', text='', icon='X')
+            op.action = 'REMOVE'
+            op.index = index
+            if channel.enabled:
+                sub = box.column(align=True)
+                sub.prop(channel, 'size')
+                sub.prop(channel, 'texaspect')
+                sub.prop(channel, 'rot', text='')
+                sub.prop(channel, 'offset', text='')
+        op = col.operator('object.sure_uv_channel', text='Add UV channel',
+                          icon='ADD')
+        op.action = 'ADD'
+
+    def _draw_material_profiles(self, layout, context, state):
+        obj = context.object
+        col = layout.column(align=True)
+        col.label(text='Material profiles (Box mapping):')
+        for profile in obj.sure_uv_profiles:
+            name = state.slot_names[profile.slot] \
+                if profile.slot < len(state.slot_names) else ''
+            name = name or f'Slot {profile.slot}'
+            box = col.box()
+            row = box.row(align=True)
+            row.prop(profile, 'enabled', text=name)
+            op = row.operator('object.sure_uv_material_profile', text='',
+                              icon='X')
+            op.action = 'REMOVE'
+            op.slot = profile.slot
+            if profile.enabled:
+                sub = box.column(align=True)
+                sub.prop(profile, 'size')
+                sub.prop(profile, 'texaspect')
+                sub.prop(profile, 'rot', text='')
+                sub.prop(profile, 'offset', text='')
+        op = col.operator('object.sure_uv_material_profile',
+                          text='Add profile for active material', icon='ADD')
+        op.action = 'ADD'
+        op.slot = -1
+
+    def _draw_texel_density(self, layout):
+        col = layout.column(align=True)
+        col.label(text='Texel density:')
+        col.operator('object.sure_uv_texel_density',
+                     text='Analyze texel density', icon='VIEWZOOM')
+        if not texel_report:
+            return
+        box = col.box()
+        sub = box.column(align=True)
+        sub.scale_y = 0.75
+        sub.label(text=f'Target: {texel_report.target:.1f} px/unit')
+        for title, rows in (('Objects', texel_report.objects),
+                            ('Materials', texel_report.materials)):
+            sub.label(text=f'{title}:')
+            for name, stats in rows[:TEXEL_REPORT_ROWS]:
+                sub.label(text=f'{name}: {stats.density:.1f} px/u, '
+                               f'{stats.in_range * 100:.0f}% on target')
+            if len(rows) > TEXEL_REPORT_ROWS:
+                sub.label(text=f'... {len(rows) - TEXEL_REPORT_ROWS} more')
+
+    def _draw_performance(self, layout, settings, state):
+        col = layout.column(align=True)
+        col.label(text='Performance:')
+        col.prop(settings, 'chunk_size')
+        col.prop(settings, 'threads')
+        col.prop(settings, 'cache_size')
+        col.prop(settings, 'show_draw_time')
+        if settings.show_draw_time:
+            mean, peak = state.draw_time_stats()
+            sub = col.column(align=True)
+            sub.scale_y = 0.75
+            sub.alert = peak > DRAW_BUDGET_MS
+            sub.label(text=f'Draw: {mean:.2f} ms avg, {peak:.2f} ms max')
+            sub.label(text=f'Budget {DRAW_BUDGET_MS:.1f} ms, '
+                           f'exceeded {state.over_budget} times')
+        col.prop(settings, 'show_profile')
+        run = profiler.last_run
+        if settings.show_profile and run is not None:
+            sub = col.box().column(align=True)
+            sub.scale_y = 0.75
+            sub.label(text=run.summary())
+            phases = sorted(run.phase_totals().items(),
+                            key=lambda item: -item[1])
+            for name, seconds in phases[:PROFILE_ROWS]:
+                sub.label(text=f'{name}: {seconds * 1000.0:.1f} ms')
+        col.operator('object.sure_uv_export_profile',
+                     text='Export profile', icon='EXPORT')
 
     def draw(self, context):
+        start = time.perf_counter()
+        self._draw(context, panel_state.get(context))
+        panel_state.add_draw_time((time.perf_counter() - start) * 1000.0)
+
+    def _draw(self, context, state):
         scene = context.scene
         settings = scene.sure_uv_settings
         layout = self.layout
         image_name = settings.teximage.name if settings.teximage else ''
 
-        self._draw_show_texture_mode(layout, context)
+        self._draw_show_texture_mode(layout, context, state)
 
         col = layout.column(align=True)
         aspect = settings.texaspect if settings.texaspect != 0.0 else 1.0
-        col.label(text='Texture Aspect: {:.4}'.format(aspect))
-        col.template_ID_preview(settings, 'teximage', rows=4, cols=6, hide_buttons=True)
+        row = col.row()
+        row.label(text='Texture Aspect: {:.4}'.format(aspect))
+        row.prop(settings, 'show_previews', text='', icon='IMAGE_DATA')
+        if settings.show_previews:
+            col.template_ID_preview(settings, 'teximage', rows=4, cols=6,
+                                    hide_buttons=True)
+        else:
+            col.prop(settings, 'teximage', text='')
         col.operator('object.sure_uv_load_image', text='Load image in scene',
                      icon='FILEBROWSER')
+        job = get_texture_import_job()
+        if job is not None:
+            col.label(text=f'Importing textures: {job.processed}/{job.total}',
+                      icon='TIME')
 
         self._draw_uv_mapping(layout, image_name)
+        self._draw_keep_mapped(layout, context)
+        self._draw_material_profiles(layout, context, state)
+        self._draw_uv_channels(layout, settings)
 
         col = layout.column(align=True)
         col.label(text='Assign preview material:')
@@ -130,11 +379,12 @@ class OBJECT_PT_SureUVPanel(Panel):
         op.image_name = image_name
         op.action = 'temp_mat'
 
-        if bpy.context.mode == 'EDIT_MESH' and \
-                bpy.context.tool_settings.mesh_select_mode[2]:
+        if state.edit_faces:
             self._draw_select_polygons(layout)
 
-        self._draw_scale_warning(layout, context)
-        self._draw_checkers(layout)
+        self._draw_scale_warning(layout, state)
+        self._draw_checkers(layout, settings)
+        self._draw_texel_density(layout)
+        self._draw_performance(layout, settings, state)
 
         self._draw_how_to_use(layout)
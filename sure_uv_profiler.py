@@ -0,0 +1,157 @@
+# Per-phase timing of the SureUV operators.
+#
+# An operator call is a run, the phases inside it (mode switch, reading
+# arrays, classification, projection, writing, mesh.update) are nested
+# spans. Finished runs are kept in a rolling history that can be exported
+# in the Chrome trace event format (chrome://tracing, Perfetto) together
+# with their mesh sizes and loops per second. Spans outside a run are not
+# recorded, so the helpers can be called from anywhere. Like
+# sure_uv_projection, this module does not import bpy.
+
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+import functools
+import json
+import os
+import threading
+import time
+
+
+HISTORY_SIZE = 64
+
+
+class Span(NamedTuple):
+    name: str
+    start: float        # seconds from the start of the run
+    duration: float     # seconds
+    depth: int
+
+
+class Run:
+    def __init__(self, name: str, wall_time: float):
+        self.name = name
+        self.wall_time = wall_time
+        self.duration = 0.0
+        self.spans: List[Span] = []
+        self.counts: Dict[str, int] = {}
+        self.thread_id = threading.get_ident()
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    @property
+    def loops_per_second(self) -> float:
+        loops = self.counts.get('loops', 0)
+        return loops / self.duration if self.duration > 0 else 0.0
+
+    def phase_totals(self) -> Dict[str, float]:
+        # Seconds per top level phase, in first use order
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            if span.depth == 0:
+                totals[span.name] = totals.get(span.name, 0.0) + \
+                    span.duration
+        return totals
+
+    def summary(self) -> str:
+        text = f'{self.name}: {self.duration * 1000.0:.1f} ms'
+        if self.counts.get('loops'):
+            text += f', {self.counts["loops"]} loops, ' \
+                    f'{self.loops_per_second / 1e6:.2f} M loops/s'
+        return text
+
+
+class Profiler:
+    def __init__(self, history_size: int=HISTORY_SIZE):
+        self.enabled = True
+        self.history = deque(maxlen=history_size)
+        self._current: Optional[Run] = None
+
+    @property
+    def last_run(self) -> Optional[Run]:
+        return self.history[-1] if self.history else None
+
+    @contextmanager
+    def run(self, name: str) -> Iterator[Optional[Run]]:
+        # Nested runs (an operator calling another) become spans
+        if not self.enabled or self._current is not None:
+            with self.span(name):
+                yield self._current
+            return
+        run = Run(name, time.time())
+        self._current = run
+        try:
+            yield run
+        finally:
+            run.duration = time.perf_counter() - run._start
+            self._current = None
+            self.history.append(run)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        run = self._current
+        # Worker threads never open spans in the run of the main thread
+        if run is None or run.thread_id != threading.get_ident():
+            yield
+            return
+        depth = run._depth
+        run._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            run._depth = depth
+            run.spans.append(Span(name, start - run._start, end - start,
+                                  depth))
+
+    def count(self, **counts: int) -> None:
+        # Adds mesh sizes (faces=, loops=) to the current run
+        run = self._current
+        if run is None:
+            return
+        for key, value in counts.items():
+            run.counts[key] = run.counts.get(key, 0) + int(value)
+
+    def clear(self) -> None:
+        self.history.clear()
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        events = []
+        if not self.history:
+            return {'traceEvents': events}
+        origin = self.history[0].wall_time
+        pid = os.getpid()
+        for run in self.history:
+            base = (run.wall_time - origin) * 1e6
+            args = dict(run.counts)
+            args['loops_per_second'] = round(run.loops_per_second)
+            events.append({'name': run.name, 'cat': 'operator', 'ph': 'X',
+                           'ts': base, 'dur': run.duration * 1e6,
+                           'pid': pid, 'tid': run.thread_id, 'args': args})
+            events.extend({'name': span.name, 'cat': 'phase', 'ph': 'X',
+                           'ts': base + span.start * 1e6,
+                           'dur': span.duration * 1e6,
+                           'pid': pid, 'tid': run.thread_id,
+                           'args': {'depth': span.depth}}
+                          for span in run.spans)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, filepath: str) -> int:
+        # Returns the number of exported runs
+        with open(filepath, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        return len(self.history)
+
+
+profiler = Profiler()
+
+
+def profiled(execute: Callable) -> Callable:
+    # Operator execute as one run named after the operator. Blender checks
+    # the argument count of registered methods, so the signature is fixed.
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        with profiler.run(self.bl_label):
+            return execute(self, context)
+    return wrapper
@@ -0,0 +1,769 @@
+# Projection kernels used by the SureUV operators.
+#
+# This module works on plain NumPy arrays only and must never import bpy or
+# mathutils, so it can be profiled, tested and reused outside of Blender.
+
+from typing import Any, Callable, NamedTuple, Optional, Sequence, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import threading
+import numpy as np
+from math import sin, cos, pi
+
+
+class MeshArrays(NamedTuple):
+    coords: np.ndarray          # (V, 3) vertex coordinates
+    loop_verts: np.ndarray      # (L,) loop -> vertex index
+    normals: np.ndarray         # (F, 3) face normals
+    loop_start: np.ndarray      # (F,) first loop of every face
+    loop_total: np.ndarray      # (F,) number of loops of every face
+    selection: Optional[np.ndarray] = None  # (F,) bool, None = all faces
+    groups: Optional[np.ndarray] = None     # (F,) box matrix set, None = 0
+
+
+def get_box_project_matrices(
+        size: float, aspect: float,
+        rotation: Tuple[float, float, float],
+        offset: Tuple[float, float, float]) -> List[np.ndarray]:
+    sc = 1.0 / size if size != 0 else 1.0
+
+    sx = 1 * sc
+    sy = 1 * sc
+    sz = 1 * sc
+    ofx, ofy, ofz = offset
+    rx = rotation[0] * pi / 180.0
+    ry = rotation[1] * pi / 180.0
+    rz = rotation[2] * pi / 180.0
+
+    crx = cos(rx)
+    srx = sin(rx)
+    cry = cos(ry)
+    sry = sin(ry)
+    crz = cos(rz)
+    srz = sin(rz)
+    ofycrx = ofy * crx
+    ofzsrx = ofz * srx
+
+    ofysrx = ofy * srx
+    ofzcrx = ofz * crx
+
+    ofxcry = ofx * cry
+    ofzsry = ofz * sry
+
+    ofxsry = ofx * sry
+    ofzcry = ofz * cry
+
+    ofxcrz = ofx * crz
+    ofysrz = ofy * srz
+
+    ofxsrz = ofx * srz
+    ofycrz = ofy * crz
+
+    matrices = []
+    matrices.append(np.array([
+        [0, crx * sy, srx * sz, -ofycrx - ofzsrx],
+        [0, -aspect * srx * sy, aspect * crx * sz, ofysrx - ofzcrx]
+    ]))
+    matrices.append(np.array([
+        [0, -crx * sy, srx * sz, ofycrx - ofzsrx],
+        [0, aspect * srx * sy, aspect * crx * sz, -ofysrx - ofzcrx]
+    ]))
+    matrices.append(np.array([
+        [-cry * sx, 0, sry * sz, ofxcry - ofzsry],
+        [aspect * sry * sx, 0, aspect * cry * sz, -ofxsry - ofzcry]
+    ]))
+    matrices.append(np.array([
+        [cry * sx, 0, sry * sz, -ofxcry - ofzsry],
+        [-aspect * sry * sx, 0, aspect * cry * sz, ofxsry - ofzcry]
+    ]))
+    matrices.append(np.array([
+        [crz * sx, srz * sy, 0, -ofxcrz - ofysrz],
+        [-aspect * srz * sx, aspect * crz * sy, 0, ofxsrz - ofycrz]
+    ]))
+    matrices.append(np.array([
+        [-crz * sx, -srz * sy, 0, ofxcrz - ofysrz],
+        [-aspect * srz * sx, aspect * crz * sy, 0, -ofxsrz - ofycrz]
+    ]))
+    return matrices
+
+
+def get_planar_matrix(size: float, aspect: float, zrot: float,
+                      xoffset: float, yoffset: float) -> np.ndarray:
+    sc = 1.0 / size if size != 0 else 1.0
+    sx, sy = sc, sc
+    rz = zrot / 180 * pi
+
+    cosrz = cos(rz)
+    sinrz = sin(rz)
+
+    return np.array([[sx * cosrz, -sy * sinrz, 0, xoffset],
+                     [sx * aspect * sinrz, sy * aspect * cosrz, 0, yoffset]])
+
+
+def classify_box_faces(normals: np.ndarray) -> np.ndarray:
+    # Same tie-breaking as the per-face version: X wins only if strictly
+    # dominant, then Y, everything else (ties, NaN) goes to Z.
+    nx, ny, nz = normals[:, 0], normals[:, 1], normals[:, 2]
+    ax, ay, az = np.abs(nx), np.abs(ny), np.abs(nz)
+    choice = np.where(nz >= 0, 4, 5).astype(np.int8)
+    y_mask = (ay > ax) & (ay > az)
+    choice[y_mask] = np.where(ny[y_mask] >= 0, 2, 3)
+    x_mask = (ax > ay) & (ax > az)
+    choice[x_mask] = np.where(nx[x_mask] >= 0, 0, 1)
+    return choice
+
+
+def box_face_buckets(normals: np.ndarray,
+                     groups: Optional[np.ndarray] = None) -> np.ndarray:
+    # Bucket = 6 * matrix set + axis, matrix set 0 without groups
+    choice = classify_box_faces(normals)
+    if groups is None:
+        return choice
+    return groups.astype(np.int64) * 6 + choice
+
+
+def polygon_loop_indices(loop_start: np.ndarray,
+                         loop_total: np.ndarray) -> np.ndarray:
+    loop_total = loop_total.astype(np.int64)
+    firsts = np.cumsum(loop_total) - loop_total
+    shift = np.repeat(loop_start - firsts, loop_total)
+    return shift + np.arange(len(shift), dtype=np.int64)
+
+
+def rotations_to_z(vectors: np.ndarray) -> np.ndarray:
+    # Vectorized equivalent of mathutils Vector.rotation_difference((0, 0, 1))
+    # .to_matrix(), including its handling of degenerate input.
+    vectors = np.asarray(vectors, dtype=np.float64).reshape(-1, 3)
+    count = len(vectors)
+    length = np.linalg.norm(vectors, axis=1)
+    unit = np.divide(vectors, length[:, None],
+                     out=np.zeros_like(vectors), where=length[:, None] > 0)
+
+    axis = np.stack((unit[:, 1], -unit[:, 0], np.zeros(count)), axis=1)
+    axis_len = np.linalg.norm(axis, axis=1)
+    dot = unit[:, 2]
+    angle = np.where(dot >= 0,
+                     2.0 * np.arcsin(np.minimum(
+                         np.linalg.norm(unit - (0, 0, 1), axis=1) / 2, 1.0)),
+                     pi - 2.0 * np.arcsin(np.minimum(
+                         np.linalg.norm(unit + (0, 0, 1), axis=1) / 2, 1.0)))
+
+    degenerate = axis_len <= np.finfo(np.float32).eps
+    opposite = degenerate & (dot < 0)
+    angle[degenerate & ~opposite] = 0.0
+    angle[opposite] = pi
+    # Colinear but opposed: rotate by 180 degrees around an orthogonal axis
+    axis[opposite] = np.stack((unit[opposite, 2], unit[opposite, 2],
+                               -unit[opposite, 0] - unit[opposite, 1]), axis=1)
+    axis_len = np.linalg.norm(axis, axis=1)
+    axis = np.divide(axis, axis_len[:, None],
+                     out=np.zeros_like(axis), where=axis_len[:, None] > 0)
+
+    x, y, z = axis[:, 0], axis[:, 1], axis[:, 2]
+    s, c = np.sin(angle), np.cos(angle)
+    t = 1.0 - c
+    rotations = np.empty((count, 3, 3))
+    rotations[:, 0, 0] = c + x * x * t
+    rotations[:, 0, 1] = x * y * t - z * s
+    rotations[:, 0, 2] = x * z * t + y * s
+    rotations[:, 1, 0] = y * x * t + z * s
+    rotations[:, 1, 1] = c + y * y * t
+    rotations[:, 1, 2] = y * z * t - x * s
+    rotations[:, 2, 0] = z * x * t - y * s
+    rotations[:, 2, 1] = z * y * t + x * s
+    rotations[:, 2, 2] = c + z * z * t
+    return rotations
+
+
+def rotation_to_z(vector: np.ndarray) -> np.ndarray:
+    return rotations_to_z(vector)[0]
+
+
+def best_planar_rotation(normals: np.ndarray,
+                         selection: Optional[np.ndarray] = None) -> np.ndarray:
+    selected_normals = normals if selection is None else normals[selection]
+    if len(selected_normals) > 0:
+        average_vec = np.average(selected_normals, axis=0)
+    else:
+        average_vec = np.array((0.0, 0.0, 1.0))
+    return rotation_to_z(average_vec)
+
+
+def island_rotations(normals: np.ndarray, islands: np.ndarray,
+                     island_count: int) -> np.ndarray:
+    # Per island the Best Planar plane: rotation of its average normal
+    sums = np.stack([np.bincount(islands, weights=normals[:, i],
+                                 minlength=island_count)
+                     for i in range(3)], axis=1)
+    counts = np.bincount(islands, minlength=island_count)
+    return rotations_to_z(sums / np.maximum(counts, 1)[:, None])
+
+
+# Object transforms are (4, 4) affine matrices (matrix_world or its scale).
+# They are folded into the UV matrices instead of transforming the
+# coordinates, only the face normals are transformed to pick the planes.
+
+def transform_normals(normals: np.ndarray,
+                      transform: np.ndarray) -> np.ndarray:
+    # Normals follow the inverse transpose of the linear part
+    lin = np.asarray(transform, dtype=np.float64)[:3, :3]
+    world = normals.astype(np.float64) @ np.linalg.pinv(lin)
+    lengths = np.sqrt(np.einsum('ij,ij->i', world, world))
+    world /= np.where(lengths > 0, lengths, 1.0)[:, None]
+    return world.astype(normals.dtype)
+
+
+def transform_rotations(rotations: np.ndarray,
+                        transform: np.ndarray) -> np.ndarray:
+    # (..., 3, 3) rotations applied after transform, as (..., 3, 4) affine
+    return rotations @ np.asarray(transform, dtype=np.float64)[:3, :]
+
+
+def transform_box_sets(meshes: Sequence[MeshArrays],
+                       transforms: Sequence[np.ndarray],
+                       set_count: int) -> List[MeshArrays]:
+    # Mesh i uses the matrix sets from i * set_count on, see
+    # transform_box_matrices, so a single batch maps every mesh in its own
+    # space. Faces are classified by their transformed normals.
+    result = []
+    for index, (mesh, transform) in enumerate(zip(meshes, transforms)):
+        groups = mesh.groups if mesh.groups is not None else \
+            np.zeros(len(mesh.loop_start), dtype=np.int32)
+        result.append(mesh._replace(
+            normals=transform_normals(mesh.normals, transform),
+            groups=groups + index * set_count))
+    return result
+
+
+def transform_box_matrices(matrices: Sequence[np.ndarray],
+                           transforms: Sequence[np.ndarray]
+                           ) -> List[np.ndarray]:
+    return [np.asarray(matrix, dtype=np.float64) @ transform
+            for transform in transforms for matrix in matrices]
+
+
+def _target_loops(mesh: MeshArrays) -> Tuple[np.ndarray, np.ndarray]:
+    loop_start, loop_total = mesh.loop_start, mesh.loop_total
+    if mesh.selection is not None:
+        loop_start = loop_start[mesh.selection]
+        loop_total = loop_total[mesh.selection]
+    return polygon_loop_indices(loop_start, loop_total), loop_total
+
+
+def _new_uvs(mesh: MeshArrays, out: Optional[np.ndarray]) -> np.ndarray:
+    if out is None:
+        out = np.zeros((len(mesh.loop_verts), 2), dtype=np.float32)
+    return out
+
+
+class BoxProjection(NamedTuple):
+    loop_indices: np.ndarray    # (N,) target loops, grouped by bucket
+    positions: np.ndarray       # (N, 3) loop coordinates minus center
+    bucket_offsets: np.ndarray  # (6 * sets + 1,) bucket i owns
+                                # [offsets[i], offsets[i+1])
+    center: np.ndarray          # (3,) float64, folded back into the offsets
+
+
+class PlanarProjection(NamedTuple):
+    loop_indices: np.ndarray    # (N,) target loops
+    positions: np.ndarray       # (N, 3) loop coordinates minus center
+    rotation: np.ndarray        # (3, 3) rotation onto the XY plane,
+                                # (3, 4) with an object transform
+    center: np.ndarray          # (3,) float64, folded back into the offsets
+
+
+class IslandPlanarProjection(NamedTuple):
+    loop_indices: np.ndarray    # (N,) target loops
+    positions: np.ndarray       # (N, 3) loop coordinates minus center
+    loop_islands: np.ndarray    # (N,) island of every target loop
+    rotations: np.ndarray       # (I, 3, 3) rotation onto the XY plane,
+                                # (I, 3, 4) with an object transform
+    center: np.ndarray          # (3,) float64, folded back into the offsets
+
+
+# Streaming variants: nothing mesh-sized is precomputed, loops are gathered
+# and projected in blocks of at most chunk_size loops with reused buffers.
+
+class ChunkedBoxProjection(NamedTuple):
+    mesh: MeshArrays
+    chunk_size: int
+    dtype: Any
+    center: np.ndarray
+
+
+class ChunkedPlanarProjection(NamedTuple):
+    mesh: MeshArrays
+    rotation: np.ndarray
+    chunk_size: int
+    dtype: Any
+    center: np.ndarray
+
+
+# Smallest slice worth handing to a worker thread
+MIN_TASK_LOOPS = 1 << 16
+
+
+def resolve_threads(threads: int) -> int:
+    return (os.cpu_count() or 1) if threads <= 0 else threads
+
+
+def _split_range(start: int, end: int,
+                 task_loops: int) -> List[Tuple[int, int]]:
+    parts = max(1, -(-(end - start) // task_loops))
+    bounds = np.linspace(start, end, parts + 1).astype(np.int64)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def _run_tasks(func: Callable, tasks: List[Tuple], threads: int) -> None:
+    # NumPy releases the GIL in take/matmul/ufuncs and every task writes a
+    # disjoint set of output loops, so plain threads scale here.
+    threads = min(resolve_threads(threads), len(tasks))
+    if threads <= 1:
+        for task in tasks:
+            func(*task)
+        return
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda task: func(*task), tasks))
+
+
+def _project_slice(positions: np.ndarray, loop_indices: np.ndarray,
+                   start: int, end: int, lin_t: np.ndarray, ofs: np.ndarray,
+                   out: np.ndarray) -> None:
+    uvs = positions[start:end] @ lin_t
+    uvs += ofs
+    out[loop_indices[start:end]] = uvs
+
+
+def _bbox_center(points: np.ndarray, dtype: Any) -> np.ndarray:
+    # Per-column reductions, axis=0 reductions on (N, 3) are much slower.
+    # The center is made exactly representable in dtype.
+    if not len(points):
+        return np.zeros(3)
+    center = np.array([(float(points[:, i].min()) +
+                        float(points[:, i].max())) / 2 for i in range(3)])
+    return center.astype(dtype).astype(np.float64)
+
+
+def _gather_positions(mesh: MeshArrays, loop_indices: np.ndarray,
+                      dtype: Any, recenter: bool
+                      ) -> Tuple[np.ndarray, np.ndarray]:
+    # Coordinates far from the origin lose precision once the UV scale is
+    # applied, so positions are stored relative to the bounding box center.
+    # The center is applied in float64 to the matrix offsets instead.
+    positions = mesh.coords[mesh.loop_verts[loop_indices]]
+    if positions.dtype != dtype:
+        positions = positions.astype(dtype)
+    center = np.zeros(3)
+    if recenter:
+        center = _bbox_center(positions, dtype)
+        positions -= center.astype(dtype)
+    return positions, center
+
+
+def _fold_affine(matrix: np.ndarray, center: np.ndarray,
+                 dtype: Any) -> Tuple[np.ndarray, np.ndarray]:
+    # uv = lin @ (co - center) + (ofs + lin @ center), no homogeneous copy
+    matrix = np.asarray(matrix, dtype=np.float64)
+    lin = matrix[:, :3]
+    ofs = matrix[:, 3] + lin @ center
+    return lin.T.astype(dtype), ofs.astype(dtype)
+
+
+def _box_bucket_count(groups: Optional[np.ndarray]) -> int:
+    if groups is None or not len(groups):
+        return 6
+    return 6 * (int(groups.max()) + 1)
+
+
+def prepare_box_projection(mesh: MeshArrays, dtype: Any = np.float32,
+                           recenter: bool = True,
+                           chunk_size: int = 0) -> BoxProjection:
+    # Everything here depends on geometry and selection only, the mapping
+    # parameters are applied later by apply_box_projection.
+    if chunk_size > 0:
+        center = _bbox_center(mesh.coords, dtype) if recenter else np.zeros(3)
+        return ChunkedBoxProjection(mesh, chunk_size, dtype, center)
+
+    normals, groups = mesh.normals, mesh.groups
+    if mesh.selection is not None:
+        normals = normals[mesh.selection]
+        groups = None if groups is None else groups[mesh.selection]
+    loop_indices, loop_total = _target_loops(mesh)
+    loop_choices = np.repeat(box_face_buckets(normals, groups), loop_total)
+
+    # Group loops by bucket so every bucket is a contiguous slice
+    order = np.argsort(loop_choices, kind='stable')
+    loop_indices = loop_indices[order]
+    del order
+    bucket_count = _box_bucket_count(mesh.groups)
+    bucket_offsets = np.zeros(bucket_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(loop_choices, minlength=bucket_count),
+              out=bucket_offsets[1:])
+    del loop_choices
+
+    positions, center = _gather_positions(mesh, loop_indices, dtype, recenter)
+    return BoxProjection(loop_indices, positions, bucket_offsets, center)
+
+
+def apply_box_projection(prepared: BoxProjection,
+                         matrices: Sequence[np.ndarray],
+                         out: np.ndarray, threads: int = 1) -> np.ndarray:
+    if isinstance(prepared, ChunkedBoxProjection):
+        return _apply_chunked_box_projection(prepared, matrices, out, threads)
+    loop_indices, positions, bucket_offsets, center = prepared
+    # Split the direction buckets into roughly equal slices per thread
+    task_loops = max(MIN_TASK_LOOPS,
+                     -(-len(positions) // resolve_threads(threads)))
+    tasks = []
+    for i in range(len(bucket_offsets) - 1):
+        lin_t, ofs = _fold_affine(matrices[i], center, positions.dtype)
+        for start, end in _split_range(bucket_offsets[i],
+                                       bucket_offsets[i + 1], task_loops):
+            tasks.append((positions, loop_indices, start, end, lin_t, ofs,
+                          out))
+    _run_tasks(_project_slice, tasks, threads)
+    return out
+
+
+def box_project(mesh: MeshArrays, matrices: Sequence[np.ndarray],
+                out: Optional[np.ndarray] = None) -> np.ndarray:
+    return apply_box_projection(prepare_box_projection(mesh), matrices,
+                                _new_uvs(mesh, out))
+
+
+def prepare_planar_projection(mesh: MeshArrays, rotation: np.ndarray,
+                              dtype: Any = np.float32,
+                              recenter: bool = True,
+                              chunk_size: int = 0) -> PlanarProjection:
+    if chunk_size > 0:
+        center = _bbox_center(mesh.coords, dtype) if recenter else np.zeros(3)
+        return ChunkedPlanarProjection(mesh, rotation, chunk_size, dtype,
+                                       center)
+
+    loop_indices, _ = _target_loops(mesh)
+    positions, center = _gather_positions(mesh, loop_indices, dtype, recenter)
+    return PlanarProjection(loop_indices, positions, rotation, center)
+
+
+def _planar_transform(matrix: np.ndarray,
+                      rotation: np.ndarray) -> np.ndarray:
+    # Fold the rotation into the UV matrix: uv = (mat3 @ rot) @ co + ofs,
+    # a (3, 4) rotation adds its translation to the offset
+    matrix = np.asarray(matrix, dtype=np.float64)
+    ofs = matrix[:, 3].copy()
+    if rotation.shape[1] == 4:
+        ofs += matrix[:, :3] @ rotation[:, 3]
+    return np.hstack((matrix[:, :3] @ rotation[:, :3], ofs[:, None]))
+
+
+def apply_planar_projection(prepared: PlanarProjection, matrix: np.ndarray,
+                            out: np.ndarray, threads: int = 1) -> np.ndarray:
+    if isinstance(prepared, ChunkedPlanarProjection):
+        return _apply_chunked_planar_projection(prepared, matrix, out,
+                                                threads)
+    if isinstance(prepared, IslandPlanarProjection):
+        return _apply_island_planar_projection(prepared, matrix, out,
+                                               threads)
+    loop_indices, positions, rotation, center = prepared
+    lin_t, ofs = _fold_affine(_planar_transform(matrix, rotation), center,
+                              positions.dtype)
+    task_loops = max(MIN_TASK_LOOPS,
+                     -(-len(positions) // resolve_threads(threads)))
+    tasks = [(positions, loop_indices, start, end, lin_t, ofs, out)
+             for start, end in _split_range(0, len(positions), task_loops)]
+    _run_tasks(_project_slice, tasks, threads)
+    return out
+
+
+def prepare_island_planar_projection(mesh: MeshArrays, islands: np.ndarray,
+                                     island_count: int,
+                                     dtype: Any = np.float32,
+                                     recenter: bool = True,
+                                     transform: Optional[np.ndarray] = None
+                                     ) -> IslandPlanarProjection:
+    # islands: (F,) island id of every face, every island gets the Best
+    # Planar plane of its own faces
+    normals = mesh.normals
+    if mesh.selection is not None:
+        normals = normals[mesh.selection]
+        islands = islands[mesh.selection]
+    if transform is not None:
+        normals = transform_normals(normals, transform)
+    rotations = island_rotations(normals, islands, island_count)
+    if transform is not None:
+        rotations = transform_rotations(rotations, transform)
+    loop_indices, loop_total = _target_loops(mesh)
+    loop_islands = np.repeat(islands, loop_total)
+    positions, center = _gather_positions(mesh, loop_indices, dtype, recenter)
+    return IslandPlanarProjection(loop_indices, positions, loop_islands,
+                                  rotations, center)
+
+
+# Loops per einsum call, bounds the (n, 2, 3) gathered matrices
+ISLAND_TASK_LOOPS = 1 << 16
+
+
+def _project_island_slice(prepared: IslandPlanarProjection, start: int,
+                          end: int, lin: np.ndarray, ofs: np.ndarray,
+                          out: np.ndarray) -> None:
+    islands = prepared.loop_islands[start:end]
+    uvs = np.einsum('nij,nj->ni', lin[islands], prepared.positions[start:end])
+    uvs += ofs[islands]
+    out[prepared.loop_indices[start:end]] = uvs
+
+
+def _apply_island_planar_projection(prepared: IslandPlanarProjection,
+                                    matrix: np.ndarray, out: np.ndarray,
+                                    threads: int = 1) -> np.ndarray:
+    # Same uv = (mat3 @ rot) @ co + ofs as Best Planar, one rot per island
+    matrix = np.asarray(matrix, dtype=np.float64)
+    rotations = prepared.rotations
+    lin = matrix[:, :3] @ rotations[:, :, :3]
+    ofs = matrix[:, 3] + lin @ prepared.center
+    if rotations.shape[2] == 4:
+        ofs += rotations[:, :, 3] @ matrix[:, :3].T
+    dtype = prepared.positions.dtype
+    lin, ofs = lin.astype(dtype), ofs.astype(dtype)
+    tasks = [(prepared, start, end, lin, ofs, out) for start, end in
+             _split_range(0, len(prepared.positions), ISLAND_TASK_LOOPS)]
+    _run_tasks(_project_island_slice, tasks, threads)
+    return out
+
+
+def planar_project(mesh: MeshArrays, matrix: np.ndarray,
+                   rotation: np.ndarray,
+                   out: Optional[np.ndarray] = None) -> np.ndarray:
+    return apply_planar_projection(prepare_planar_projection(mesh, rotation),
+                                   matrix, _new_uvs(mesh, out))
+
+
+def best_planar_project(mesh: MeshArrays, matrix: np.ndarray,
+                        out: Optional[np.ndarray] = None) -> np.ndarray:
+    rotation = best_planar_rotation(mesh.normals, mesh.selection)
+    return planar_project(mesh, matrix, rotation, out)
+
+
+def _face_chunks(mesh: MeshArrays, chunk_size: int):
+    # Face ranges holding at most chunk_size loops (always at least one face)
+    face_count = len(mesh.loop_start)
+    first = 0
+    while first < face_count:
+        loop_counts = np.cumsum(mesh.loop_total[first:first + chunk_size])
+        count = int(np.searchsorted(loop_counts, chunk_size, side='right'))
+        yield first, first + max(count, 1)
+        first += max(count, 1)
+
+
+def _chunk_faces(mesh: MeshArrays, first: int, last: int
+                 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray,
+                            Optional[np.ndarray]]:
+    loop_start = mesh.loop_start[first:last]
+    loop_total = mesh.loop_total[first:last]
+    normals = mesh.normals[first:last]
+    groups = None if mesh.groups is None else mesh.groups[first:last]
+    if mesh.selection is not None:
+        selection = mesh.selection[first:last]
+        loop_start = loop_start[selection]
+        loop_total = loop_total[selection]
+        normals = normals[selection]
+        groups = None if groups is None else groups[selection]
+    return (polygon_loop_indices(loop_start, loop_total), loop_total,
+            normals, groups)
+
+
+class _ChunkBuffers:
+    def __init__(self, chunk_size: int, dtype: Any):
+        self.dtype = dtype
+        self.positions = np.empty((chunk_size, 3), dtype=dtype)
+        self.uvs = np.empty((chunk_size, 2), dtype=dtype)
+
+    def reserve(self, count: int) -> None:
+        # A single n-gon can be larger than the chunk
+        if count > len(self.positions):
+            self.positions = np.empty((count, 3), dtype=self.dtype)
+            self.uvs = np.empty((count, 2), dtype=self.dtype)
+
+    def gather(self, mesh: MeshArrays, loop_indices: np.ndarray,
+               center: np.ndarray) -> np.ndarray:
+        count = len(loop_indices)
+        self.reserve(count)
+        positions = self.positions[:count]
+        vert_indices = mesh.loop_verts[loop_indices]
+        if mesh.coords.dtype == self.dtype:
+            np.take(mesh.coords, vert_indices, axis=0, out=positions)
+        else:
+            positions[...] = mesh.coords[vert_indices]
+        positions -= center.astype(self.dtype)
+        return positions
+
+
+def _box_chunk(mesh: MeshArrays, first: int, last: int,
+               folded: List[Tuple[np.ndarray, np.ndarray]],
+               center: np.ndarray, buffers: _ChunkBuffers,
+               out: np.ndarray) -> None:
+    loop_indices, loop_total, normals, groups = _chunk_faces(mesh, first,
+                                                             last)
+    if not len(loop_indices):
+        return
+    loop_choices = np.repeat(box_face_buckets(normals, groups), loop_total)
+    loop_indices = loop_indices[np.argsort(loop_choices, kind='stable')]
+    bucket_offsets = np.zeros(len(folded) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(loop_choices, minlength=len(folded)),
+              out=bucket_offsets[1:])
+
+    positions = buffers.gather(mesh, loop_indices, center)
+    for i in range(len(folded)):
+        start, end = bucket_offsets[i], bucket_offsets[i + 1]
+        if start == end:
+            continue
+        lin_t, ofs = folded[i]
+        uvs = buffers.uvs[start:end]
+        np.matmul(positions[start:end], lin_t, out=uvs)
+        uvs += ofs
+        out[loop_indices[start:end]] = uvs
+
+
+def _planar_chunk(mesh: MeshArrays, first: int, last: int,
+                  lin_t: np.ndarray, ofs: np.ndarray, center: np.ndarray,
+                  buffers: _ChunkBuffers, out: np.ndarray) -> None:
+    loop_indices = _chunk_faces(mesh, first, last)[0]
+    if not len(loop_indices):
+        return
+    positions = buffers.gather(mesh, loop_indices, center)
+    uvs = buffers.uvs[:len(loop_indices)]
+    np.matmul(positions, lin_t, out=uvs)
+    uvs += ofs
+    out[loop_indices] = uvs
+
+
+def _thread_buffers(local: threading.local, chunk_size: int,
+                    dtype: Any) -> _ChunkBuffers:
+    # One set of scratch buffers per worker thread, reused across chunks
+    buffers = getattr(local, 'buffers', None)
+    if buffers is None:
+        buffers = local.buffers = _ChunkBuffers(chunk_size, dtype)
+    return buffers
+
+
+def _apply_chunked_box_projection(prepared: ChunkedBoxProjection,
+                                  matrices: Sequence[np.ndarray],
+                                  out: np.ndarray,
+                                  threads: int = 1) -> np.ndarray:
+    mesh, chunk_size, dtype, center = prepared
+    folded = [_fold_affine(matrix, center, dtype) for matrix in matrices]
+    local = threading.local()
+
+    def run(first, last):
+        buffers = _thread_buffers(local, chunk_size, dtype)
+        _box_chunk(mesh, first, last, folded, center, buffers, out)
+
+    _run_tasks(run, list(_face_chunks(mesh, chunk_size)), threads)
+    return out
+
+
+def _apply_chunked_planar_projection(prepared: ChunkedPlanarProjection,
+                                     matrix: np.ndarray, out: np.ndarray,
+                                     threads: int = 1) -> np.ndarray:
+    mesh, rotation, chunk_size, dtype, center = prepared
+    lin_t, ofs = _fold_affine(_planar_transform(matrix, rotation), center,
+                              dtype)
+    local = threading.local()
+
+    def run(first, last):
+        buffers = _thread_buffers(local, chunk_size, dtype)
+        _planar_chunk(mesh, first, last, lin_t, ofs, center, buffers, out)
+
+    _run_tasks(run, list(_face_chunks(mesh, chunk_size)), threads)
+    return out
+
+
+def mesh_fingerprint(meshes: Sequence[MeshArrays]) -> bytes:
+    # Normals are derived from coords and topology, no need to hash them
+    digest = hashlib.blake2b(digest_size=16)
+    for mesh in meshes:
+        for arr in (mesh.coords, mesh.loop_verts, mesh.loop_start,
+                    mesh.loop_total, mesh.selection, mesh.groups):
+            if arr is None:
+                digest.update(b'none')
+                continue
+            arr = np.ascontiguousarray(arr)
+            digest.update(f'{arr.dtype.str}{arr.shape}'.encode())
+            digest.update(arr.data)
+    return digest.digest()
+
+
+def concatenate_meshes(
+        meshes: Sequence[MeshArrays]) -> Tuple[MeshArrays, np.ndarray]:
+    vert_counts = [len(m.coords) for m in meshes]
+    loop_counts = [len(m.loop_verts) for m in meshes]
+    vert_offsets = np.cumsum([0] + vert_counts[:-1])
+    loop_offsets = np.cumsum([0] + loop_counts)
+    if len(meshes) == 1:
+        return meshes[0], loop_offsets
+
+    selection = None
+    if any(m.selection is not None for m in meshes):
+        selection = np.concatenate([
+            m.selection if m.selection is not None
+            else np.ones(len(m.loop_start), dtype=bool) for m in meshes])
+
+    groups = None
+    if any(m.groups is not None for m in meshes):
+        groups = np.concatenate([
+            m.groups if m.groups is not None
+            else np.zeros(len(m.loop_start), dtype=np.int32)
+            for m in meshes])
+
+    merged = MeshArrays(
+        coords=np.concatenate([m.coords for m in meshes]),
+        loop_verts=np.concatenate([
+            m.loop_verts.astype(np.int64) + ofs
+            for m, ofs in zip(meshes, vert_offsets)]),
+        normals=np.concatenate([m.normals for m in meshes]),
+        loop_start=np.concatenate([
+            m.loop_start.astype(np.int64) + ofs
+            for m, ofs in zip(meshes, loop_offsets[:-1])]),
+        loop_total=np.concatenate([m.loop_total for m in meshes]),
+        selection=selection,
+        groups=groups)
+    return merged, loop_offsets
+
+
+def split_loops(values: np.ndarray,
+                loop_offsets: np.ndarray) -> List[np.ndarray]:
+    return [values[start:end]
+            for start, end in zip(loop_offsets[:-1], loop_offsets[1:])]
+
+
+def prepare_box_projection_batch(
+        meshes: Sequence[MeshArrays], dtype: Any = np.float32,
+        recenter: bool = True,
+        chunk_size: int = 0) -> Tuple[BoxProjection, np.ndarray]:
+    merged, loop_offsets = concatenate_meshes(meshes)
+    return prepare_box_projection(merged, dtype, recenter,
+                                  chunk_size), loop_offsets
+
+
+def apply_box_projection_batch(prepared: Tuple[BoxProjection, np.ndarray],
+                               matrices: Sequence[np.ndarray],
+                               outs: Optional[Sequence[np.ndarray]] = None,
+                               threads: int = 1) -> List[np.ndarray]:
+    box_prepared, loop_offsets = prepared
+    if outs is None:
+        out = np.zeros((loop_offsets[-1], 2), dtype=np.float32)
+    else:
+        out = np.concatenate(outs)
+    return split_loops(
+        apply_box_projection(box_prepared, matrices, out, threads),
+        loop_offsets)
+
+
+def box_project_batch(meshes: Sequence[MeshArrays],
+                      matrices: Sequence[np.ndarray],
+                      outs: Optional[Sequence[np.ndarray]] = None
+                      ) -> List[np.ndarray]:
+    if not meshes:
+        return []
+    return apply_box_projection_batch(prepare_box_projection_batch(meshes),
+                                      matrices, outs)
@@ -0,0 +1,179 @@
+# Polygon selection kernels: coplanar and same-material selection.
+#
+# Planes are quantized into buckets (normal components and plane distance
+# in cells of the tolerance), so finding every face sharing a plane with
+# the seed faces is a hash lookup per face instead of a pairwise search.
+# Connected regions are found with a vectorized union-find over the faces
+# that share an edge. Like sure_uv_projection, this module does not import
+# bpy.
+
+from typing import Tuple
+import numpy as np
+
+from .sure_uv_projection import polygon_loop_indices
+
+
+# Candidate faces verified at once, each against up to 81 seed buckets
+VERIFY_CHUNK = 1 << 16
+
+_HASH_MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F,
+                              0x165667B19E3779F9, 0x27D4EB2F165667C5],
+                             dtype=np.uint64)
+
+
+def face_plane_distances(normals: np.ndarray, coords: np.ndarray,
+                         loop_verts: np.ndarray,
+                         loop_start: np.ndarray) -> np.ndarray:
+    # Signed distance of every face plane from the origin, n . p
+    points = coords[loop_verts[loop_start]].astype(np.float64)
+    return np.einsum('ij,ij->i', normals.astype(np.float64), points)
+
+
+def _plane_cells(normals: np.ndarray, distances: np.ndarray,
+                 angle: float, distance: float) -> np.ndarray:
+    # The chord between unit normals angle apart is ~angle long
+    cells = np.empty((len(normals), 4), dtype=np.int64)
+    np.floor(normals / max(angle, 1e-9), out=cells[:, :3], casting='unsafe')
+    np.floor(distances / max(distance, 1e-12), out=cells[:, 3],
+             casting='unsafe')
+    return cells
+
+
+def _hash_cells(cells: np.ndarray) -> np.ndarray:
+    with np.errstate(over='ignore'):
+        return (cells.astype(np.uint64) * _HASH_MULTIPLIERS).sum(axis=1)
+
+
+def _neighbor_offsets() -> np.ndarray:
+    grid = np.stack(np.meshgrid(*([(-1, 0, 1)] * 4), indexing='ij'), -1)
+    return grid.reshape(-1, 4)
+
+
+def coplanar_faces(normals: np.ndarray, distances: np.ndarray,
+                   seeds: np.ndarray, angle: float,
+                   distance: float) -> np.ndarray:
+    # Faces sharing a plane with any seed face: normals within angle
+    # (radians) and plane distances within distance.
+    if not seeds.any():
+        return seeds.copy()
+    cells = _plane_cells(normals, distances, angle, distance)
+    seed_cells, seed_first = np.unique(cells[seeds], axis=0,
+                                       return_index=True)
+    # A match can lie in a neighboring bucket of a seed bucket
+    hashes = _hash_cells(cells)
+    offset_hashes = _hash_cells(_neighbor_offsets())
+    lookup = np.unique(_hash_cells(seed_cells)[:, None] +
+                       offset_hashes[None])
+    result = np.isin(hashes, lookup)
+
+    # One representative per seed bucket, seeds in a bucket are closer
+    # than the tolerance
+    seed_index = np.flatnonzero(seeds)[seed_first]
+    candidates = np.flatnonzero(result & ~seeds)
+    result[candidates] = _verify(normals, distances, hashes, candidates,
+                                 seed_cells, seed_index, offset_hashes,
+                                 angle, distance)
+    result |= seeds
+    return result
+
+
+def _verify(normals: np.ndarray, distances: np.ndarray, hashes: np.ndarray,
+            candidates: np.ndarray, seed_cells: np.ndarray,
+            seed_index: np.ndarray, offset_hashes: np.ndarray,
+            angle: float, distance: float) -> np.ndarray:
+    # Every candidate is compared with the seed buckets around its own
+    # bucket only. The cell hash is linear, so the neighbor hashes are the
+    # face hash plus the offset hashes.
+    seed_hashes = _hash_cells(seed_cells)
+    order = np.argsort(seed_hashes)
+    seed_hashes = seed_hashes[order]
+    min_dot = np.cos(angle)
+    matched = np.zeros(len(candidates), dtype=bool)
+    for start in range(0, len(candidates), VERIFY_CHUNK):
+        faces = candidates[start:start + VERIFY_CHUNK]
+        neighbors = hashes[faces, None] + offset_hashes[None]
+        pos = np.minimum(np.searchsorted(seed_hashes, neighbors),
+                         len(seed_hashes) - 1)
+        rows, cols = np.nonzero(seed_hashes[pos] == neighbors)
+        seeds = seed_index[order[pos[rows, cols]]]
+        pair_faces = faces[rows]
+        dots = np.einsum('ij,ij->i', normals[pair_faces].astype(np.float64),
+                         normals[seeds].astype(np.float64))
+        close = np.abs(distances[pair_faces] - distances[seeds]) <= distance
+        ok = rows[(dots >= min_dot) & close]
+        matched[start + ok] = True
+    return matched
+
+
+def same_material_faces(material_indices: np.ndarray,
+                        seeds: np.ndarray) -> np.ndarray:
+    return np.isin(material_indices, np.unique(material_indices[seeds]))
+
+
+def face_adjacency(loop_edges: np.ndarray, loop_start: np.ndarray,
+                   loop_total: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Pairs of faces sharing an edge, from the per loop edge indices
+    loop_faces = np.repeat(np.arange(len(loop_start), dtype=np.int64),
+                           loop_total)
+    edges = loop_edges[polygon_loop_indices(loop_start, loop_total)]
+    order = np.argsort(edges, kind='stable')
+    edges, loop_faces = edges[order], loop_faces[order]
+    same = edges[1:] == edges[:-1]
+    return loop_faces[:-1][same], loop_faces[1:][same]
+
+
+def _compress(parents: np.ndarray) -> np.ndarray:
+    # Pointer jumping until every face points at its root
+    while True:
+        grand = parents[parents]
+        if np.array_equal(grand, parents):
+            return parents
+        parents = grand
+
+
+def face_components(face_count: int,
+                    pairs: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    # Label of every face = smallest face index of its connected component.
+    # Vectorized union-find (Shiloach-Vishkin): the larger root of every
+    # edge joining two trees is hooked under the smaller one, then the
+    # trees are flattened. The round count does not grow with the graph
+    # diameter or the face order.
+    a, b = pairs
+    parents = np.arange(face_count, dtype=np.int64)
+    while len(a):
+        roots_a, roots_b = parents[a], parents[b]
+        joining = roots_a != roots_b
+        # Edges inside one tree never join anything again
+        a, b = a[joining], b[joining]
+        if not len(a):
+            break
+        roots_a, roots_b = roots_a[joining], roots_b[joining]
+        low = np.minimum(roots_a, roots_b)
+        np.minimum.at(parents, np.maximum(roots_a, roots_b), low)
+        parents = _compress(parents)
+    return parents
+
+
+def connected_faces(candidates: np.ndarray, seeds: np.ndarray,
+                    pairs: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    # Candidate faces connected to a seed through other candidate faces
+    a, b = pairs
+    keep = candidates[a] & candidates[b]
+    labels = face_components(len(candidates), (a[keep], b[keep]))
+    seed_labels = np.unique(labels[seeds & candidates])
+    return candidates & np.isin(labels, seed_labels)
+
+
+def planar_islands(normals: np.ndarray, pairs: Tuple[np.ndarray, np.ndarray],
+                   angle: float) -> Tuple[np.ndarray, int]:
+    # Faces joined across shared edges whose normals differ by at most
+    # angle (radians). Returns island ids 0..count-1 per face and count.
+    a, b = pairs
+    dots = np.einsum('ij,ij->i', normals[a].astype(np.float64),
+                     normals[b].astype(np.float64))
+    keep = dots >= np.cos(angle)
+    labels = face_components(len(normals), (a[keep], b[keep]))
+    # Roots are their own label, numbering them in face order is linear
+    roots = labels == np.arange(len(labels))
+    ids = np.cumsum(roots, dtype=np.int64) - 1
+    return ids[labels], int(roots.sum())
@@ -1,13 +1,39 @@
 from typing import Any
 from bpy.types import Image, PropertyGroup
-from bpy.props import PointerProperty, BoolProperty, FloatProperty
+from bpy.props import (PointerProperty, BoolProperty, CollectionProperty,
+                       EnumProperty, FloatProperty, FloatVectorProperty,
+                       IntProperty, StringProperty)
+
+from .sure_uv_utils import get_image_aspect
+from .sure_uv_cache import CACHE_SIZE_MB
+from .sure_uv_checker import CHECKER_RESOLUTIONS
 
 
 def update_teximage_func(self, context: Any) -> None:
     img = self.teximage
     if not img:
         return
-    self.texaspect = img.size[0] / img.size[1] if img.size[1] != 0 else 1.0
+    aspect = get_image_aspect(img)
+    self.texaspect = aspect if aspect is not None else 1.0
+
+
+class SureUVChannel(PropertyGroup):
+    # Extra UV map written by Box / Best Planar mapping from the same
+    # geometry read, with its own parameters
+    enabled: BoolProperty(name='Enabled', default=True,
+                          description='Also write this UV map when mapping')
+    uv_layer: StringProperty(name='UV map', default='UVMap.001',
+                             description='UV map to write, created when '
+                                         'missing')
+    size: FloatProperty(name='Size', default=1.0, precision=4,
+                        description='Texture real size (image width = Size)')
+    texaspect: FloatProperty(name='Texture aspect', default=1.0, precision=4,
+                             description='Texture aspect')
+    rot: FloatVectorProperty(name='XYZ Rotation',
+                             description='Angles of rotation. Best Planar '
+                                         'uses Z only')
+    offset: FloatVectorProperty(name='XYZ offset', precision=4,
+                                description='Best Planar uses X and Y only')
 
 
 class SureUVSettings(PropertyGroup):
@@ -17,3 +43,72 @@ class SureUVSettings(PropertyGroup):
                                 description='Automatically detect Texture '
                                             'Aspect when selecting a texture')
     texaspect: FloatProperty(name='Texture aspect', default=1.0, precision=4)
+    chunk_size: IntProperty(name='Chunk size', default=0, min=0,
+                            step=65536,
+                            description='Project loops in blocks of this '
+                                        'size to bound peak memory on huge '
+                                        'meshes. 0 = whole mesh at once')
+    checker_resolution: EnumProperty(
+        name='Checker resolution',
+        items=[(str(size), f'{size} px', f'{size} x {size} checker texture')
+               for size in CHECKER_RESOLUTIONS],
+        default='2048')
+    cache_size: IntProperty(name='Redo cache (MB)', default=CACHE_SIZE_MB,
+                            min=0, max=4096,
+                            description='Memory for the prepared geometry '
+                                        'reused by redo panel steps. It is '
+                                        'freed when another operator runs. '
+                                        '0 = no cache')
+    threads: IntProperty(name='Threads', default=1, min=0, max=64,
+                         description='Worker threads used to project UVs. '
+                                     '0 = one per CPU core')
+    show_previews: BoolProperty(name='Texture previews', default=False,
+                                description='Show the texture preview grid '
+                                            'in the panel. Slows down '
+                                            'viewport redraws with large '
+                                            'image libraries')
+    show_draw_time: BoolProperty(name='Panel draw time', default=False,
+                                 description='Show how long the panel takes '
+                                             'to draw')
+    show_profile: BoolProperty(name='Last run timings', default=False,
+                               description='Show the phase timings of the '
+                                           'last SureUV operator run')
+    uv_channels: CollectionProperty(type=SureUVChannel)
+
+
+class SureUVMaterialProfile(PropertyGroup):
+    # Box mapping parameters for the faces of one material slot
+    slot: IntProperty(name='Material slot', min=0)
+    enabled: BoolProperty(name='Enabled', default=True,
+                          description='Map the faces of this material slot '
+                                      'with the profile parameters')
+    size: FloatProperty(name='Size', default=1.0, precision=4,
+                        description='Texture real size (image width = Size)')
+    texaspect: FloatProperty(name='Texture aspect', default=1.0, precision=4,
+                             description='Texture aspect')
+    rot: FloatVectorProperty(name='XYZ Rotation',
+                             description='Angles of rotation')
+    offset: FloatVectorProperty(name='XYZ offset', precision=4)
+
+
+class SureUVKeepMapped(PropertyGroup):
+    # Last Box mapping parameters of an object, re-applied to the faces
+    # moved by geometry edits while enabled
+    enabled: BoolProperty(name='Keep mapped', default=False,
+                          description='Box map the faces of the last Box '
+                                      'mappings again with their parameters '
+                                      'when geometry edits change them')
+    size: FloatProperty(name='Size', default=1.0, precision=4)
+    texaspect: FloatProperty(name='Texture aspect', default=1.0, precision=4)
+    rot: FloatVectorProperty(name='XYZ Rotation')
+    offset: FloatVectorProperty(name='XYZ offset', precision=4)
+    use_profiles: BoolProperty(name='Material profiles', default=True)
+    transform: EnumProperty(name='Object transform',
+                            items=(('NONE', 'Local', ''),
+                                   ('SCALE', 'Scale', ''),
+                                   ('FULL', 'World', '')),
+                            default='NONE')
+    double_precision: BoolProperty(name='Double precision')
+    uv_layer: StringProperty(name='UV map')
+    # UV channels written by the last Box mapping, remapped as well
+    channels: CollectionProperty(type=SureUVChannel)
@@ -0,0 +1,135 @@
+# Texel density analysis kernels.
+#
+# Works on the same loop/vertex arrays the mapping operators read. Polygon
+# areas use the shoelace sum over each face's loops relative to the face's
+# first corner, summed per face with np.add.reduceat. Like
+# sure_uv_projection, this module does not import bpy.
+
+from typing import Dict, List, NamedTuple, Tuple
+import numpy as np
+
+from .sure_uv_projection import polygon_loop_indices
+
+
+class TexelStats(NamedTuple):
+    faces: int
+    area: float           # 3D area
+    uv_area: float        # UV area, 1.0 = whole texture
+    density: float        # area weighted mean, px per unit
+    min_density: float
+    max_density: float
+    in_range: float       # share of the 3D area within tolerance of target
+
+
+def _face_loops(loop_start: np.ndarray, loop_total: np.ndarray
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Loops in face order, their next loop within the face and face firsts
+    loop_indices = polygon_loop_indices(loop_start, loop_total)
+    firsts = np.cumsum(loop_total, dtype=np.int64) - loop_total
+    next_pos = np.arange(1, len(loop_indices) + 1, dtype=np.int64)
+    next_pos[firsts + loop_total - 1] = firsts
+    return loop_indices, next_pos, firsts
+
+
+def polygon_areas(points: np.ndarray, loop_start: np.ndarray,
+                  loop_total: np.ndarray) -> np.ndarray:
+    # points are per loop, (L, 3) for 3D or (L, 2) for UV areas
+    face_count = len(loop_start)
+    areas = np.zeros(face_count)
+    valid = loop_total >= 3
+    if not valid.any():
+        return areas
+    if not valid.all():
+        areas[valid] = polygon_areas(points, loop_start[valid],
+                                     loop_total[valid])
+        return areas
+
+    loop_indices, next_pos, firsts = _face_loops(loop_start, loop_total)
+    corners = points[loop_indices].astype(np.float64)
+    corners -= np.repeat(corners[firsts], loop_total, axis=0)
+    following = corners[next_pos]
+    if points.shape[1] == 2:
+        cross = corners[:, 0] * following[:, 1] - \
+            corners[:, 1] * following[:, 0]
+        return np.abs(np.add.reduceat(cross, firsts)) * 0.5
+    # Component-wise, np.cross is several times slower on (L, 3) arrays
+    x, y, z = corners.T
+    fx, fy, fz = following.T
+    cx = np.add.reduceat(y * fz - z * fy, firsts)
+    cy = np.add.reduceat(z * fx - x * fz, firsts)
+    cz = np.add.reduceat(x * fy - y * fx, firsts)
+    return np.sqrt(cx * cx + cy * cy + cz * cz) * 0.5
+
+
+def texel_density(area: np.ndarray, uv_area: np.ndarray,
+                  texture_width: int, aspect: float=1.0) -> np.ndarray:
+    # Pixels per unit: sqrt(UV area in px^2 / 3D area). UV u spans the
+    # texture width, v its height = width / aspect.
+    px_area = uv_area * (texture_width * texture_width / aspect)
+    return np.sqrt(np.divide(px_area, area, out=np.zeros_like(px_area),
+                             where=area > 0))
+
+
+def heat_colors(deviation: np.ndarray, octaves: float=2.0) -> np.ndarray:
+    # deviation = density / target, not UV distortion within a face.
+    # log2(deviation) in [-octaves, octaves]: blue (too low), green, red
+    t = np.clip(np.log2(np.where(deviation > 0, deviation,
+                                 2.0 ** -octaves)) / octaves, -1.0, 1.0)
+    colors = np.ones((len(t), 4), dtype=np.float32)
+    colors[:, 0] = np.clip(t, 0.0, 1.0)
+    colors[:, 1] = 1.0 - np.abs(t)
+    colors[:, 2] = np.clip(-t, 0.0, 1.0)
+    return colors
+
+
+def texel_stats(area: np.ndarray, uv_area: np.ndarray, density: np.ndarray,
+                target: float, tolerance: float=0.1) -> TexelStats:
+    total = float(area.sum())
+    measured = area > 0
+    if not measured.any():
+        return TexelStats(len(area), total, float(uv_area.sum()),
+                          0.0, 0.0, 0.0, 0.0)
+    good = np.abs(density - target) <= tolerance * target
+    return TexelStats(len(area), total, float(uv_area.sum()),
+                      float(np.average(density[measured],
+                                       weights=area[measured])),
+                      float(density[measured].min()),
+                      float(density[measured].max()),
+                      float(area[good & measured].sum() / total))
+
+
+def split_by_group(groups: np.ndarray, *arrays: np.ndarray
+                   ) -> Dict[int, Tuple[np.ndarray, ...]]:
+    # One sort instead of a mask per group
+    order = np.argsort(groups, kind='stable')
+    values, starts = np.unique(groups[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+    return {int(value): tuple(arr[order[start:end]] for arr in arrays)
+            for value, start, end in zip(values, starts, ends)}
+
+
+class TexelReport:
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.target = 0.0
+        self.tolerance = 0.0
+        self.objects: List[Tuple[str, TexelStats]] = []
+        self.materials: List[Tuple[str, TexelStats]] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.objects)
+
+    def set_materials(self, parts: Dict[str, List[Tuple[np.ndarray, ...]]]
+                      ) -> None:
+        # parts: material name -> (area, uv_area, density) of every mesh
+        self.materials = []
+        for name, arrays in sorted(parts.items()):
+            merged = [np.concatenate(column) for column in zip(*arrays)]
+            self.materials.append(
+                (name, texel_stats(*merged, self.target, self.tolerance)))
+
+
+texel_report = TexelReport()
+
@@ -1,10 +1,30 @@
-from typing import Any, Optional, Tuple, List
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, List
+from contextlib import contextmanager
+from itertools import chain
 import numpy as np
-from math import sin, cos, pi
 
 import bpy
+import bmesh
 from bpy.types import Object, Image, Material
 
+from .sure_uv_projection import MeshArrays, polygon_loop_indices
+from .sure_uv_imageinfo import image_size_cache
+from .sure_uv_checker import checker_pixels, checker_key, parse_checker_key
+from .sure_uv_profiler import profiler
+
+
+# Image pointer -> checker key of the pixels written in this session. The
+# pixels are not packed (no .blend bloat). A loaded file shows the built-in
+# generated_type pattern until regenerate_checker_images has run.
+_checker_images: Dict[int, str] = {}
+# ID property with the checker key, saved with the image
+CHECKER_IMAGE_PROPERTY = 'sure_uv_checker'
+
+# EDIT mode mappings read and write selections of up to this many loops
+# through bmesh. Larger selections cost less with one OBJECT mode round
+# trip and foreach_get / foreach_set, bmesh access runs per loop in Python.
+EDIT_BMESH_MAX_LOOPS = 20000
+
 
 def get_mesh_verts(mesh: Any) -> np.ndarray:
     verts = np.empty((len(mesh.vertices), 3), dtype=np.float32)
@@ -45,10 +65,7 @@ def get_obj_normals2(obj: Object) -> np.ndarray:
 
 
 def get_obj_material_indices(obj: Object) -> np.ndarray:
-    mesh = obj.data
-    indices = np.empty((len(mesh.polygons),), dtype=np.int32)
-    mesh.polygons.foreach_get('material_index', indices.ravel())
-    return indices
+    return get_mesh_material_indices(obj.data)
 
 
 def get_obj_selected_polygons(obj: Object) -> np.ndarray:
@@ -58,6 +75,342 @@ def get_obj_selected_polygons(obj: Object) -> np.ndarray:
     return indices
 
 
+def get_mesh_polygon_normals(mesh: Any) -> np.ndarray:
+    normals = np.empty((len(mesh.polygons), 3), dtype=np.float32)
+    mesh.polygon_normals.foreach_get('vector', normals.ravel())
+    return normals
+
+
+def get_mesh_polygon_loops(mesh: Any) -> Tuple[np.ndarray, np.ndarray]:
+    loop_start = np.empty((len(mesh.polygons),), dtype=np.int32)
+    loop_total = np.empty((len(mesh.polygons),), dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loop_start)
+    mesh.polygons.foreach_get('loop_total', loop_total)
+    return loop_start, loop_total
+
+
+def get_mesh_selected_polygons(mesh: Any) -> np.ndarray:
+    return get_mesh_polygon_flags(mesh, 'select')
+
+
+def get_mesh_polygon_flags(mesh: Any, name: str) -> np.ndarray:
+    flags = np.empty((len(mesh.polygons),), dtype=bool)
+    mesh.polygons.foreach_get(name, flags)
+    return flags
+
+
+def get_mesh_loop_edges(mesh: Any) -> np.ndarray:
+    loop_edges = np.empty((len(mesh.loops),), dtype=np.int32)
+    mesh.loops.foreach_get('edge_index', loop_edges)
+    return loop_edges
+
+
+def set_mesh_face_selection(mesh: Any, selected: np.ndarray,
+                            loop_verts: np.ndarray, loop_edges: np.ndarray,
+                            loop_start: np.ndarray,
+                            loop_total: np.ndarray) -> None:
+    # Faces, and the edges/vertices of the selected faces, one foreach_set
+    # each so EDIT mode comes back with a consistent selection
+    loops = polygon_loop_indices(loop_start[selected], loop_total[selected])
+    verts = np.zeros((len(mesh.vertices),), dtype=bool)
+    verts[loop_verts[loops]] = True
+    edges = np.zeros((len(mesh.edges),), dtype=bool)
+    edges[loop_edges[loops]] = True
+    mesh.polygons.foreach_set('select', selected)
+    mesh.edges.foreach_set('select', edges)
+    mesh.vertices.foreach_set('select', verts)
+
+
+def get_mesh_material_indices(mesh: Any) -> np.ndarray:
+    indices = np.empty((len(mesh.polygons),), dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', indices)
+    return indices
+
+
+def get_mesh_loop_verts(mesh: Any) -> np.ndarray:
+    loop_verts = np.empty((len(mesh.loops),), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_verts)
+    return loop_verts
+
+
+def get_mesh_arrays(mesh: Any, selected_only: bool=False) -> MeshArrays:
+    with profiler.span('read'):
+        loop_start, loop_total = get_mesh_polygon_loops(mesh)
+        selection = get_mesh_selected_polygons(mesh) if selected_only \
+            else None
+        return MeshArrays(coords=get_mesh_verts(mesh),
+                          loop_verts=get_mesh_loop_verts(mesh),
+                          normals=get_mesh_polygon_normals(mesh),
+                          loop_start=loop_start,
+                          loop_total=loop_total,
+                          selection=selection)
+
+
+def get_unique_meshes(objects: List[Object]) -> List[Any]:
+    # Linked duplicates share one Mesh datablock, map each datablock once
+    meshes = {}
+    for obj in objects:
+        if obj is not None and obj.type == 'MESH':
+            meshes.setdefault(obj.data.as_pointer(), obj.data)
+    return list(meshes.values())
+
+
+def ensure_uv_layer(mesh: Any) -> Any:
+    if len(mesh.uv_layers) == 0:
+        mesh.uv_layers.new()
+    return mesh.uv_layers.active
+
+
+def get_uv_layer(mesh: Any, name: str='') -> Any:
+    # UV map by name, added through the data API when missing ('' = the
+    # active one). OBJECT mode data only.
+    if not name:
+        return ensure_uv_layer(mesh)
+    layer = mesh.uv_layers.get(name)
+    if layer is None:
+        layer = mesh.uv_layers.new(name=name)
+        if layer is None:
+            raise RuntimeError(f'Cannot add UV map "{name}" to {mesh.name}, '
+                               f'the mesh has the maximum number of UV maps')
+    return layer
+
+
+def get_mesh_uvs(mesh: Any, layer_name: str='') -> np.ndarray:
+    uvs = np.empty((len(mesh.loops), 2), dtype=np.float32)
+    get_uv_layer(mesh, layer_name).data.foreach_get('uv', uvs.ravel())
+    return uvs
+
+
+def set_mesh_uvs(mesh: Any, uvs: np.ndarray, layer_name: str='',
+                 update: bool=True) -> None:
+    with profiler.span('write'):
+        with profiler.span('foreach_set'):
+            get_uv_layer(mesh, layer_name).data.foreach_set('uv', uvs.ravel())
+        if update:
+            with profiler.span('mesh.update'):
+                mesh.update()
+
+
+def set_face_attribute(mesh: Any, name: str, values: np.ndarray) -> None:
+    if not hasattr(mesh, 'attributes'):
+        return  # Generic attributes need Blender 2.91+
+    attr = mesh.attributes.get(name)
+    if attr is not None and (attr.domain != 'FACE' or
+                             attr.data_type != 'FLOAT'):
+        mesh.attributes.remove(attr)
+        attr = None
+    if attr is None:
+        attr = mesh.attributes.new(name, 'FLOAT', 'FACE')
+    attr.data.foreach_set('value', values.astype(np.float32))
+
+
+def get_face_flags(mesh: Any, name: str) -> Optional[np.ndarray]:
+    # (F,) bool from an INT face attribute, None when the mesh has none
+    attr = mesh.attributes.get(name) if hasattr(mesh, 'attributes') else None
+    if attr is None or attr.domain != 'FACE' or attr.data_type != 'INT':
+        return None
+    values = np.empty((len(mesh.polygons),), dtype=np.int32)
+    attr.data.foreach_get('value', values)
+    return values != 0
+
+
+def set_face_flags(obj: Object, name: str, faces: np.ndarray,
+                   union: bool) -> None:
+    # Sets an INT face attribute on faces, cleared everywhere else unless
+    # union. In EDIT mode the edit mesh is written (leaving EDIT mode would
+    # overwrite the mesh data) and flushed to the mesh data.
+    mesh = obj.data
+    if not hasattr(mesh, 'attributes'):
+        return  # Generic attributes need Blender 2.91+
+    if obj.mode == 'EDIT':
+        bm = bmesh.from_edit_mesh(mesh)
+        layer = bm.faces.layers.int.get(name)
+        if layer is not None and not union:
+            bm.faces.layers.int.remove(layer)
+            layer = None
+        if layer is None:
+            layer = bm.faces.layers.int.new(name)
+        bm.faces.ensure_lookup_table()
+        for index in np.flatnonzero(faces).tolist():
+            bm.faces[index][layer] = 1
+        obj.update_from_editmode()
+        return
+    values = get_face_flags(mesh, name) if union else None
+    values = faces if values is None else values | faces
+    attr = mesh.attributes.get(name)
+    if attr is not None and (attr.domain != 'FACE' or
+                             attr.data_type != 'INT'):
+        mesh.attributes.remove(attr)
+        attr = None
+    if attr is None:
+        attr = mesh.attributes.new(name, 'INT', 'FACE')
+    attr.data.foreach_set('value', values.astype(np.int32))
+
+
+def set_corner_colors(mesh: Any, name: str, colors: np.ndarray) -> None:
+    if hasattr(mesh, 'color_attributes'):
+        attr = mesh.color_attributes.get(name)
+        if attr is None:
+            attr = mesh.color_attributes.new(name, 'BYTE_COLOR', 'CORNER')
+        attr.data.foreach_set('color', colors.ravel())
+        mesh.color_attributes.active_color = attr
+    else:
+        layer = mesh.vertex_colors.get(name)
+        if layer is None:
+            layer = mesh.vertex_colors.new(name=name)
+        layer.data.foreach_set('color', colors.ravel())
+        mesh.vertex_colors.active = layer
+
+
+def get_selected_loop_estimate(meshes: List[Any]) -> int:
+    # total_face_sel comes from the edit mesh, the mean face size from the
+    # last OBJECT mode data (quads when there is none)
+    total = 0.0
+    for mesh in meshes:
+        sides = len(mesh.loops) / len(mesh.polygons) \
+            if len(mesh.polygons) else 4.0
+        total += mesh.total_face_sel * sides
+    return int(total)
+
+
+def use_bulk_edit_access(meshes: List[Any]) -> bool:
+    return get_selected_loop_estimate(meshes) > EDIT_BMESH_MAX_LOOPS
+
+
+def get_selected_mesh_arrays(mesh: Any, materials: bool=False
+                             ) -> Tuple[MeshArrays, np.ndarray]:
+    # OBJECT mode counterpart of get_edit_mesh_selection with the same
+    # compact face and loop order. Returns the mesh loop index of every
+    # loop instead of BMLoops.
+    mesh_arrays = get_mesh_arrays(mesh, selected_only=True)
+    selection = mesh_arrays.selection
+    loop_total = mesh_arrays.loop_total[selection]
+    loop_indices = polygon_loop_indices(mesh_arrays.loop_start[selection],
+                                        loop_total)
+    groups = get_mesh_material_indices(mesh)[selection] if materials \
+        else None
+    compact = MeshArrays(coords=mesh_arrays.coords,
+                         loop_verts=mesh_arrays.loop_verts[loop_indices],
+                         normals=mesh_arrays.normals[selection],
+                         loop_start=(np.cumsum(loop_total) - loop_total
+                                     ).astype(np.int32),
+                         loop_total=loop_total,
+                         groups=groups)
+    return compact, loop_indices
+
+
+def get_mesh_loop_uvs(mesh: Any, loop_indices: np.ndarray,
+                      layer_name: str='') -> np.ndarray:
+    return get_mesh_uvs(mesh, layer_name)[loop_indices]
+
+
+def set_mesh_loop_uvs(mesh: Any, loop_indices: np.ndarray, uvs: np.ndarray,
+                      layer_name: str='', update: bool=True,
+                      mesh_uvs: Optional[np.ndarray]=None) -> None:
+    # Loops outside loop_indices keep their UVs, mesh_uvs (the whole layer)
+    # saves the read when the caller already has it
+    if mesh_uvs is None:
+        mesh_uvs = get_mesh_uvs(mesh, layer_name)
+    mesh_uvs[loop_indices] = uvs
+    set_mesh_uvs(mesh, mesh_uvs, layer_name, update)
+
+
+@contextmanager
+def restore_edit_mode(obj: Any) -> Iterator[None]:
+    # Bulk reads of EDIT mode selections leave OBJECT mode on until the
+    # UVs are written, EDIT mode comes back on exit
+    in_editmode = obj.mode == 'EDIT'
+    try:
+        yield
+    finally:
+        if in_editmode and obj.mode != 'EDIT':
+            set_object_mode('EDIT')
+
+
+def update_edit_meshes(meshes: List[Any]) -> None:
+    # Writes the edit meshes to their mesh data in C, what leaving EDIT mode
+    # does without the mode switch, so foreach_get reads are current
+    pointers = {mesh.as_pointer() for mesh in meshes}
+    with profiler.span('update_from_editmode'):
+        for obj in bpy.context.objects_in_mode_unique_data:
+            if obj.data.as_pointer() in pointers:
+                obj.update_from_editmode()
+
+
+def get_edit_mesh_selection(mesh: Any, materials: bool=False
+                            ) -> Tuple[MeshArrays, List[Any]]:
+    # Selected faces of an edit mesh flushed by update_edit_meshes, read in
+    # bulk like get_selected_mesh_arrays. Python only touches the selected
+    # faces, to collect the BMLoops the UVs are written to: loops[i] is
+    # loop i of the compact arrays.
+    mesh_arrays, _ = get_selected_mesh_arrays(mesh, materials)
+    with profiler.span('read (bmesh)'):
+        bm = bmesh.from_edit_mesh(mesh)
+        # Face i of the flushed mesh data is face i of the edit mesh
+        bm.faces.ensure_lookup_table()
+        faces = np.flatnonzero(get_mesh_selected_polygons(mesh)).tolist()
+        loops = [loop for index in faces for loop in bm.faces[index].loops]
+    return mesh_arrays, loops
+
+
+def get_edit_mesh_loop_edges(mesh: Any, loops: List[Any]) -> np.ndarray:
+    # Edge index of every loop returned by get_edit_mesh_selection
+    bm = bmesh.from_edit_mesh(mesh)
+    bm.edges.index_update()
+    return np.fromiter((loop.edge.index for loop in loops), dtype=np.int32,
+                       count=len(loops))
+
+
+def get_edit_uv_layer(bm: Any, name: str='') -> Any:
+    if not name:
+        return bm.loops.layers.uv.verify()
+    layer = bm.loops.layers.uv.get(name)
+    return layer if layer is not None else bm.loops.layers.uv.new(name)
+
+
+def remove_uv_layers(mesh: Any, names: Iterable[str]) -> None:
+    # From the edit mesh in EDIT mode, the mesh data is overwritten on exit
+    if mesh.is_editmode:
+        bm = bmesh.from_edit_mesh(mesh)
+        for name in names:
+            layer = bm.loops.layers.uv.get(name)
+            if layer is not None:
+                bm.loops.layers.uv.remove(layer)
+        bmesh.update_edit_mesh(mesh, loop_triangles=False, destructive=True)
+        return
+    for name in names:
+        layer = mesh.uv_layers.get(name)
+        if layer is not None:
+            mesh.uv_layers.remove(layer)
+
+
+def get_edit_mesh_uvs(mesh: Any, loops: List[Any],
+                      layer_name: str='') -> np.ndarray:
+    bm = bmesh.from_edit_mesh(mesh)
+    uv_layer = get_edit_uv_layer(bm, layer_name)
+    uvs = np.fromiter(chain.from_iterable(loop[uv_layer].uv for loop in loops),
+                      dtype=np.float32, count=2 * len(loops))
+    return uvs.reshape(-1, 2)
+
+
+def set_edit_mesh_uvs(mesh: Any, loops: List[Any], uvs: np.ndarray,
+                      layer_name: str='', update: bool=True) -> None:
+    with profiler.span('write (bmesh)'):
+        bm = bmesh.from_edit_mesh(mesh)
+        uv_layer = get_edit_uv_layer(bm, layer_name)
+        for loop, uv in zip(loops, uvs.tolist()):
+            loop[uv_layer].uv = uv
+        if update:
+            with profiler.span('update_edit_mesh'):
+                bmesh.update_edit_mesh(mesh, loop_triangles=False,
+                                       destructive=False)
+
+
+def set_object_mode(mode: str) -> None:
+    with profiler.span('mode_set'):
+        bpy.ops.object.mode_set(mode=mode, toggle=False)
+
+
 def get_most_frequent_material(obj: Object) -> int:
     mat_indices = get_obj_material_indices(obj)
     values, counts = np.unique(mat_indices, return_counts=True)
@@ -73,78 +426,6 @@ def get_settings():
     return bpy.context.scene.sure_uv_settings
 
 
-def get_box_project_matrices(
-        size: float, aspect: float,
-        rotation: Tuple[float, float, float],
-        offset: Tuple[float, float, float]) -> List[np.ndarray]:
-    sc = 1.0 / size if size != 0 else 1.0
-
-    sx = 1 * sc
-    sy = 1 * sc
-    sz = 1 * sc
-    ofx, ofy, ofz = offset
-    rx = rotation[0] * pi / 180.0
-    ry = rotation[1] * pi / 180.0
-    rz = rotation[2] * pi / 180.0
-
-    crx = cos(rx)
-    srx = sin(rx)
-    cry = cos(ry)
-    sry = sin(ry)
-    crz = cos(rz)
-    srz = sin(rz)
-    ofycrx = ofy * crx
-    ofzsrx = ofz * srx
-
-    ofysrx = ofy * srx
-    ofzcrx = ofz * crx
-
-    ofxcry = ofx * cry
-    ofzsry = ofz * sry
-
-    ofxsry = ofx * sry
-    ofzcry = ofz * cry
-
-    ofxcry = ofx * cry
-    ofzsry = ofz * sry
-
-    ofxsry = ofx * sry
-    ofzcry = ofz * cry
-
-    ofxcrz = ofx * crz
-    ofysrz = ofy * srz
-
-    ofxsrz = ofx * srz
-    ofycrz = ofy * crz
-
-    matrices = []
-    matrices.append(np.array([
-        [0, crx * sy, srx * sz, -ofycrx - ofzsrx],
-        [0, -aspect * srx * sy, aspect * crx * sz, ofysrx - ofzcrx]
-    ]))
-    matrices.append(np.array([
-        [0, -crx * sy, srx * sz, ofycrx - ofzsrx],
-        [0, aspect * srx * sy, aspect * crx * sz, -ofysrx - ofzcrx]
-    ]))
-    matrices.append(np.array([
-        [-cry * sx, 0, sry * sz, ofxcry - ofzsry],
-        [aspect * sry * sx, 0, aspect * cry * sz, -ofxsry - ofzcry]
-    ]))
-    matrices.append(np.array([
-        [cry * sx, 0, sry * sz, -ofxcry - ofzsry],
-        [-aspect * sry * sx, 0, aspect * cry * sz, ofxsry - ofzcry]
-    ]))
-    matrices.append(np.array([
-        [crz * sx, srz * sy, 0, -ofxcrz - ofysrz],
-        [-aspect * srz * sx, aspect * crz * sy, 0, ofxsrz - ofycrz]
-    ]))
-    matrices.append(np.array([
-        [-crz * sx, -srz * sy, 0, ofxcrz - ofysrz],
-        [-aspect * srz * sx, aspect * crz * sy, 0, -ofxsrz - ofycrz]
-    ]))
-    return matrices
-
-
 def create_new_mat(mat_name: str) -> Material:
     new_mat = bpy.data.materials.new(mat_name)
     new_mat.use_nodes = True
@@ -170,23 +451,95 @@ def get_image_by_name(image_name: str) -> Optional[Image]:
     return None
 
 
+def get_image_size(img: Image) -> Tuple[int, int]:
+    # Image.size loads and decodes the whole file if it is not in memory
+    # yet, the header is enough to know the dimensions.
+    if not img.has_data and img.source == 'FILE' and img.packed_file is None:
+        size = image_size_cache.get_size(
+            bpy.path.abspath(img.filepath, library=img.library))
+        image_size_cache.save()
+        if size is not None:
+            return size
+    return tuple(img.size)
+
+
+def get_image_aspect(img: Image) -> Optional[float]:
+    w, h = get_image_size(img)
+    if w == 0 or h == 0:
+        return None
+    return w / h
+
+
 def create_checker_image(*, generated_type: str='COLOR_GRID',
                          image_name: str='sure_uv_grid_checker',
                          tex_size: int=2048) -> Image:
+    key = checker_key(generated_type, tex_size)
     tex = get_image_by_name(image_name)
+    if tex is not None and _checker_images.get(tex.as_pointer()) == key:
+        return tex
     if tex is None:
         tex = bpy.data.images.new(image_name, tex_size, tex_size)
+    # Closest built-in pattern, what the image shows after a reload
     tex.source = 'GENERATED'
-    tex.scale(tex_size, tex_size)
     tex.generated_type = generated_type
+    tex.generated_width = tex_size
+    tex.generated_height = tex_size
+    tex[CHECKER_IMAGE_PROPERTY] = key
+    tex.pixels.foreach_set(checker_pixels(tex_size, generated_type))
+    tex.update()
+    _checker_images[tex.as_pointer()] = key
     return tex
 
 
+def forget_checker_images() -> None:
+    _checker_images.clear()
+
+
+def regenerate_checker_images() -> int:
+    # Writes the NumPy pattern into the checker images of a loaded file
+    # again, returns their number
+    _checker_images.clear()
+    count = 0
+    for tex in bpy.data.images:
+        parsed = parse_checker_key(tex.get(CHECKER_IMAGE_PROPERTY, ''))
+        if parsed is None or tex.library is not None or \
+                tex.source != 'GENERATED':
+            continue
+        template, size = parsed
+        create_checker_image(generated_type=template, image_name=tex.name,
+                             tex_size=size)
+        count += 1
+    return count
+
+
+def get_checker_material_tex_node(mat: Material) -> Optional[Any]:
+    # The image node of an untouched material built below, None otherwise
+    if not mat.use_nodes or mat.node_tree is None:
+        return None
+    tex_node = get_shader_node(mat, 'TEX_IMAGE')
+    principled_node = get_shader_node(mat, 'BSDF_PRINCIPLED')
+    output_node = get_shader_node(mat, 'OUTPUT_MATERIAL')
+    if tex_node is None or principled_node is None or output_node is None:
+        return None
+    if not tex_node.outputs['Color'].is_linked or \
+            not output_node.inputs['Surface'].is_linked:
+        return None
+    return tex_node
+
+
 def create_checker_material(*, mat_name: str, image_name: str,
                             unique_name: bool=True) -> Material:
     mat = None
     if unique_name:
         mat = get_material_by_name(mat_name)
+    if mat is not None:
+        # Reuse the node tree, at most the image changes
+        tex_node = get_checker_material_tex_node(mat)
+        if tex_node is not None:
+            tex = get_image_by_name(image_name)
+            if tex_node.image != tex:
+                tex_node.image = tex
+            return mat
     if mat is None:
         mat = create_new_mat(mat_name)
 
@@ -213,6 +566,48 @@ def create_checker_material(*, mat_name: str, image_name: str,
     return mat
 
 
+def is_checker_material_for(mat: Optional[Material], mat_name: str,
+                            image: Optional[Image]) -> bool:
+    # mat_name or a numbered copy of it, showing image
+    if mat is None or (mat.name != mat_name and
+                       not mat.name.startswith(f'{mat_name}.')):
+        return False
+    tex_node = get_checker_material_tex_node(mat)
+    return tex_node is not None and tex_node.image == image
+
+
+def get_image_material(mesh: Any, mat_name: str, image_name: str
+                       ) -> Tuple[Material, int]:
+    # One material per image: reuse a slot of the mesh, then any material
+    # of the file showing the image, create one only when neither exists.
+    # Returns the material and its slot index in mesh.materials.
+    image = get_image_by_name(image_name)
+    for index, mat in enumerate(mesh.materials):
+        if is_checker_material_for(mat, mat_name, image):
+            return mat, index
+    mat = next((mat for mat in bpy.data.materials
+                if is_checker_material_for(mat, mat_name, image)), None)
+    if mat is None:
+        mat = create_checker_material(mat_name=mat_name,
+                                      image_name=image_name,
+                                      unique_name=False)
+    mesh.materials.append(mat)
+    return mat, len(mesh.materials) - 1
+
+
+def set_selected_faces_material(mesh: Any, mat_index: int) -> bool:
+    # Bulk read/modify/write of the material indices of the selected
+    # polygons (OBJECT mode data). Returns False when nothing changed.
+    selected = get_mesh_polygon_flags(mesh, 'select')
+    indices = get_mesh_material_indices(mesh)
+    if not (indices[selected] != mat_index).any():
+        return False
+    indices[selected] = mat_index
+    mesh.polygons.foreach_set('material_index', indices)
+    mesh.update()
+    return True
+
+
 def get_areas_by_type(area_type: str='VIEW_3D') -> List:
     areas = []
     for window in bpy.data.window_managers['WinMan'].windows:
@@ -0,0 +1,15 @@
+# The add-on __init__ needs Blender, the bpy-free modules are imported
+# directly from the add-on directory instead. Modules with relative
+# imports of their bpy-free siblings load from the sure_uv package, which
+# points at the add-on directory without running its __init__.
+
+import os
+import sys
+import types
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ADDON_DIR)
+
+package = types.ModuleType('sure_uv')
+package.__path__ = [ADDON_DIR]
+sys.modules.setdefault('sure_uv', package)
@@ -0,0 +1,131 @@
+# Batch driver: input collection, worker parameters and the handling of
+# worker processes, with a Python script standing in for Blender.
+
+import argparse
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+from sure_uv_batch import (collect_files, get_worker_params, parse_args,
+                           parse_vector, run_file)
+
+
+# Behaves by .blend file name: ok writes a result, fail exits non-zero,
+# empty exits without a result, slow sleeps past the timeout
+FAKE_BLENDER = '''#!{python}
+import json, sys, time
+argv = sys.argv
+path = argv[3]
+params = json.loads(argv[argv.index('--params') + 1])
+result = argv[argv.index('--result') + 1]
+if path.endswith('fail.blend'):
+    sys.stderr.write('Error: broken file\\n')
+    sys.exit(3)
+if path.endswith('slow.blend'):
+    time.sleep(30)
+if path.endswith('ok.blend'):
+    with open(result, 'w') as f:
+        json.dump({{'objects': ['Cube'], 'relpath': params['relpath'],
+                   'size': params['size']}}, f)
+'''
+
+
+@pytest.fixture
+def blender(tmp_path):
+    path = tmp_path / 'blender'
+    path.write_text(FAKE_BLENDER.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'')
+    return path
+
+
+def test_directories_mirror_their_layout(tmp_path):
+    touch(tmp_path / 'assets' / 'b.blend')
+    touch(tmp_path / 'assets' / 'props' / 'a.blend')
+    touch(tmp_path / 'assets' / 'notes.txt')
+    single = touch(tmp_path / 'other' / 'c.blend')
+    entries = collect_files([str(tmp_path / 'assets'), str(single)], '')
+    assert sorted(entry['relpath'] for entry in entries) == \
+        ['b.blend', 'c.blend', os.path.join('props', 'a.blend')]
+    assert all(os.path.isabs(entry['path']) for entry in entries)
+
+
+def test_manifest_paths_are_relative_to_the_manifest(tmp_path):
+    touch(tmp_path / 'lib' / 'a.blend')
+    outside = touch(tmp_path.parent / f'{tmp_path.name}_outside.blend')
+    manifest = tmp_path / 'files.txt'
+    manifest.write_text(f'# assets\nlib/a.blend\n\n{outside}\n')
+    entries = collect_files([], str(manifest))
+    assert [entry['relpath'] for entry in entries] == \
+        [os.path.join('lib', 'a.blend'), outside.name]
+
+    json_manifest = tmp_path / 'files.json'
+    json_manifest.write_text(json.dumps(['lib/a.blend']))
+    entries = collect_files([str(tmp_path / 'lib')], str(json_manifest))
+    # The same file from the manifest and the directory is mapped once
+    assert len(entries) == 1
+
+
+def test_parse_vector():
+    assert parse_vector('1,2.5,-3') == [1.0, 2.5, -3.0]
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_vector('1,2')
+
+
+def test_worker_params(tmp_path):
+    args = parse_args(['a.blend', '--mapping', 'planar', '--size', '2',
+                       '--rot', '0,0,90', '--objects', 'Wall*,Floor',
+                       '--materials', 'Brick,', '--transform', 'scale',
+                       '--output-dir', str(tmp_path)])
+    params = get_worker_params(args, {'path': '/x/a.blend',
+                                      'relpath': 'a.blend'})
+    assert params['mapping'] == 'PLANAR'
+    assert params['transform'] == 'SCALE'
+    assert params['size'] == 2.0
+    assert params['rot'] == [0.0, 0.0, 90.0]
+    assert params['objects'] == ['Wall*', 'Floor']
+    assert params['materials'] == ['Brick']
+    assert params['output_dir'] == str(tmp_path)
+    assert params['relpath'] == 'a.blend'
+
+
+def run(tmp_path, blender, name, timeout='0'):
+    path = touch(tmp_path / name)
+    args = parse_args([str(path), '--blender', blender, '--size', '3',
+                       '--timeout', timeout])
+    return run_file(args, collect_files(args.inputs, '')[0])
+
+
+def test_run_file_reads_the_worker_result(tmp_path, blender):
+    report = run(tmp_path, blender, 'ok.blend')
+    assert report['status'] == 'ok'
+    assert report['returncode'] == 0
+    assert report['objects'] == ['Cube']
+    assert report['relpath'] == 'ok.blend'
+    assert report['size'] == 3.0
+    assert report['error'] is None
+
+
+def test_run_file_reports_a_failed_worker(tmp_path, blender):
+    report = run(tmp_path, blender, 'fail.blend')
+    assert report['status'] == 'failed'
+    assert report['returncode'] == 3
+    assert 'broken file' in report['error']
+
+    report = run(tmp_path, blender, 'empty.blend')
+    assert report['status'] == 'failed'
+    assert report['error'] == 'Blender exited with code 0'
+
+
+def test_run_file_times_out(tmp_path, blender):
+    report = run(tmp_path, blender, 'slow.blend', timeout='0.5')
+    assert report['status'] == 'timeout'
+    assert report['wall'] < 10
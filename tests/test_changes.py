@@ -0,0 +1,87 @@
+# Keep mapped remaps only the kept mapped faces changed by an edit.
+
+import numpy as np
+
+from sure_uv.sure_uv_changes import face_hashes, mesh_state, remapped_faces
+from sure_uv.sure_uv_projection import MeshArrays
+
+
+def make_grid(n: int = 8) -> MeshArrays:
+    xs, ys = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing='ij')
+    coords = np.stack((xs.ravel(), ys.ravel(), np.zeros((n + 1) ** 2)),
+                      axis=1).astype(np.float32)
+    first = (np.arange(n)[:, None] * (n + 1) + np.arange(n)).ravel()
+    loop_verts = np.stack((first, first + n + 1, first + n + 2, first + 1),
+                          axis=1).ravel().astype(np.int32)
+    loop_total = np.full(n * n, 4, dtype=np.int32)
+    normals = np.tile(np.float32([0, 0, 1]), (n * n, 1))
+    return MeshArrays(coords, loop_verts, normals,
+                      (np.cumsum(loop_total) - loop_total).astype(np.int32),
+                      loop_total)
+
+
+def remap(old_mesh, old_mapped, new_mesh, new_mapped, old_transform=None,
+          new_transform=None):
+    old = mesh_state(old_mesh, face_hashes(old_mesh), old_mapped,
+                     old_transform)
+    hashes = face_hashes(new_mesh)
+    new = mesh_state(new_mesh, hashes, new_mapped, new_transform)
+    return remapped_faces(old, new, new_mesh, hashes, new_mapped)
+
+
+def faces_of_vertex(mesh, vertex):
+    loops = mesh.loop_verts.reshape(-1, 4)
+    return set(np.flatnonzero((loops == vertex).any(axis=1)).tolist())
+
+
+def test_moved_vertex_remaps_only_kept_mapped_faces():
+    mesh = make_grid()
+    mapped = np.zeros(64, dtype=bool)
+    mapped[:32] = True
+    coords = mesh.coords.copy()
+    coords[[10, 60]] += (0, 0, 0.5)
+    moved = mesh._replace(coords=coords)
+    faces = remap(mesh, mapped, moved, mapped)
+    touched = faces_of_vertex(mesh, 10) | faces_of_vertex(mesh, 60)
+    # Changes are found per chunk of vertices, never outside the kept
+    # mapped faces
+    assert not (faces & ~mapped).any()
+    assert {face for face in touched if mapped[face]} <= \
+        set(np.flatnonzero(faces).tolist())
+
+
+def test_unchanged_mesh_remaps_nothing():
+    mesh = make_grid()
+    mapped = np.ones(64, dtype=bool)
+    assert not remap(mesh, mapped, mesh, mapped).any()
+
+
+def test_transform_change_remaps_all_kept_mapped_faces():
+    mesh = make_grid()
+    mapped = np.arange(64) % 3 == 0
+    faces = remap(mesh, mapped, mesh, mapped, np.eye(4),
+                  np.diag([2.0, 2.0, 2.0, 1.0]))
+    assert (faces == mapped).all()
+
+
+def test_topology_edit_remaps_only_new_kept_mapped_faces():
+    mesh = make_grid()
+    mapped = np.zeros(64, dtype=bool)
+    mapped[:40] = True
+    # Delete face 0 and add two faces at the end: one inheriting the kept
+    # mapped flag (as extruded faces do), one that was never Box mapped
+    keep = np.arange(1, 64)
+    loop_verts = mesh.loop_verts.reshape(-1, 4)[keep].ravel()
+    coords = np.concatenate((mesh.coords, np.float32(
+        [[0, 0, 1], [1, 0, 1], [0, 0, 2], [1, 0, 2]])))
+    count = len(mesh.coords)
+    loop_verts = np.concatenate((loop_verts, [0, 1, count + 1, count],
+                                 [count, count + 1, count + 3, count + 2]))
+    loop_total = np.full(65, 4, dtype=np.int32)
+    edited = MeshArrays(coords, loop_verts.astype(np.int32),
+                        np.tile(np.float32([0, 1, 0]), (65, 1)),
+                        (np.cumsum(loop_total) - loop_total).astype(np.int32),
+                        loop_total)
+    new_mapped = np.concatenate((mapped[keep], [True, False]))
+    faces = remap(mesh, mapped, edited, new_mapped)
+    assert np.flatnonzero(faces).tolist() == [63]
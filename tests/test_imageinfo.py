@@ -0,0 +1,145 @@
+# Image sizes read from header bytes, and scan_image_files stops reading
+# headers once the import is cancelled.
+
+import struct
+import threading
+
+import pytest
+
+from sure_uv_imageinfo import (EXR_MAGIC, PNG_SIGNATURE, read_image_size,
+                               scan_image_files)
+
+
+# Each header ends with the last byte the size is read from, the tests pad
+# complete files and cut truncated ones short of it
+
+
+def png_header(width, height):
+    return PNG_SIGNATURE + struct.pack('>I4sII', 13, b'IHDR', width, height)
+
+
+def jpeg_header(width, height):
+    # APP0 segment, fill bytes and a standalone RST0 before the SOF0
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\0' + bytes(9)
+    sof0 = b'\xff\xc0' + struct.pack('>HBHH', 11, 8, height, width)
+    return b'\xff\xd8' + app0 + b'\xff\xff\xff\xd0' + sof0
+
+
+def tiff_header(width, height, order='<', kinds=(3, 4)):
+    # IFD after the header: width and height, SHORT and/or LONG values
+    magic = b'II' if order == '<' else b'MM'
+    entries = b''
+    for tag, kind, value in ((256, kinds[0], width), (257, kinds[1], height)):
+        value = struct.pack(order + ('H' if kind == 3 else 'I'), value)
+        entries += struct.pack(order + 'HHI', tag, kind, 1) + \
+            value.ljust(4, b'\0')
+    return magic + struct.pack(order + 'HIH', 42, 8, 2) + entries
+
+
+def bigtiff_header(width, height, order='<'):
+    magic = b'II' if order == '<' else b'MM'
+    entries = b''
+    for tag, value in ((256, width), (257, height)):
+        entries += struct.pack(order + 'HHQQ', tag, 16, 1, value)
+    return magic + struct.pack(order + 'HHHQQ', 43, 8, 0, 16, 2) + entries
+
+
+def exr_attribute(name, kind, value):
+    return name + b'\0' + kind + b'\0' + struct.pack('<i', len(value)) + \
+        value
+
+
+def exr_header(width, height):
+    # dataWindow is a box2i: xmin, ymin, xmax, ymax. The zero padding of
+    # a complete file ends the attribute list.
+    return EXR_MAGIC + struct.pack('<I', 2) + \
+        exr_attribute(b'compression', b'compression', b'\x03') + \
+        exr_attribute(b'dataWindow', b'box2i',
+                      struct.pack('<iiii', 10, 20, 10 + width - 1,
+                                  20 + height - 1))
+
+
+def tga_header(width, height):
+    return struct.pack('<BBBHHBHHHHBB', 0, 0, 2, 0, 0, 0, 0, 0,
+                       width, height, 32, 8)
+
+
+HEADERS = {
+    'png': ('a.png', png_header(640, 480)),
+    'jpeg': ('a.jpg', jpeg_header(640, 480)),
+    'tiff II': ('a.tif', tiff_header(640, 480, '<')),
+    'tiff MM': ('a.tif', tiff_header(640, 480, '>')),
+    'tiff MM long width': ('a.tif', tiff_header(640, 480, '>', (4, 3))),
+    'bigtiff II': ('a.tif', bigtiff_header(640, 480, '<')),
+    'bigtiff MM': ('a.tif', bigtiff_header(640, 480, '>')),
+    'exr': ('a.exr', exr_header(640, 480)),
+    'tga': ('a.tga', tga_header(640, 480)),
+}
+
+
+@pytest.mark.parametrize('name', HEADERS)
+def test_read_image_size(tmp_path, name):
+    filename, header = HEADERS[name]
+    path = tmp_path / filename
+    path.write_bytes(header + bytes(64))
+    assert read_image_size(str(path)) == (640, 480)
+
+
+@pytest.mark.parametrize('name', HEADERS)
+def test_truncated_header_has_no_size(tmp_path, name):
+    filename, header = HEADERS[name]
+    path = tmp_path / filename
+    for end in (len(header) // 2, len(header) - 1):
+        path.write_bytes(header[:end])
+        assert read_image_size(str(path)) is None
+
+
+def test_unknown_format_has_no_size(tmp_path):
+    path = tmp_path / 'a.png'
+    path.write_bytes(tga_header(640, 480))
+    assert read_image_size(str(path)) is None
+    assert read_image_size(str(tmp_path / 'missing.png')) is None
+
+
+class CountingCache:
+    def __init__(self, cancel_after=0, cancelled=None):
+        self.reads = 0
+        self.cancel_after = cancel_after
+        self.cancelled = cancelled
+        self._lock = threading.Lock()
+
+    def get_size(self, path):
+        with self._lock:
+            self.reads += 1
+            if self.reads == self.cancel_after:
+                self.cancelled.set()
+        return 64, 32
+
+
+def make_files(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'{i}.png'
+        path.write_bytes(b'')
+        paths.append(str(path))
+    return paths
+
+
+def test_scan_yields_every_path_in_order(tmp_path):
+    paths = make_files(tmp_path, 50)
+    items = list(scan_image_files(paths + [str(tmp_path / 'missing.png')],
+                                  CountingCache(), threads=4))
+    assert [path for path, _, _ in items][:-1] == paths
+    assert items[0][1:] == ((64, 32), True)
+    assert items[-1][1:] == (None, False)
+
+
+def test_cancel_stops_the_header_reads(tmp_path):
+    paths = make_files(tmp_path, 2000)
+    cancelled = threading.Event()
+    cache = CountingCache(cancel_after=10, cancelled=cancelled)
+    items = list(scan_image_files(paths, cache, threads=4,
+                                  cancelled=cancelled))
+    # Only the reads already in flight on the other workers finish
+    assert cache.reads < 10 + 4
+    assert len(items) < 10
@@ -0,0 +1,231 @@
+# Pins the NumPy kernels of sure_uv_projection to the per-face / per-loop
+# code they replaced, and the chunked and threaded paths to the plain one.
+
+from math import asin, cos, pi, sin, sqrt
+
+import numpy as np
+import pytest
+
+import sure_uv_projection as projection
+from sure_uv_projection import (MeshArrays,
+                                apply_box_projection,
+                                apply_planar_projection,
+                                best_planar_rotation,
+                                box_project,
+                                box_project_batch,
+                                classify_box_faces,
+                                get_box_project_matrices,
+                                get_planar_matrix,
+                                prepare_box_projection,
+                                prepare_planar_projection,
+                                rotations_to_z)
+
+
+def make_mesh(face_count: int = 300, seed: int = 0,
+              selection: bool = False, groups: bool = False) -> MeshArrays:
+    rng = np.random.default_rng(seed)
+    loop_total = rng.integers(3, 7, face_count).astype(np.int32)
+    loop_start = (np.cumsum(loop_total) - loop_total).astype(np.int32)
+    loop_count = int(loop_total.sum())
+    coords = (rng.normal(size=(loop_count // 2, 3)) * 5 +
+              (100.0, -40.0, 7.0)).astype(np.float32)
+    normals = rng.normal(size=(face_count, 3)).astype(np.float32)
+    # Axis aligned normals and exact ties exercise the tie-breaking
+    normals[::7] = np.round(normals[::7])
+    normals[::11] = (1.0, -1.0, 0.5)
+    return MeshArrays(
+        coords=coords,
+        loop_verts=rng.integers(0, len(coords), loop_count).astype(np.int32),
+        normals=normals,
+        loop_start=loop_start,
+        loop_total=loop_total,
+        selection=rng.random(face_count) < 0.6 if selection else None,
+        groups=rng.integers(0, 3, face_count).astype(np.int32)
+        if groups else None)
+
+
+def box_matrices(sets: int = 1):
+    matrices = []
+    for i in range(sets):
+        matrices += get_box_project_matrices(1.5 + i, 0.8, (10.0, -25.0, 40.0),
+                                             (0.3, i, -0.7))
+    return matrices
+
+
+# Reference implementations, as the operators computed them per face
+
+def classify_face(n) -> int:
+    if abs(n[0]) > abs(n[1]) and abs(n[0]) > abs(n[2]):
+        return 0 if n[0] >= 0 else 1
+    elif abs(n[1]) > abs(n[0]) and abs(n[1]) > abs(n[2]):
+        return 2 if n[1] >= 0 else 3
+    return 4 if n[2] >= 0 else 5
+
+
+def face_loops(mesh: MeshArrays):
+    for face in range(len(mesh.loop_start)):
+        if mesh.selection is not None and not mesh.selection[face]:
+            continue
+        start = mesh.loop_start[face]
+        yield face, range(start, start + mesh.loop_total[face])
+
+
+def reference_box(mesh: MeshArrays, matrices) -> np.ndarray:
+    uvs = np.zeros((len(mesh.loop_verts), 2))
+    for face, loops in face_loops(mesh):
+        group = 0 if mesh.groups is None else mesh.groups[face]
+        matrix = matrices[6 * group + classify_face(mesh.normals[face])]
+        for loop in loops:
+            co = mesh.coords[mesh.loop_verts[loop]].astype(np.float64)
+            uvs[loop] = matrix @ (*co, 1.0)
+    return uvs
+
+
+def reference_planar(mesh: MeshArrays, matrix, rotation) -> np.ndarray:
+    uvs = np.zeros((len(mesh.loop_verts), 2))
+    for face, loops in face_loops(mesh):
+        for loop in loops:
+            co = rotation @ mesh.coords[mesh.loop_verts[loop]]
+            uvs[loop] = matrix @ (*co, 1.0)
+    return uvs
+
+
+def _normalized(v):
+    length = sqrt(sum(c * c for c in v))
+    return [c / length for c in v] if length > 0 else [0.0, 0.0, 0.0]
+
+
+def rotation_difference_to_z(v) -> np.ndarray:
+    # mathutils Vector(v).rotation_difference((0, 0, 1)).to_matrix(),
+    # following rotation_between_vecs_to_quat and quat_to_mat3
+    v1, v2 = _normalized(v), [0.0, 0.0, 1.0]
+    cross = [v1[1] * v2[2] - v1[2] * v2[1],
+             v1[2] * v2[0] - v1[0] * v2[2],
+             v1[0] * v2[1] - v1[1] * v2[0]]
+    dot = sum(a * b for a, b in zip(v1, v2))
+    axis = _normalized(cross)
+    if sqrt(sum(c * c for c in cross)) > np.finfo(np.float32).eps:
+        if dot >= 0:
+            angle = 2.0 * asin(min(sqrt(sum((a - b) ** 2
+                                            for a, b in zip(v1, v2))) / 2, 1))
+        else:
+            angle = pi - 2.0 * asin(min(sqrt(sum((a + b) ** 2
+                                                 for a, b in zip(v1, v2))) / 2,
+                                        1))
+    elif dot > 0:
+        angle, axis = 0.0, [0.0, 0.0, 1.0]
+    else:
+        # ortho_v3_v3 for a Z dominant vector
+        angle = pi
+        axis = _normalized([v1[2], v1[2], -v1[0] - v1[1]])
+        if axis == [0.0, 0.0, 0.0]:
+            angle, axis = 0.0, [0.0, 0.0, 1.0]
+    w, x, y, z = cos(angle / 2), *(c * sin(angle / 2) for c in axis)
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)]])
+
+
+def test_classify_box_faces_matches_per_face_tie_breaking():
+    normals = np.array([
+        (1, 1, 0), (1, 0, 1), (0, 1, 1), (1, 1, 1), (-1, -1, -1),
+        (-1, 1, 0), (0, -1, -1), (-1, 0, 0.5), (0, 0, 0), (0, -0.0, -0.0),
+        (2, -1, 1), (-0.5, 3, 2), (0.1, -0.2, -0.15), (np.nan, 1, 0),
+    ], dtype=np.float32)
+    normals = np.concatenate((normals, make_mesh().normals))
+    expected = [classify_face(n) for n in normals]
+    assert classify_box_faces(normals).tolist() == expected
+
+
+@pytest.mark.parametrize('vector', [
+    (0, 0, 1), (0, 0, -1), (0, 0, 2.5), (0, 0, -0.1), (0, 0, 0),
+    (1, 0, 0), (0, -1, 0), (1, 1, 1), (-0.3, 0.2, -0.9), (1e-9, 0, -1),
+    (1e-9, 0, 1), (0.2, -0.7, 0.01),
+])
+def test_rotations_to_z_matches_rotation_difference(vector):
+    expected = rotation_difference_to_z(vector)
+    assert np.allclose(rotations_to_z(np.array(vector))[0], expected,
+                       atol=1e-7)
+
+
+def test_rotations_to_z_vectorized():
+    vectors = np.random.default_rng(1).normal(size=(200, 3))
+    expected = np.array([rotation_difference_to_z(v) for v in vectors])
+    rotations = rotations_to_z(vectors)
+    assert np.allclose(rotations, expected, atol=1e-9)
+    # Every rotation takes its vector onto +Z
+    unit = vectors / np.linalg.norm(vectors, axis=1)[:, None]
+    assert np.allclose(np.einsum('nij,nj->ni', rotations, unit),
+                       (0, 0, 1), atol=1e-9)
+
+
+@pytest.mark.parametrize('selection', [False, True])
+@pytest.mark.parametrize('groups', [False, True])
+def test_box_project_matches_reference(selection, groups):
+    mesh = make_mesh(selection=selection, groups=groups)
+    matrices = box_matrices(3 if groups else 1)
+    out = np.full((len(mesh.loop_verts), 2), 9.0, dtype=np.float32)
+    uvs = box_project(mesh, matrices, out)
+    expected = reference_box(mesh, matrices)
+    if selection:
+        # Loops of unselected faces keep their UVs
+        expected[~np.repeat(mesh.selection, mesh.loop_total)] = 9.0
+    assert np.allclose(uvs, expected, atol=1e-4)
+
+
+@pytest.mark.parametrize('selection', [False, True])
+def test_best_planar_project_matches_reference(selection):
+    mesh = make_mesh(selection=selection)
+    matrix = get_planar_matrix(2.0, 1.25, 30.0, 0.1, -0.4)
+    out = np.full((len(mesh.loop_verts), 2), 9.0, dtype=np.float32)
+    uvs = projection.best_planar_project(mesh, matrix, out)
+
+    normals = mesh.normals if not selection else mesh.normals[mesh.selection]
+    rotation = rotation_difference_to_z(np.average(normals, axis=0))
+    assert np.allclose(best_planar_rotation(mesh.normals, mesh.selection),
+                       rotation, atol=1e-6)
+    expected = reference_planar(mesh, matrix, rotation)
+    if selection:
+        expected[~np.repeat(mesh.selection, mesh.loop_total)] = 9.0
+    assert np.allclose(uvs, expected, atol=1e-4)
+
+
+@pytest.fixture
+def small_tasks(monkeypatch):
+    # Split even the small test meshes across several worker threads
+    monkeypatch.setattr(projection, 'MIN_TASK_LOOPS', 16)
+
+
+@pytest.mark.parametrize('chunk_size', [0, 1, 7, 64])
+@pytest.mark.parametrize('threads', [1, 4])
+def test_box_chunked_threaded_agree(small_tasks, chunk_size, threads):
+    mesh = make_mesh(selection=True, groups=True, seed=2)
+    matrices = box_matrices(3)
+    expected = box_project(mesh, matrices)
+    prepared = prepare_box_projection(mesh, chunk_size=chunk_size)
+    uvs = apply_box_projection(prepared, matrices,
+                               np.zeros_like(expected), threads)
+    assert np.allclose(uvs, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize('chunk_size', [0, 1, 7, 64])
+@pytest.mark.parametrize('threads', [1, 4])
+def test_planar_chunked_threaded_agree(small_tasks, chunk_size, threads):
+    mesh = make_mesh(selection=True, seed=3)
+    matrix = get_planar_matrix(0.5, 1.0, -60.0, 2.0, 3.0)
+    rotation = best_planar_rotation(mesh.normals, mesh.selection)
+    expected = projection.planar_project(mesh, matrix, rotation)
+    prepared = prepare_planar_projection(mesh, rotation,
+                                         chunk_size=chunk_size)
+    uvs = apply_planar_projection(prepared, matrix,
+                                  np.zeros_like(expected), threads)
+    assert np.allclose(uvs, expected, atol=1e-5)
+
+
+def test_box_project_batch_matches_single_meshes():
+    meshes = [make_mesh(120, seed=4), make_mesh(80, seed=5, selection=True),
+              make_mesh(50, seed=6, groups=True)]
+    matrices = box_matrices(3)
+    for uvs, mesh in zip(box_project_batch(meshes, matrices), meshes):
+        assert np.allclose(uvs, box_project(mesh, matrices), atol=1e-5)
@@ -0,0 +1,20 @@
+# Coplanar selection keeps to the tolerance however many planes are seeded.
+
+import numpy as np
+
+from sure_uv.sure_uv_select import coplanar_faces
+
+
+def test_matches_stay_within_tolerance_of_a_seed():
+    # 1000 seed planes, each with a face inside and a face just outside
+    # the distance tolerance, all sharing the same normal
+    count = 1000
+    seed_distances = np.arange(count) * 0.1
+    distances = np.concatenate((seed_distances, seed_distances + 0.0009,
+                                seed_distances + 0.0015))
+    normals = np.tile([0.0, 0.0, 1.0], (3 * count, 1))
+    seeds = np.zeros(3 * count, dtype=bool)
+    seeds[:count] = True
+    result = coplanar_faces(normals, distances, seeds, 0.01, 0.001)
+    assert result[:2 * count].all()
+    assert not result[2 * count:].any()